@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from generate_demo_subcollection_data import build_context, load_facility_ids
+from generators.pipeline import (
+    COLLECTIONS,
+    GENERATORS,
+    generate_residents,
+    prepare_resident,
+    required_generators,
+)
+from generators.residents import synthesize_residents
+from generators.utils import make_rng
+from generators.writers import WRITERS
+
+# --- Configuration ---
+BASELINES_FILE = "dev-utils/benchmarks/baselines.json"
+PIPELINE = "pipeline"
+# A fixed seed and date keep the workload identical from run to run
+SEED = 0
+AS_OF = date(2025, 1, 1)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process and any processes it waited on."""
+    peak_kb = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return peak_kb / 1024
+
+
+def benchmark_generator(name: str, count: int) -> dict:
+    """Times one generator over count synthetic residents.
+
+    The generators it depends on run too, to give it its inputs, but only its
+    own calls are timed. Records are materialized inside the timed section,
+    since most generators return them lazily.
+    """
+    context = build_context(SEED, AS_OF)
+    target = next(step for step in GENERATORS if step["name"] == name)
+    steps = required_generators(target["collections"])
+    residents = synthesize_residents(count, load_facility_ids(), [], SEED)
+
+    seconds = 0.0
+    records = 0
+    for index, resident in enumerate(residents):
+        span = prepare_resident(index, resident, context)
+        results = {}
+        for step in steps:
+            rng = make_rng(SEED, resident["id"], step["name"])
+            started = time.perf_counter()
+            outputs = step["run"](resident, span, context, rng, results)
+            outputs = {key: list(values) for key, values in outputs.items()}
+            elapsed = time.perf_counter() - started
+            results[step["name"]] = outputs
+            if step is target:
+                seconds += elapsed
+                records += sum(len(values) for values in outputs.values())
+
+    return {"records": records, "seconds": seconds, "peak_rss_mb": peak_rss_mb()}
+
+
+def benchmark_pipeline(count: int, workers: int, output_format: str) -> dict:
+    """Times a full run over count synthetic residents, writing included."""
+    with tempfile.TemporaryDirectory() as output_dir:
+        context = build_context(SEED, AS_OF, output_format)
+        context["output_dir"] = output_dir
+        writer_class = WRITERS[output_format]
+        writers = {
+            name: writer_class(os.path.join(output_dir, name + writer_class.extension))
+            for name in COLLECTIONS
+        }
+        residents_writer = writer_class(
+            os.path.join(output_dir, "residents" + writer_class.extension)
+        )
+        residents = synthesize_residents(count, load_facility_ids(), [], SEED)
+
+        started = time.perf_counter()
+        for resident in generate_residents(residents, context, writers, workers):
+            residents_writer.write(resident)
+        for writer in [*writers.values(), residents_writer]:
+            writer.close()
+        seconds = time.perf_counter() - started
+
+        records = sum(writer.count for writer in [*writers.values(), residents_writer])
+    return {"records": records, "seconds": seconds, "peak_rss_mb": peak_rss_mb()}
+
+
+def run_isolated(function, *args) -> dict:
+    """Runs a benchmark in a fresh process so its peak RSS is its own."""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(function, *args).result()
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """Lists how result regressed against baseline beyond tolerance, if at all."""
+    regressions = []
+    if result["records_per_sec"] < baseline["records_per_sec"] * (1 - tolerance):
+        regressions.append(
+            f"throughput {result['records_per_sec']:.0f}/s "
+            f"< baseline {baseline['records_per_sec']:.0f}/s"
+        )
+    if result["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        regressions.append(
+            f"peak RSS {result['peak_rss_mb']:.1f} MB "
+            f"> baseline {baseline['peak_rss_mb']:.1f} MB"
+        )
+    return regressions
+
+
+def parse_args():
+    names = [step["name"] for step in GENERATORS] + [PIPELINE]
+    parser = argparse.ArgumentParser(
+        description="Benchmark each generator and the full pipeline against stored baselines."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[100, 1000],
+        help="Resident counts to benchmark at (default: 100 1000).",
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=names,
+        default=names,
+        metavar="NAME",
+        help=f"Benchmarks to run (default: all). One of: {', '.join(names)}.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes for the pipeline benchmark (default: 1).",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(WRITERS),
+        default="json",
+        help="Output format for the pipeline benchmark (default: json).",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed fractional drop in throughput or rise in peak RSS (default: 0.25).",
+    )
+    parser.add_argument(
+        "--baselines",
+        default=BASELINES_FILE,
+        help=f"Baselines file to compare against (default: {BASELINES_FILE}).",
+    )
+    parser.add_argument(
+        "--update-baselines",
+        action="store_true",
+        help="Record these results as the new baselines instead of comparing.",
+    )
+    return parser.parse_args()
+
+
+# --- Main Script ---
+if __name__ == "__main__":
+    args = parse_args()
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines, "r") as f:
+            baselines = json.load(f)
+
+    print(
+        f"{'benchmark':<32} {'records':>9} {'records/s':>10} "
+        f"{'us/record':>10} {'peak RSS MB':>12}  vs baseline"
+    )
+    results = {}
+    failures = 0
+    for size in args.sizes:
+        for name in args.only:
+            if name == PIPELINE:
+                result = run_isolated(
+                    benchmark_pipeline, size, args.workers, args.format
+                )
+            else:
+                result = run_isolated(benchmark_generator, name, size)
+            seconds = max(result.pop("seconds"), 1e-9)
+            result["records_per_sec"] = result["records"] / seconds
+            result["us_per_record"] = seconds * 1e6 / max(result["records"], 1)
+
+            key = f"{name}@{size}"
+            results[key] = result
+            if args.update_baselines:
+                status = "recorded"
+            elif key not in baselines:
+                status = "no baseline"
+            else:
+                regressions = compare(result, baselines[key], args.tolerance)
+                failures += bool(regressions)
+                status = "REGRESSED: " + "; ".join(regressions) if regressions else "ok"
+            print(
+                f"{key:<32} {result['records']:>9} {result['records_per_sec']:>10.0f} "
+                f"{result['us_per_record']:>10.1f} {result['peak_rss_mb']:>12.1f}  {status}",
+                flush=True,
+            )
+
+    if args.update_baselines:
+        baselines.update(results)
+        with open(args.baselines, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baselines written to {args.baselines}.")
+    elif failures:
+        print(f"Error: {failures} benchmark(s) regressed beyond {args.tolerance:.0%}.")
+        exit(1)
@@ -1,70 +1,202 @@
-import cloudinary
+import argparse
+import cloudinary.exceptions
 import cloudinary.uploader
+import json
 import os
-from dotenv import load_dotenv
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from list_cloudinary_assets import MANIFEST_FILE as LISTING_FILE, configure, load_manifest
 
-def bulk_upload_to_cloudinary(local_folder_path, cloudinary_folder_path, already_uploaded_file):
-    """
-    Uploads files from a local folder to a specified Cloudinary folder,
-    skipping files that are already listed as uploaded.
+# --- Configuration ---
+LOCAL_FOLDER = "public/avatars"
+CLOUDINARY_FOLDER = "lean-ehr/assisted-living/avatars"
+MANIFEST_FILE = "dev-utils/uploaded_avatars.ndjson"
+# Output of list_cloudinary_assets.py from before there was a manifest
+LEGACY_UPLOADED_FILE = "dev-utils/already_uploaded_avatars.txt"
+
+# Errors that retrying won't fix; anything else (rate limiting, 5xx responses,
+# dropped connections) is retried with exponential backoff
+PERMANENT_ERRORS = (
+    cloudinary.exceptions.BadRequest,
+    cloudinary.exceptions.AuthorizationRequired,
+    cloudinary.exceptions.NotAllowed,
+    cloudinary.exceptions.NotFound,
+    cloudinary.exceptions.AlreadyExists,
+)
+
+_print_lock = threading.Lock()
+
+
+def log(message):
+    """Prints from any thread without interleaving lines."""
+    with _print_lock:
+        print(message, flush=True)
+
+
+class UploadManifest:
+    """Newline-delimited JSON record of completed uploads, keyed by local path.
+
+    An entry is appended and flushed as soon as its upload finishes, so an
+    interrupted run loses at most the uploads still in flight. A partly
+    written last line (from a crash mid-write) is ignored on load.
     """
-    load_dotenv()
 
-    # Configure Cloudinary
-    cloudinary.config(
-        cloud_name=os.environ.get('CLOUDINARY_CLOUD_NAME'),
-        api_key=os.environ.get('CLOUDINARY_API_KEY'),
-        api_secret=os.environ.get('CLOUDINARY_API_SECRET')
-    )
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        complete = True
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    complete = line.endswith('\n')
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[entry['file']] = entry
+        self._lock = threading.Lock()
+        self._file = open(path, 'a')
+        if not complete:
+            # Keep the next entry off the partial line
+            self._file.write('\n')
 
-    if not (cloudinary.config().cloud_name and cloudinary.config().api_key and cloudinary.config().api_secret):
-        print("Cloudinary API credentials are not set.")
-        return
+    def __contains__(self, file):
+        return file in self.entries
 
-    # Read already uploaded files
+    def record(self, entry):
+        with self._lock:
+            self.entries[entry['file']] = entry
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_legacy_uploaded(path):
+    """Filenames listed as '- https://.../name.png' lines by list_cloudinary_assets.py."""
     uploaded_filenames = set()
-    try:
-        with open(already_uploaded_file, 'r') as f:
+    if os.path.exists(path):
+        with open(path, 'r') as f:
             for line in f:
                 if line.startswith('- https://'):
-                    # Extract filename from URL, e.g., '.../image.png' -> 'image.png'
-                    filename = line.strip().split('/')[-1]
-                    uploaded_filenames.add(filename)
-        print(f"Found {len(uploaded_filenames)} already uploaded files.")
-    except FileNotFoundError:
-        print(f"Warning: {already_uploaded_file} not found. Will attempt to upload all files.")
+                    uploaded_filenames.add(line.strip().split('/')[-1])
+    return uploaded_filenames
+
+
+def public_id_base(relative_path):
+    """The public id, within the target folder, of a file at relative_path."""
+    return os.path.splitext(relative_path)[0].replace(os.sep, '/')
+
+
+def upload_with_retries(local_file_path, cloudinary_folder_path, public_id, retries, backoff):
+    """Uploads one file, retrying transient failures.
+
+    The wait before retry n is backoff * 2**n seconds, with jitter so that
+    workers throttled together don't all retry together.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return cloudinary.uploader.upload(
+                local_file_path,
+                folder=cloudinary_folder_path,
+                public_id=public_id,
+                resource_type="auto"
+            )
+        except PERMANENT_ERRORS:
+            raise
+        except cloudinary.exceptions.Error as e:
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+            log(f"Retrying {public_id} in {delay:.1f}s ({e})")
+            time.sleep(delay)
+
+
+def bulk_upload_to_cloudinary(
+    local_folder_path,
+    cloudinary_folder_path,
+    manifest_file=MANIFEST_FILE,
+    listing_file=LISTING_FILE,
+    legacy_uploaded_file=LEGACY_UPLOADED_FILE,
+    workers=8,
+    retries=5,
+    backoff=1.0,
+    upload_prefix=None,
+):
+    """
+    Uploads files from a local folder to a specified Cloudinary folder,
+    up to `workers` at a time, skipping files already recorded as uploaded
+    or found in the folder by list_cloudinary_assets.py.
+    Returns the number of failed uploads.
+    """
+    # upload_prefix points Cloudinary at another API host, such as a local
+    # stand-in for testing
+    if not configure(upload_prefix):
+        print("Cloudinary API credentials are not set.")
+        return 1
 
     if not os.path.isdir(local_folder_path):
         print(f"Error: Local folder '{local_folder_path}' does not exist.")
-        return
+        return 1
 
-    print(f"Starting selective upload from '{local_folder_path}' to Cloudinary folder '{cloudinary_folder_path}'...")
+    manifest = UploadManifest(manifest_file)
+    listing = load_manifest(listing_file) or {}
+    listed_ids = set(listing.get('assets', {})) if listing.get('folder') == cloudinary_folder_path else set()
+    legacy_filenames = read_legacy_uploaded(legacy_uploaded_file)
+    print(f"Found {len(manifest.entries)} uploads in {manifest_file}, {len(listed_ids)} assets in "
+          f"{listing_file} and {len(legacy_filenames)} in {legacy_uploaded_file}.")
 
-    uploaded_count = 0
+    pending = []
     skipped_count = 0
-    failed_uploads = []
-
     for root, _, files in os.walk(local_folder_path):
-        for filename in files:
-            if filename in uploaded_filenames:
+        for filename in sorted(files):
+            local_file_path = os.path.join(root, filename)
+            relative_path = os.path.relpath(local_file_path, local_folder_path)
+            public_id = cloudinary_folder_path + '/' + public_id_base(relative_path)
+            if relative_path in manifest or public_id in listed_ids or filename in legacy_filenames:
                 skipped_count += 1
                 continue
+            pending.append((local_file_path, relative_path))
 
-            local_file_path = os.path.join(root, filename)
-            public_id_base = os.path.splitext(os.path.relpath(local_file_path, local_folder_path))[0].replace(os.sep, '/')
+    print(f"Uploading {len(pending)} file(s) from '{local_folder_path}' to Cloudinary folder "
+          f"'{cloudinary_folder_path}' with {workers} worker(s)...")
+
+    def upload(local_file_path, relative_path):
+        result = upload_with_retries(
+            local_file_path, cloudinary_folder_path, public_id_base(relative_path), retries, backoff
+        )
+        manifest.record({
+            'file': relative_path,
+            'public_id': result.get('public_id'),
+            'secure_url': result.get('secure_url'),
+            'bytes': result.get('bytes'),
+            'uploaded_at': datetime.now(timezone.utc).isoformat(),
+        })
 
+    uploaded_count = 0
+    failed_uploads = []
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(upload, *item): item[0] for item in pending}
+        for future in as_completed(futures):
+            local_file_path = futures[future]
             try:
-                print(f"Uploading {filename}...")
-                cloudinary.uploader.upload(
-                    local_file_path,
-                    folder=cloudinary_folder_path,
-                    public_id=public_id_base,
-                    resource_type="auto"
-                )
+                future.result()
                 uploaded_count += 1
+                log(f"Uploaded {local_file_path} ({uploaded_count}/{len(pending)})")
             except Exception as e:
                 failed_uploads.append(f"{local_file_path}: {e}")
-                print(f"Failed to upload {filename}: {e}")
+                log(f"Failed to upload {local_file_path}: {e}")
+    except KeyboardInterrupt:
+        log("Interrupted; finished uploads are in the manifest and will be skipped next run.")
+        raise
+    finally:
+        executor.shutdown(cancel_futures=True)
+        manifest.close()
 
     print("\n--- Upload Summary ---")
     print(f"Successfully uploaded: {uploaded_count}")
@@ -75,9 +207,45 @@ def bulk_upload_to_cloudinary(local_folder_path, cloudinary_folder_path, already
             print(f"- {failure}")
     else:
         print("No failed uploads.")
+    return len(failed_uploads)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Upload avatars to Cloudinary concurrently, resuming from a manifest of finished uploads."
+    )
+    parser.add_argument("--source", default=LOCAL_FOLDER,
+                        help=f"Local folder to upload (default: {LOCAL_FOLDER}).")
+    parser.add_argument("--folder", default=CLOUDINARY_FOLDER,
+                        help=f"Cloudinary folder to upload into (default: {CLOUDINARY_FOLDER}).")
+    parser.add_argument("--manifest", default=MANIFEST_FILE,
+                        help=f"Manifest of completed uploads, read to resume and appended to (default: {MANIFEST_FILE}).")
+    parser.add_argument("--listing", default=LISTING_FILE,
+                        help=f"Asset manifest synced by list_cloudinary_assets.py; files it lists are skipped "
+                        f"(default: {LISTING_FILE}).")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Maximum number of uploads in flight at once (default: 8).")
+    parser.add_argument("--retries", type=int, default=5,
+                        help="Retries per file for rate limiting and server or network errors (default: 5).")
+    parser.add_argument("--backoff", type=float, default=1.0,
+                        help="Base delay in seconds before the first retry; doubles for each retry after (default: 1.0).")
+    parser.add_argument("--api-url", default=None,
+                        help="Cloudinary API base URL, e.g. a local stand-in such as http://localhost:8000 "
+                        "(default: $CLOUDINARY_UPLOAD_PREFIX or Cloudinary's own).")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    local_folder = "public/avatars"
-    cloudinary_target_folder = "lean-ehr/assisted-living/avatars"
-    already_uploaded_file = "dev-utils/already_uploaded_avatars.txt"
-    bulk_upload_to_cloudinary(local_folder, cloudinary_target_folder, already_uploaded_file)
\ No newline at end of file
+    args = parse_args()
+    failures = bulk_upload_to_cloudinary(
+        args.source,
+        args.folder,
+        manifest_file=args.manifest,
+        listing_file=args.listing,
+        workers=args.workers,
+        retries=args.retries,
+        backoff=args.backoff,
+        upload_prefix=args.api_url,
+    )
+    if failures:
+        exit(1)
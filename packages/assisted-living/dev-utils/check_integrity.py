@@ -0,0 +1,51 @@
+import argparse
+import time
+from generate_demo_subcollection_data import last_run_collection_files
+from generators.integrity import check_integrity
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Check that every id the generated demo data refers to exists."
+    )
+    parser.add_argument(
+        "--bloom-above",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Index collections of more than N records in a Bloom filter "
+        "instead of a set. This takes far less memory but can miss about 0.1%% of "
+        "dangling references (default: always use sets).",
+    )
+    return parser.parse_args()
+
+
+# --- Main Script ---
+if __name__ == "__main__":
+    args = parse_args()
+    started = time.perf_counter()
+    report = check_integrity(last_run_collection_files(), args.bloom_above)
+    if not report:
+        print("Nothing to check; generate the demo data first.")
+        exit(1)
+
+    dangling = 0
+    for (collection, field, target), result in report.items():
+        line = (
+            f"{collection}.{field} -> {target}: {result['checked']} reference(s), "
+            f"{result['dangling']} dangling"
+        )
+        if result["index"] != "set":
+            line += f" (checked against a {result['index']})"
+        if result["examples"]:
+            line += f", e.g. {', '.join(map(str, result['examples']))}"
+        print(line)
+        dangling += result["dangling"]
+
+    print(
+        f"Checked {len(report)} reference(s) in {time.perf_counter() - started:.1f}s."
+    )
+    if dangling:
+        print(f"Integrity check failed: {dangling} dangling reference(s).")
+        exit(1)
+    print("Every reference points to an existing record.")
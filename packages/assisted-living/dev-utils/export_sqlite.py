@@ -0,0 +1,45 @@
+import argparse
+import os
+import time
+from generate_demo_subcollection_data import last_run_collection_files
+from generators.export import BATCH_SIZE, export_collections
+
+# --- Configuration ---
+DATABASE_FILE = "demo-data/data-plain.sqlite"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Load the generated demo data into an indexed SQLite database."
+    )
+    parser.add_argument(
+        "--output",
+        default=DATABASE_FILE,
+        help=f"Database file to write; it is replaced if it exists (default: {DATABASE_FILE}).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help=f"Rows inserted per transaction (default: {BATCH_SIZE}).",
+    )
+    return parser.parse_args()
+
+
+# --- Main Script ---
+if __name__ == "__main__":
+    args = parse_args()
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    started = time.perf_counter()
+    counts = export_collections(
+        last_run_collection_files(), args.output, args.batch_size
+    )
+    if not counts:
+        print("Nothing to export; generate the demo data first.")
+        exit(1)
+    for collection, count in counts.items():
+        print(f"{collection}: {count} row(s)")
+    print(
+        f"Exported {sum(counts.values())} row(s) from {len(counts)} collection(s) "
+        f"to {args.output} in {time.perf_counter() - started:.1f}s."
+    )
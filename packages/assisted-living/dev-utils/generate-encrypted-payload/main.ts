@@ -10,6 +10,7 @@ import {
   // @ts-ignore ... Dockerfile copies path into job container
 } from './lib/encryption.ts'
 import * as fs from 'fs'
+import * as readline from 'readline'
 // @ts-ignore ... can't find type def, not making a .d.ts either
 import JSONStream from 'minipass-json-stream'
 
@@ -99,41 +100,89 @@ function encryptField(value: any, dek: Buffer): any {
 const MAX_IN_MEMORY_SIZE = 1_000_000 // 1MB
 
 /**
- * Loads plaintext data from a JSON file, streaming individual records for large files.
+ * Splits NDJSON text into its records, skipping blank lines.
+ */
+function parseNdjson(rawContent: string): any[] {
+  return rawContent
+    .split('\n')
+    .filter((line) => line)
+    .map((line) => JSON.parse(line))
+}
+
+/**
+ * The unsharded file a collection was written to: data-plain.json, or
+ * data-plain.ndjson from a --format ndjson run. If both are present (the
+ * residents fixture stays as data-plain.json), the newer one is used.
+ * @param collectionName The name of the Firestore collection.
+ * @returns The file's path, or undefined if neither exists.
+ */
+function plaintextDataPath(collectionName: string): string | undefined {
+  return ['data-plain.json', 'data-plain.ndjson']
+    .map((name) => `${PLAINTEXT_INPUT_DIR}/${collectionName}/${name}`)
+    .filter((path) => fs.existsSync(path))
+    .sort((a, b) => fs.statSync(b).mtimeMs - fs.statSync(a).mtimeMs)[0]
+}
+
+/**
+ * Loads plaintext data from a JSON array or NDJSON file, or from the shards
+ * listed in a manifest, streaming individual records for large files.
  * @param collectionName The name of the Firestore collection.
  * @yields {Object} Each individual JSON object/record from the file.
  */
 async function* loadPlaintextData(collectionName: string) {
-  const rawDataPath = `${PLAINTEXT_INPUT_DIR}/${collectionName}/data-plain.json`
+  const rawDataPath = plaintextDataPath(collectionName)
+  const manifestPath = `${PLAINTEXT_INPUT_DIR}/${collectionName}/manifest.json`
+
+  // Sharded output (--shard-records / --shard-size): one chunk per shard
+  if (fs.existsSync(manifestPath)) {
+    const manifest = JSON.parse(fs.readFileSync(manifestPath, 'utf-8'))
+    console.log(
+      `Reading ${manifest.shards.length} shard(s) of ${collectionName}.`,
+    )
+    for (const shard of manifest.shards) {
+      const rawContent = fs.readFileSync(
+        `${PLAINTEXT_INPUT_DIR}/${collectionName}/${shard.file}`,
+        'utf-8',
+      )
+      yield manifest.format === 'ndjson'
+        ? parseNdjson(rawContent)
+        : JSON.parse(rawContent)
+    }
+    return
+  }
 
-  if (!fs.existsSync(rawDataPath)) {
+  if (!rawDataPath) {
     console.warn(
       `Warning: Plaintext data file not found for ${collectionName}. Skipping.`,
     )
     return // Generators should use return without a value, or just end
   }
 
+  const isNdjson = rawDataPath.endsWith('.ndjson')
   const fileSize = fs.statSync(rawDataPath).size
 
   if (fileSize > MAX_IN_MEMORY_SIZE) {
     console.log(`Streaming large file: ${collectionName}`)
 
     const readStream = fs.createReadStream(rawDataPath)
-    const jsonStream = JSONStream.parse('*')
-    readStream.pipe(jsonStream)
+    const docs = isNdjson
+      ? readline.createInterface({ input: readStream, crlfDelay: Infinity })
+      : readStream.pipe(JSONStream.parse('*'))
 
     let chunk = []
-    for await (const doc of jsonStream) {
-      chunk.push(doc)
+    for await (const doc of docs) {
+      if (isNdjson && !doc) continue
+      chunk.push(isNdjson ? JSON.parse(doc) : doc)
       if (chunk.length > 99_999) {
         yield chunk
         chunk = []
       }
     }
+    if (chunk.length) yield chunk
   } else {
     console.log(`Reading small file: ${collectionName} into memory.`)
     const rawContent = fs.readFileSync(rawDataPath, 'utf-8')
-    const data = JSON.parse(rawContent)
+    const data = isNdjson ? parseNdjson(rawContent) : JSON.parse(rawContent)
     yield data
   }
 }
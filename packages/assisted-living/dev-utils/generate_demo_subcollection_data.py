@@ -1,40 +1,39 @@
+import argparse
 import json
 import os
-from datetime import datetime, timedelta
-from random import choice, random
+import random
+from contextlib import ExitStack
+from datetime import date, datetime, timedelta
 import pytz
-from generators.utils import (
-    convert_times,
-    load_snomed_file,
-    load_allergy_reactions,
-    get_loinc_codes,
-    generate_uuid,
-    get_random_datetime,
+from generators.utils import get_loinc_codes, generate_uuid, make_rng
+from generators.terminology import LOINC_SYSTEM, SNOMED_SYSTEM, load_terminology
+from generators.config import VITAL_RANGES
+from generators import profiling
+from generators.cache import GenerationCache
+from generators.residents import synthesize_residents
+from generators.advance import (
+    ADVANCE_COLLECTIONS,
+    AdvanceState,
+    advance_resident,
+    resident_end_date,
 )
-from generators.config import (
-    VITAL_RANGES,
-    PRESCRIPTION_TEMPLATES,
-    DOSAGE_INSTRUCTIONS,
+from generators.transform import collection_files, iter_records
+from generators.pipeline import (
+    GENERATORS,
+    generate_residents,
+    generator_fingerprints,
+    plan_collections,
+    read_outputs,
+    required_generators,
 )
-from generators.allergies import generate_allergies_for_resident
-from generators.prescriptions import generate_prescriptions_for_resident
-from generators.prescription_administration import (
-    generate_prescription_administration_for_resident,
-)
-from generators.observations import generate_observations_for_resident
-from generators.diagnostic_history import generate_diagnostic_history_for_resident
-from generators.episodes_of_care import generate_episodes_of_care_for_resident
-from generators.care_plans import generate_care_plans_for_resident
-from generators.addresses import generate_address_for_resident
-from generators.identifiers import generate_identifiers_for_resident
-from generators.financials import generate_financial_data_for_resident
-from generators.tasks import generate_tasks_for_resident
-from generators.procedures import generate_procedures_for_resident
-from generators.encounters import generate_encounters_for_resident
-from generators.goals import generate_goals
+from generators.writers import WRITERS, open_appender, open_writer, output_path
 
 # --- Configuration ---
 RESIDENTS_FILE = "demo-data/residents/data-plain.json"
+# Where --residents writes its synthesized residents; the residents fixture,
+# which the emergency contacts refer to, is left alone
+SYNTHETIC_RESIDENTS_FILE = "demo-data/synthetic-residents/data-plain.json"
+FACILITIES_FILE = "demo-data/facilities/data.json"
 SUBCOLLECTIONS_DIR = "demo-data"
 SUBCOLLECTION_FILES = {
     "allergies": "allergies/data-plain.json",
@@ -58,213 +57,617 @@ SUBCOLLECTION_FILES = {
     "encounters": "encounters/data-plain.json",
     "goals": "goals/data-plain.json",
 }
+# Every collection a run writes, by name
+COLLECTION_FILES = {
+    "residents": RESIDENTS_FILE,
+    **{
+        name: os.path.join(SUBCOLLECTIONS_DIR, sub_file)
+        for name, sub_file in SUBCOLLECTION_FILES.items()
+    },
+}
+
+CACHE_FILE = "demo-data/.cache/generators.sqlite"
+ADVANCE_FILE = "demo-data/.cache/advance.sqlite"
+PROFILE_DIR = "demo-data/.profile"
 
 SNOMED_DISORDERS_FILE = "demo-data/snomed-examples/disorders.txt"
 SNOMED_ALLERGY_NAMES_FILE = "demo-data/snomed-examples/allergies/name.txt"
 SNOMED_ALLERGY_REACTIONS_FILE = "demo-data/snomed-examples/allergies/reaction.txt"
 SNOMED_ALLERGY_SUBSTANCES_FILE = "demo-data/snomed-examples/allergies/substance.txt"
+LOINC_FILE = "demo-data/loinc-examples.txt"
 
 
-# --- Main Script ---
-if __name__ == "__main__":
+def build_context(
+    seed: int,
+    as_of: date,
+    output_format: str = "json",
+    goal_mode: str = "per-resident",
+    snomed_release: str = None,
+    loinc_release: str = None,
+    vitals_interval: float = None,
+) -> dict:
+    """Builds the shared generation context for a run with seed as of as_of.
+
+    Codes come from the SNOMED and LOINC example files, or from a SNOMED RF2
+    description file and a LOINC CSV table when release paths are given.
+    With vitals_interval, observations are a reading of every vital sign
+    every vitals_interval hours instead of a few random ones.
+    """
     START_DATE = pytz.utc.localize(datetime(2023, 1, 1))
     INTERMEDIARY_DATE = pytz.utc.localize(datetime(2024, 1, 1))
+    TODAY = pytz.utc.localize(datetime(as_of.year, as_of.month, as_of.day))
     # General END_DATE can be in the future for things like prescriptions, care plans
-    END_DATE = datetime.now(pytz.utc) + timedelta(days=365)
+    END_DATE = TODAY + timedelta(days=365)
     # Financial END_DATE should only be up to the present
-    FINANCIAL_END_DATE = datetime.now(pytz.utc)
+    FINANCIAL_END_DATE = TODAY
     NUM_STAFF = 6
-    STAFF_IDS = [generate_uuid() for _ in range(NUM_STAFF)]
+    staff_rng = make_rng(seed, "staff")
+    STAFF_IDS = [generate_uuid(staff_rng) for _ in range(NUM_STAFF)]
+
+    # --- Terminology ---
+    # Reaction severities only exist in the example file, so it is always used
+    if snomed_release:
+        allergy_names = load_terminology(
+            snomed_release, SNOMED_SYSTEM, semantic_tag="finding", prefix="Allergy to"
+        )
+        allergy_substances = load_terminology(
+            snomed_release, SNOMED_SYSTEM, semantic_tag="substance"
+        )
+        disorders = load_terminology(
+            snomed_release, SNOMED_SYSTEM, semantic_tag="disorder"
+        )
+    else:
+        allergy_names = load_terminology(
+            SNOMED_ALLERGY_NAMES_FILE, SNOMED_SYSTEM, missing_ok=True
+        )
+        allergy_substances = load_terminology(
+            SNOMED_ALLERGY_SUBSTANCES_FILE, SNOMED_SYSTEM, missing_ok=True
+        )
+        disorders = load_terminology(
+            SNOMED_DISORDERS_FILE, SNOMED_SYSTEM, missing_ok=True
+        )
+    allergy_reactions = load_terminology(
+        SNOMED_ALLERGY_REACTIONS_FILE,
+        SNOMED_SYSTEM,
+        missing_ok=True,
+        fields=("severity",),
+    )
+    if loinc_release:
+        loinc = load_terminology(loinc_release, LOINC_SYSTEM)
+    else:
+        loinc = load_terminology(LOINC_FILE, LOINC_SYSTEM, missing_ok=True)
+
+    return {
+        "seed": seed,
+        "output_dir": SUBCOLLECTIONS_DIR,
+        "output_format": output_format,
+        "goal_mode": goal_mode,
+        "start_date": START_DATE,
+        "intermediary_date": INTERMEDIARY_DATE,
+        "end_date": END_DATE,
+        "financial_end_date": FINANCIAL_END_DATE,
+        "staff_ids": STAFF_IDS,
+        "snomed_allergy_names": allergy_names,
+        "snomed_allergy_reactions": allergy_reactions,
+        "snomed_allergy_substances": allergy_substances,
+        "snomed_disorders": disorders,
+        "loinc_codes": get_loinc_codes(VITAL_RANGES, loinc),
+        "vitals_interval": vitals_interval,
+    }
+
 
-    os.makedirs(os.path.dirname(RESIDENTS_FILE), exist_ok=True)
+def last_run_collection_files() -> dict:
+    """COLLECTION_FILES as the last full run wrote them.
 
+    Residents are in SYNTHETIC_RESIDENTS_FILE if that run synthesized them.
+    """
+    residents_file = RESIDENTS_FILE
+    if os.path.exists(ADVANCE_FILE):
+        state = AdvanceState(ADVANCE_FILE)
+        residents_file = state.settings().get("residents_file", RESIDENTS_FILE)
+        state.close()
+    return {**COLLECTION_FILES, "residents": residents_file}
+
+
+def load_facility_ids() -> list:
     try:
-        with open(RESIDENTS_FILE, "r") as f:
-            residents_data = json.load(f)
+        with open(FACILITIES_FILE, "r") as f:
+            return [facility["id"] for facility in json.load(f)]
     except FileNotFoundError:
-        print(f"Error: Residents file not found at {RESIDENTS_FILE}.")
+        print(f"Error: Facilities file not found at {FACILITIES_FILE}.")
         exit(1)
 
-    all_allergies = []
-    all_prescriptions = []
-    all_observations = []
-    all_diagnostic_history = []
-    all_claims = []
-    all_accounts = []
-    all_charges = []
-    all_payments = []
-    all_adjustments = []
-    all_coverages = []
-    all_prescription_administration = []
-    all_episodes_of_care = []
-    all_care_plans = []
-    all_care_plan_activities = []
-    all_identifiers = []
-    all_tasks = []
-    all_procedures = []
-    all_encounters = []
-    all_goals = []
-    all_goal_ids = []
-    all_addresses = []
-
-    snomed_allergy_names = load_snomed_file(SNOMED_ALLERGY_NAMES_FILE)
-    snomed_allergy_reactions = load_allergy_reactions(SNOMED_ALLERGY_REACTIONS_FILE)
-    snomed_allergy_substances = load_snomed_file(SNOMED_ALLERGY_SUBSTANCES_FILE)
-    snomed_disorders = load_snomed_file(SNOMED_DISORDERS_FILE)
-    loinc_codes = get_loinc_codes(VITAL_RANGES)
-
-    for i, resident in enumerate(residents_data):
-        resident_id = resident["id"]
-        resident["data"]["resident_code"] = f"{i+1:05d}"  # Add resident_code
-        resident["data"]["created_at"] = get_random_datetime(START_DATE, END_DATE)
-
-        # Decide whether to deactivate the resident (e.g., 20% chance)
-        if random() < 0.2:
-            # Ensure deactivation date is after creation date
-            deactivation_start_date = resident["data"]["created_at"]
-            resident["data"]["deactivated_at"] = get_random_datetime(
-                deactivation_start_date, END_DATE
-            )
-        else:
-            resident["data"]["deactivated_at"] = None
 
-        # Determine the effective end date for generating subcollection data
-        effective_end_date = (
-            resident["data"]["deactivated_at"]
-            if resident["data"]["deactivated_at"]
-            else END_DATE
-        )
+def advance(as_of: date, snomed_release: str = None, loinc_release: str = None):
+    """Appends the events between the last run and as_of to the event collections.
 
-        # Ensure financial data does not go past the current date or deactivation date
-        effective_financial_end_date = min(effective_end_date, FINANCIAL_END_DATE)
-
-        # Generate data for each subcollection
-        goal_data = generate_goals(resident_id)
-        all_allergies.extend(
-            generate_allergies_for_resident(
-                resident_id,
-                STAFF_IDS,
-                START_DATE,
-                effective_end_date, # Use general effective_end_date for clinical
-                snomed_allergy_names,
-                snomed_allergy_reactions,
-                snomed_allergy_substances,
-            )
+    Residents and every other collection are left as the last full run wrote
+    them; that run's settings, terminology releases included, are reused so
+    new events continue its history. A release path given here must match the
+    one that run used.
+    """
+    state = AdvanceState(ADVANCE_FILE)
+    settings = state.settings()
+    if not settings:
+        print(
+            f"Error: No full run recorded in {ADVANCE_FILE}; "
+            "run without --advance first."
         )
-        resident_prescriptions = generate_prescriptions_for_resident(
-            resident_id,
-            STAFF_IDS,
-            START_DATE,
-            INTERMEDIARY_DATE,
-            effective_end_date, # Use general effective_end_date for clinical
-            PRESCRIPTION_TEMPLATES,
-            DOSAGE_INSTRUCTIONS,
+        exit(1)
+    seed, output_format = settings["seed"], settings["output_format"]
+    snomed_release = last_run_setting(settings, "snomed_release", snomed_release)
+    loinc_release = last_run_setting(settings, "loinc_release", loinc_release)
+    base_as_of = date.fromisoformat(settings["as_of"])
+    print(
+        f"Advancing the run with seed {seed} as of {base_as_of} to {as_of}: "
+        f"{', '.join(ADVANCE_COLLECTIONS)}."
+    )
+    try:
+        base_context = build_context(
+            seed,
+            base_as_of,
+            output_format,
+            settings["goal_mode"],
+            snomed_release,
+            loinc_release,
+            settings.get("vitals_interval"),
         )
-        all_prescriptions.extend(resident_prescriptions)
-        if resident_prescriptions:
-            all_prescription_administration.extend(
-                generate_prescription_administration_for_resident(
-                    resident_id, resident_prescriptions, STAFF_IDS, effective_end_date # Use general effective_end_date for clinical
-                )
+        context = build_context(
+            seed,
+            as_of,
+            output_format,
+            settings["goal_mode"],
+            snomed_release,
+            loinc_release,
+            settings.get("vitals_interval"),
+        )
+    except FileNotFoundError as e:
+        print(f"Error: {e} (used by the last full run).")
+        exit(1)
+    sharded = bool(settings["shard_records"] or settings["shard_bytes"])
+    paths = {
+        sub_dir: os.path.join(SUBCOLLECTIONS_DIR, SUBCOLLECTION_FILES[sub_dir])
+        for sub_dir in ADVANCE_COLLECTIONS
+    }
+
+    appended = 0
+    with ExitStack() as stack:
+        writers = {
+            sub_dir: stack.enter_context(open_appender(path, output_format, sharded))
+            for sub_dir, path in paths.items()
+        }
+        residents_file = settings.get("residents_file", RESIDENTS_FILE)
+        for resident in iter_records(output_path(residents_file, output_format)):
+            appended += advance_resident(
+                resident, context, base_context, state, writers
             )
-        all_observations.extend(
-            generate_observations_for_resident(
-                resident_id, STAFF_IDS, START_DATE, effective_end_date, loinc_codes # Use general effective_end_date for clinical
+        stack.close()
+    # Only once the files are complete, so an interrupted run is simply repeated
+    state.close()
+
+    # The appended files no longer match what the generation cache wrote
+    if os.path.exists(CACHE_FILE):
+        cache = GenerationCache(CACHE_FILE)
+        for path in paths.values():
+            cache.set_output_fingerprint(
+                output_path(path, output_format, sharded), None
             )
+        cache.close()
+
+    print(f"Appended {appended} event(s).")
+
+
+# What a --only run takes from the last full run: argument -> recorded setting
+RUN_SETTINGS = {
+    "seed": "seed",
+    "as_of": "as_of",
+    "format": "output_format",
+    "goals": "goal_mode",
+    "vitals_interval": "vitals_interval",
+    "shard_records": "shard_records",
+    "shard_size": "shard_bytes",
+    "residents": "residents",
+    "snomed_release": "snomed_release",
+    "loinc_release": "loinc_release",
+}
+
+
+def last_run_setting(settings: dict, arg: str, given, name: str = None):
+    """The last full run's setting for arg (recorded as name, default arg).
+
+    Exits with an error if given is set and differs from it.
+    """
+    name = name or arg
+    recorded = settings.get(name)
+    if name == "as_of":
+        recorded = date.fromisoformat(recorded)
+    if given is not None and given != recorded:
+        print(
+            f"Error: --{arg.replace('_', '-')} {given} doesn't match the last "
+            f"full run, which used {recorded}."
         )
-        all_diagnostic_history.extend(
-            generate_diagnostic_history_for_resident(
-                resident_id, STAFF_IDS, START_DATE, effective_end_date, snomed_disorders # Use general effective_end_date for clinical
-            )
+        exit(1)
+    return recorded
+
+
+def use_last_run_settings(args):
+    """Sets args to the settings of the last full run, for a --only run.
+
+    The selected collections are generated to fit the files that run left,
+    so they need its seed, date, residents, terminology releases and output
+    settings; any of them given explicitly must match what it used.
+    """
+    state = AdvanceState(ADVANCE_FILE)
+    settings = state.settings()
+    state.close()
+    if not settings:
+        print(
+            f"Error: No full run recorded in {ADVANCE_FILE}; run without --only first."
+        )
+        exit(1)
+    for arg, name in RUN_SETTINGS.items():
+        setattr(args, arg, last_run_setting(settings, arg, getattr(args, arg), name))
+
+
+def parse_size(value: str) -> int:
+    """Parses a byte count such as 65536, 500K, 64M or 1G."""
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3}
+    value = value.strip().upper().removesuffix("B")
+    try:
+        if value and value[-1] in units:
+            return int(float(value[:-1]) * units[value[-1]])
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {value!r}")
+
+
+def parse_release(value: str) -> str:
+    """Parses a --snomed-release/--loinc-release path, which must exist."""
+    if not os.path.isfile(value):
+        raise argparse.ArgumentTypeError(f"file not found: {value}")
+    return value
+
+
+def parse_only(value: str) -> list:
+    """Parses --only: collections or generator names (e.g. financials), comma-separated."""
+    collections = set()
+    for name in filter(None, (name.strip() for name in value.split(","))):
+        step = next((step for step in GENERATORS if step["name"] == name), None)
+        if step:
+            collections.update(step["collections"])
+        elif name in SUBCOLLECTION_FILES:
+            collections.add(name)
+        else:
+            raise argparse.ArgumentTypeError(f"unknown collection: {name}")
+    return [name for name in SUBCOLLECTION_FILES if name in collections]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Generate FHIR-aligned demo subcollection data for every resident."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes to split residents across (default: 1).",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed for the random streams; a random seed is picked and printed if omitted.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(WRITERS),
+        default=None,
+        help="Output format: a JSON array per collection (default) or newline-delimited JSON.",
+    )
+    parser.add_argument(
+        "--as-of",
+        type=date.fromisoformat,
+        default=None,
+        help="Date (YYYY-MM-DD) the run treats as today; defaults to the current UTC date. "
+        "Runs with the same seed and date produce identical output.",
+    )
+    parser.add_argument(
+        "--goals",
+        choices=["per-resident", "catalog"],
+        default=None,
+        help="per-resident (default) copies every goal to each resident; catalog "
+        "writes each distinct goal once, under a content-addressed id, and care "
+        "plans reference it.",
+    )
+    parser.add_argument(
+        "--snomed-release",
+        type=parse_release,
+        default=None,
+        metavar="PATH",
+        help="SNOMED CT RF2 description file (sct2_Description_*.txt) to draw "
+        "allergies, substances and disorders from instead of the example files.",
+    )
+    parser.add_argument(
+        "--loinc-release",
+        type=parse_release,
+        default=None,
+        metavar="PATH",
+        help=f"LOINC release table (Loinc.csv) to check vital sign codes against "
+        f"instead of {LOINC_FILE}.",
+    )
+    parser.add_argument(
+        "--vitals-interval",
+        type=float,
+        default=None,
+        metavar="HOURS",
+        help="Generate observations as continuous series, a reading of every vital "
+        "sign every HOURS hours (e.g. 4), instead of 3-8 random readings per "
+        "resident. For load testing charts and observation queries.",
+    )
+    parser.add_argument(
+        "--residents",
+        type=int,
+        default=None,
+        metavar="N",
+        help=f"Synthesize N residents instead of reading {RESIDENTS_FILE}. "
+        f"They are written to {SYNTHETIC_RESIDENTS_FILE}, leaving "
+        f"{RESIDENTS_FILE} as it is.",
+    )
+    parser.add_argument(
+        "--shard-records",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Split each sub-collection into shard files of at most N records, "
+        "listed in a manifest.json next to them.",
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=parse_size,
+        default=None,
+        metavar="SIZE",
+        help="Split each sub-collection into shard files of at most SIZE bytes "
+        "(e.g. 500K, 64M or 1G), listed in a manifest.json next to them.",
+    )
+    parser.add_argument(
+        "--only",
+        type=parse_only,
+        default=None,
+        metavar="NAMES",
+        help="Regenerate only these comma-separated collections (or generators, "
+        "e.g. financials), leaving every other file as it is. Generators they "
+        "depend on, such as prescriptions for prescription_administration, are "
+        "read back from their files when those exist instead of being rerun. "
+        "The seed, date, residents and output settings of the last full run "
+        "are reused.",
+    )
+    parser.add_argument(
+        "--advance",
+        action="store_true",
+        help="Append the medication administrations, observations and tasks "
+        "between the last run and --as-of (default: today) to the existing files "
+        "instead of regenerating everything. Reuses the last full run's seed, "
+        "format and sharding.",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help=f"Reuse per-resident generator output cached in {CACHE_FILE} and only "
+        "rewrite the collection files whose content changed.",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=PROFILE_DIR,
+        default=None,
+        metavar="DIR",
+        help="Time each generator, each collection's writes and the final close "
+        "in a single process and write the per-stage breakdown to DIR "
+        f"(default: {PROFILE_DIR}).",
+    )
+    parser.add_argument(
+        "--profile-stacks",
+        action="store_true",
+        help="With --profile, run cProfile and sample stacks instead, writing "
+        "cProfile stats and collapsed stacks (for flamegraphs). Their overhead "
+        "skews stage times, so no breakdown is written.",
+    )
+    return parser.parse_args()
+
+
+# --- Main Script ---
+if __name__ == "__main__":
+    args = parse_args()
+    if args.only:
+        use_last_run_settings(args)
+    args.format = args.format or "json"
+    args.goals = args.goals or "per-resident"
+    seed = (
+        args.seed if args.seed is not None else random.SystemRandom().randrange(2**32)
+    )
+    as_of = args.as_of or datetime.now(pytz.utc).date()
+    if args.advance:
+        advance(as_of, args.snomed_release, args.loinc_release)
+        exit(0)
+    if args.profile_stacks and not args.profile:
+        args.profile = PROFILE_DIR
+    if args.profile and args.workers > 1:
+        print("Profiling runs in a single process; ignoring --workers.")
+        args.workers = 1
+    print(f"Generating with seed {seed} as of {as_of} using {args.workers} worker(s).")
+
+    residents_file = (
+        SYNTHETIC_RESIDENTS_FILE if args.residents is not None else RESIDENTS_FILE
+    )
+    os.makedirs(os.path.dirname(residents_file), exist_ok=True)
+
+    if args.residents is not None:
+        # --- Synthesize Residents ---
+        facility_ids = load_facility_ids()
+        # Reuse the avatars of the existing residents, if there are any
+        avatar_urls = []
+        if os.path.exists(RESIDENTS_FILE):
+            with open(RESIDENTS_FILE, "r") as f:
+                avatar_urls = sorted(
+                    {r["data"]["avatar_url"] for r in json.load(f)} - {None, ""}
+                )
+
+        def load_residents():
+            return synthesize_residents(args.residents, facility_ids, avatar_urls, seed)
+
+        print(f"Synthesizing {args.residents} residents.")
+    else:
+        try:
+            with open(RESIDENTS_FILE, "r") as f:
+                residents_data = json.load(f)
+        except FileNotFoundError:
+            print(f"Error: Residents file not found at {RESIDENTS_FILE}.")
+            exit(1)
+
+        def load_residents():
+            return residents_data
+
+    try:
+        context = build_context(
+            seed,
+            as_of,
+            args.format,
+            args.goals,
+            args.snomed_release,
+            args.loinc_release,
+            args.vitals_interval,
         )
-        episodes_of_care_data = generate_episodes_of_care_for_resident(resident_id)
-        all_episodes_of_care.extend(episodes_of_care_data)
-        all_goals.extend(goal_data["goals"])
-        all_goal_ids.extend(goal_data["goal_ids"])
-        care_plan_data = generate_care_plans_for_resident(
-            resident_id, STAFF_IDS, START_DATE, effective_end_date, all_goal_ids # Use general effective_end_date for clinical
+    except FileNotFoundError as e:
+        # Given releases were checked by parse_args, so --only's recorded one has gone
+        print(f"Error: {e} (used by the last full run).")
+        exit(1)
+    context["cache_path"] = CACHE_FILE if args.cache else None
+    context["shard_records"] = args.shard_records
+    context["shard_bytes"] = args.shard_size
+    sharded = bool(args.shard_records or args.shard_size)
+
+    def collection_path(sub_dir):
+        return output_path(
+            os.path.join(SUBCOLLECTIONS_DIR, SUBCOLLECTION_FILES[sub_dir]),
+            args.format,
+            sharded,
         )
-        all_care_plans.extend(care_plan_data["care_plans"])
-        all_care_plan_activities.extend(care_plan_data["care_plan_activities"])
-        all_addresses.extend(generate_address_for_resident(resident_id))
-        all_identifiers.extend(
-            generate_identifiers_for_resident(
-                resident_id, resident["data"]["resident_code"]
-            )
+
+    # --- Work Out Which Sub-Collection Files are Stale ---
+    selected = args.only or list(SUBCOLLECTION_FILES)
+    stale = list(selected)
+    if args.cache:
+        context["generator_fingerprints"] = generator_fingerprints(context)
+        planned = plan_collections(load_residents(), context)
+        cache = GenerationCache(CACHE_FILE)
+        stale = [
+            sub_dir
+            for sub_dir in selected
+            if not os.path.exists(collection_path(sub_dir))
+            or cache.output_fingerprint(collection_path(sub_dir)) != planned[sub_dir]
+        ]
+        print(
+            f"{len(selected) - len(stale)} collection(s) up to date; "
+            f"regenerating: {', '.join(stale) or 'none'}."
         )
-        financial_data = generate_financial_data_for_resident(
-            resident_id, resident["data"]["resident_name"], START_DATE, effective_financial_end_date # Use financial effective_end_date
+
+    # --- Reuse Upstream Output for Selected Collections ---
+    if args.only:
+        context["upstream_records"] = {}
+        for step in required_generators(args.only):
+            # A generator writing a selected collection runs in full
+            if "load" not in step or set(step["collections"]) & set(args.only):
+                continue
+            paths = {name: COLLECTION_FILES[name] for name in step["collections"]}
+            if all(collection_files(path) for path in paths.values()):
+                context["upstream_records"][step["name"]] = read_outputs(step, paths)
+        print(
+            f"Generating only {', '.join(stale) or 'nothing'}; reading "
+            f"{', '.join(context['upstream_records']) or 'no generators'} back from disk."
         )
-        all_accounts.extend(financial_data["accounts"])
-        all_charges.extend(financial_data["charges"])
-        all_claims.extend(financial_data["claims"])
-        all_coverages.extend(financial_data["coverages"])
-        all_payments.extend(financial_data["payments"])
-        all_adjustments.extend(financial_data["adjustments"])
-
-        all_tasks.extend(
-            generate_tasks_for_resident(resident_id, STAFF_IDS, START_DATE, effective_end_date) # Use general effective_end_date for clinical
+
+    # --- Stream Residents and Sub-Collections to their Files ---
+    # Every record is written as soon as it is generated; nothing is accumulated.
+    # How far each resident's events go is recorded for later --advance runs.
+    state = AdvanceState(ADVANCE_FILE)
+    if not args.only:
+        state.reset(
+            {
+                "seed": seed,
+                "as_of": as_of.isoformat(),
+                "output_format": args.format,
+                "goal_mode": args.goals,
+                "vitals_interval": args.vitals_interval,
+                "shard_records": args.shard_records,
+                "shard_bytes": args.shard_size,
+                "residents": args.residents,
+                "residents_file": residents_file,
+                "snomed_release": args.snomed_release,
+                "loinc_release": args.loinc_release,
+            }
         )
-        all_procedures.extend(
-            generate_procedures_for_resident(
-                resident_id,
-                resident["data"]["resident_name"],
-                STAFF_IDS,
-                START_DATE,
-                effective_end_date, # Use general effective_end_date for clinical
+    advanced = [
+        sub_dir for sub_dir in ADVANCE_COLLECTIONS if not args.only or sub_dir in stale
+    ]
+    writer_class = WRITERS[args.format]
+    if args.profile:
+        profiling.start(args.profile_stacks)
+    with ExitStack() as stack:
+        writers = {}
+        for sub_dir in stale:
+            sub_file = SUBCOLLECTION_FILES[sub_dir]
+            # Ensure the directory exists (e.g., 'demo-data/allergies')
+            os.makedirs(
+                os.path.join(SUBCOLLECTIONS_DIR, os.path.dirname(sub_file)),
+                exist_ok=True,
             )
-        )
-        all_encounters.extend(
-            generate_encounters_for_resident(
-                resident_id,
-                resident["data"]["resident_name"],
-                STAFF_IDS,
-                START_DATE,
-                effective_end_date, # Use general effective_end_date for clinical
-                choice(episodes_of_care_data)["id"],
+            # Write to the full path (e.g., 'demo-data/allergies/data-plain.json'),
+            # or to numbered shards of it and a manifest
+            writers[sub_dir] = stack.enter_context(
+                open_writer(
+                    os.path.join(SUBCOLLECTIONS_DIR, sub_file),
+                    args.format,
+                    args.shard_records,
+                    args.shard_size,
+                )
+            )
+        # Selective runs leave the residents file alone, like every other
+        # collection they weren't asked for
+        residents_writer = None
+        if not args.only:
+            residents_writer = stack.enter_context(
+                writer_class(output_path(residents_file, args.format))
+            )
+        for resident in generate_residents(
+            load_residents(), context, writers, args.workers
+        ):
+            if residents_writer:
+                with profiling.stage("write:residents"):
+                    residents_writer.write(resident)
+            until = resident_end_date(resident, context)
+            state.set_watermarks(
+                resident["id"], {sub_dir: until for sub_dir in advanced}
             )
-        )
-
-    # --- Write Updated Residents Data Back to File ---
-    os.makedirs(os.path.dirname(RESIDENTS_FILE), exist_ok=True)
-    with open(RESIDENTS_FILE, "w") as f:
-        residents_data=convert_times(residents_data)
-        json.dump(residents_data, f, indent=2) # Use default=str for datetime objects
 
-    print("Resident data updated with created_at and deactivated_at.")
+        # Closing the writers moves the finished files into place
+        with profiling.stage("close"):
+            stack.close()
+    state.close()
 
-    # --- Write Sub-Collection Files (Corrected Pathing) ---
-    for sub_dir, sub_file in SUBCOLLECTION_FILES.items():
-        # Ensure the directory exists (e.g., 'demo-data/allergies')
-        os.makedirs(
-            os.path.join(SUBCOLLECTIONS_DIR, os.path.dirname(sub_file)), exist_ok=True
-        )
-        data_map = {
-            "allergies": all_allergies,
-            "prescriptions": all_prescriptions,
-            "observations": all_observations,
-            "diagnostic_history": all_diagnostic_history,
-            "prescription_administration": all_prescription_administration,
-            "episodes_of_care": all_episodes_of_care,
-            "care_plans": all_care_plans,
-            "care_plan_activities": all_care_plan_activities,
-            "identifiers": all_identifiers,
-            "accounts": all_accounts,
-            "charges": all_charges,
-            "claims": all_claims,
-            "coverages": all_coverages,
-            "payments": all_payments,
-            "adjustments": all_adjustments,
-            "tasks": all_tasks,
-            "procedures": all_procedures,
-            "encounters": all_encounters,
-            "goals": all_goals,
-            "addresses": all_addresses,
-        }
-        if sub_dir in data_map:
-            # Write to the full path (e.g., 'demo-data/allergies/data-plain.json')
-            with open(os.path.join(SUBCOLLECTIONS_DIR, sub_file), "w") as f:
-                data = convert_times(data_map[sub_dir])
-                json.dump(data, f, indent=2)
+    if args.cache:
+        for sub_dir in stale:
+            cache.set_output_fingerprint(collection_path(sub_dir), planned[sub_dir])
+        cache.close()
 
+    if args.residents is not None and not args.only:
+        print(f"Synthesized residents written to {residents_file}.")
+    elif not args.only:
+        print("Resident data updated with created_at and deactivated_at.")
     print("FHIR-Aligned Demo data generation complete.")
+
+    if args.profile:
+        profiler = profiling.stop()
+        if not args.profile_stacks:
+            print(profiler.breakdown())
+        for path in profiler.write(args.profile):
+            print(f"Wrote {path}")
@@ -12,12 +12,12 @@ CITIES = ["Lagos", "Abuja", "Kano", "Ibadan", "Port Harcourt"]
 STATES = ["Lagos", "FCT", "Kano", "Oyo", "Rivers"]
 
 
-def generate_address_for_resident(resident_id: str) -> list:
+def generate_address_for_resident(resident_id: str, rng: random.Random) -> list:
     """Generates a single, structured address for a resident."""
-    street_number = random.randint(1, 200)
-    street_name = random.choice(STREET_NAMES)
-    city = random.choice(CITIES)
-    state = random.choice(STATES)
+    street_number = rng.randint(1, 200)
+    street_name = rng.choice(STREET_NAMES)
+    city = rng.choice(CITIES)
+    state = rng.choice(STATES)
 
     address = {
         "id": f"addr_{resident_id}",
@@ -28,7 +28,7 @@ def generate_address_for_resident(resident_id: str) -> list:
             "line": [f"{street_number} {street_name}"],
             "city": city,
             "state": state,
-            "postalCode": str(random.randint(100000, 999999)),
+            "postalCode": str(rng.randint(100000, 999999)),
             "country": "NGN",
         },
     }
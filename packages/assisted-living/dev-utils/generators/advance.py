@@ -0,0 +1,202 @@
+import json
+import os
+import sqlite3
+from datetime import datetime
+from . import observations, prescription_administration, tasks
+from .pipeline import GENERATORS
+from .utils import make_rng
+
+
+class AdvanceState:
+    """What a time-advance run needs to know about the runs before it.
+
+    Holds the settings of the last full run (seed, date, output format and
+    sharding), which reproduce the inputs events are generated from, and for
+    every resident and event collection the time events have been generated
+    up to.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks ("
+            "resident_id TEXT, collection TEXT, generated_until TEXT, "
+            "PRIMARY KEY (resident_id, collection))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._db.commit()
+
+    def settings(self) -> dict:
+        rows = self._db.execute("SELECT name, value FROM settings").fetchall()
+        return {name: json.loads(value) for name, value in rows}
+
+    def reset(self, settings: dict):
+        """Starts over for a full run with settings."""
+        self._db.execute("DELETE FROM watermarks")
+        self._db.execute("DELETE FROM settings")
+        self._db.executemany(
+            "INSERT INTO settings VALUES (?, ?)",
+            [(name, json.dumps(value)) for name, value in settings.items()],
+        )
+
+    def watermarks(self, resident_id: str) -> dict:
+        rows = self._db.execute(
+            "SELECT collection, generated_until FROM watermarks WHERE resident_id = ?",
+            (resident_id,),
+        ).fetchall()
+        return {collection: datetime.fromisoformat(until) for collection, until in rows}
+
+    def set_watermarks(self, resident_id: str, watermarks: dict):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)",
+            [
+                (resident_id, collection, until.isoformat())
+                for collection, until in watermarks.items()
+            ],
+        )
+
+    def commit(self):
+        self._db.commit()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+
+# --- Event Windows ---
+# Each takes (resident, since, until, history, rng) and returns the events
+# after since and up to until. history holds the resident's span and inputs
+# from the full run, so events continue the history it generated.
+def _events_in_window(count_range: tuple, since, until, history, rng) -> int:
+    """How many events fall in the window, at the rate the full run had.
+
+    Events arrive as a Poisson process, so consecutive windows add up to the
+    same distribution as one window spanning them.
+    """
+    history_seconds = (history["end_date"] - history["start_date"]).total_seconds()
+    rate = (sum(count_range) / 2) / history_seconds
+    window_seconds = (until - since).total_seconds()
+    count = 0
+    elapsed = rng.expovariate(rate)
+    while elapsed < window_seconds:
+        count += 1
+        elapsed += rng.expovariate(rate)
+    return count
+
+
+def _advance_prescription_administration(resident, since, until, history, rng):
+    prescriptions = next(step for step in GENERATORS if step["name"] == "prescriptions")
+    # The full run's prescriptions, reproduced from their own stream
+    resident_prescriptions = prescriptions["run"](
+        resident,
+        {"end_date": history["end_date"]},
+        history["context"],
+        make_rng(history["context"]["seed"], resident["id"], "prescriptions"),
+        {},
+    )["prescriptions"]
+    return (
+        prescription_administration.generate_prescription_administration_for_resident(
+            resident["id"],
+            resident_prescriptions,
+            history["context"]["staff_ids"],
+            until,
+            rng,
+            after=since,
+        )
+    )
+
+
+def _advance_observations(resident, since, until, history, rng):
+    context = history["context"]
+    if context["vitals_interval"]:
+        # The series keep the full run's schedule and baselines
+        return observations.generate_vital_series_for_resident(
+            resident["id"],
+            context["staff_ids"],
+            history["start_date"],
+            until,
+            context["loinc_codes"],
+            context["vitals_interval"],
+            observations.vital_baselines(
+                context["loinc_codes"],
+                make_rng(context["seed"], resident["id"], "vital_baselines"),
+            ),
+            rng,
+            after=since,
+        )
+    return observations.generate_observations_for_resident(
+        resident["id"],
+        history["context"]["staff_ids"],
+        since,
+        until,
+        history["context"]["loinc_codes"],
+        rng,
+        _events_in_window(
+            observations.OBSERVATION_COUNT_RANGE, since, until, history, rng
+        ),
+    )
+
+
+def _advance_tasks(resident, since, until, history, rng):
+    return tasks.generate_tasks_for_resident(
+        resident["id"],
+        history["context"]["staff_ids"],
+        since,
+        until,
+        rng,
+        _events_in_window(tasks.TASK_COUNT_RANGE, since, until, history, rng),
+    )
+
+
+# The collections a time-advance run appends to
+ADVANCERS = {
+    "prescription_administration": _advance_prescription_administration,
+    "observations": _advance_observations,
+    "tasks": _advance_tasks,
+}
+ADVANCE_COLLECTIONS = list(ADVANCERS)
+
+
+def resident_end_date(resident: dict, context: dict) -> datetime:
+    """When a prepared resident's events stop: deactivation, or the run's end."""
+    deactivated_at = resident["data"]["deactivated_at"]
+    if isinstance(deactivated_at, str):
+        deactivated_at = datetime.fromisoformat(deactivated_at)
+    return deactivated_at or context["end_date"]
+
+
+def advance_resident(
+    resident: dict, context: dict, base_context: dict, state: AdvanceState, writers
+) -> int:
+    """Appends a resident's events since their watermarks to writers.
+
+    resident is as the full run wrote it; base_context is that run's context
+    and context this one's. Each window draws from its own stream, keyed by
+    where it starts, so rerunning an advance that didn't complete repeats it
+    exactly. Returns the number of events appended.
+    """
+    history = {
+        "context": base_context,
+        "start_date": base_context["start_date"],
+        "end_date": resident_end_date(resident, base_context),
+    }
+    until = resident_end_date(resident, context)
+    watermarks = state.watermarks(resident["id"])
+    appended = 0
+    for collection, since in watermarks.items():
+        if collection not in writers or until <= since:
+            continue
+        rng = make_rng(
+            context["seed"], resident["id"], collection, "advance", since.isoformat()
+        )
+        for record in ADVANCERS[collection](resident, since, until, history, rng):
+            writers[collection].write(record)
+            appended += 1
+        watermarks[collection] = until
+    state.set_watermarks(resident["id"], watermarks)
+    return appended
@@ -2,6 +2,7 @@ import random
 from datetime import datetime
 from .utils import generate_uuid, get_random_datetime
 from .config import ALLERGY_STATUSES, ALLERGY_TYPES
+from .terminology import Terminology
 
 
 def generate_allergies_for_resident(
@@ -9,11 +10,12 @@ def generate_allergies_for_resident(
     staff_ids: list,
     start_date: datetime,
     end_date: datetime,
-    snomed_allergy_names: list,
-    snomed_allergy_reactions: list,
-    snomed_allergy_substances: list,
+    snomed_allergy_names: Terminology,
+    snomed_allergy_reactions: Terminology,
+    snomed_allergy_substances: Terminology,
+    rng: random.Random,
 ) -> list:
-    num_allergies = random.randint(0, 2)
+    num_allergies = rng.randint(0, 2)
     allergies = []
     for i in range(num_allergies):
         if (
@@ -26,33 +28,27 @@ def generate_allergies_for_resident(
             substance = snomed_allergy_substances[i % len(snomed_allergy_substances)]
             allergies.append(
                 {
-                    "id": generate_uuid(),
+                    "id": generate_uuid(rng),
                     "data": {
                         "resident_id": resident_id,
-                        "recorder_id": random.choice(staff_ids),
-                        "clinical_status": random.choice(ALLERGY_STATUSES["clinical"]),
-                        "verification_status": random.choice(
+                        "recorder_id": rng.choice(staff_ids),
+                        "clinical_status": rng.choice(ALLERGY_STATUSES["clinical"]),
+                        "verification_status": rng.choice(
                             ALLERGY_STATUSES["verification"]
                         ),
                         "name": {
-                            "coding": allergy_name,
-                            "text": allergy_name[0]["display"],
+                            "coding": [snomed_allergy_names.coding(allergy_name)],
+                            "text": allergy_name["display"],
                         },
-                        "type": random.choice(ALLERGY_TYPES),
-                        "recorded_date": get_random_datetime(start_date, end_date),
+                        "type": rng.choice(ALLERGY_TYPES),
+                        "recorded_date": get_random_datetime(start_date, end_date, rng),
                         "substance": {
-                            "coding": substance,
-                            "text": substance[0]["display"],
+                            "coding": [snomed_allergy_substances.coding(substance)],
+                            "text": substance["display"],
                         },
                         "reaction": {
                             "code": {
-                                "coding": [
-                                    {
-                                        "system": "http://snomed.info/sct",
-                                        "code": reaction["code"],
-                                        "display": reaction["display"],
-                                    }
-                                ],
+                                "coding": [snomed_allergy_reactions.coding(reaction)],
                                 "text": reaction["display"],
                             },
                             "severity": reaction["severity"],
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+
+
+def fingerprint(*parts) -> str:
+    """Hashes JSON-able parts (datetimes included) into a stable hex digest."""
+    encoded = json.dumps(parts, default=str, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def file_fingerprint(*paths) -> str:
+    hasher = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+class GenerationCache:
+    """On-disk cache of per-resident, per-generator output.
+
+    Each resident keeps only the latest entry per generator, stored with the
+    key it was generated under; a lookup with any other key is a miss. The
+    cache also remembers the fingerprint each output file was last written
+    with, so unchanged files can be left alone. Several processes may share
+    one cache file.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "resident_id TEXT, generator TEXT, key TEXT, payload BLOB, "
+            "PRIMARY KEY (resident_id, generator))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outputs (path TEXT PRIMARY KEY, fingerprint TEXT)"
+        )
+        self._db.commit()
+
+    def get(self, resident_id: str, generator: str, key: str):
+        row = self._db.execute(
+            "SELECT payload FROM entries WHERE resident_id = ? AND generator = ? AND key = ?",
+            (resident_id, generator, key),
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def put(self, resident_id: str, generator: str, key: str, outputs: dict):
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+            (
+                resident_id,
+                generator,
+                key,
+                pickle.dumps(outputs, protocol=pickle.HIGHEST_PROTOCOL),
+            ),
+        )
+
+    def commit(self):
+        self._db.commit()
+
+    def output_fingerprint(self, path: str):
+        row = self._db.execute(
+            "SELECT fingerprint FROM outputs WHERE path = ?", (path,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_output_fingerprint(self, path: str, value: str):
+        self._db.execute("INSERT OR REPLACE INTO outputs VALUES (?, ?)", (path, value))
+        self._db.commit()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
@@ -9,19 +9,23 @@ def generate_care_plans_for_resident(
     staff_ids: list,
     start_date: datetime,
     end_date: datetime,
-    all_goal_ids: list,
+    goal_ids: list,
+    rng: random.Random,
 ) -> dict:
-    """Generates a denormalized set of care plan data for a resident."""
+    """Generates a denormalized set of care plan data for a resident.
+
+    goal_ids is the resident's own goal index; care plans only ever reference
+    the resident's goals, so the cost per resident doesn't grow with the
+    population.
+    """
     care_plans = []
     care_plan_activities = []
 
     # 1. Create the main Care Plan
-    care_plan_id = generate_uuid()
+    care_plan_id = generate_uuid(rng)
 
-    # 2. Select a random subset of goal IDs to reference
-    selected_goal_ids = random.sample(
-        all_goal_ids, k=min(len(all_goal_ids), random.randint(2, 3))
-    )
+    # 2. Select a random subset of the resident's goal IDs to reference
+    selected_goal_ids = rng.sample(goal_ids, k=min(len(goal_ids), rng.randint(2, 3)))
 
     care_plan = {
         "id": care_plan_id,
@@ -29,18 +33,18 @@ def generate_care_plans_for_resident(
             "resident_id": resident_id,
             "status": "active",
             "title": f"Personalized Care Plan - {start_date.now().year}",
-            "author_id": random.choice(staff_ids),
-            "created_date": get_random_datetime(start_date, end_date),
+            "author_id": rng.choice(staff_ids),
+            "created_date": get_random_datetime(start_date, end_date, rng),
             "goal_ids": selected_goal_ids,  # Reference top-level goals
         },
     }
     care_plans.append(care_plan)
 
     # 3. Generate Activities linked to the Care Plan
-    selected_activities = random.sample(CARE_PLAN_ACTIVITIES, random.randint(3, 5))
+    selected_activities = rng.sample(CARE_PLAN_ACTIVITIES, rng.randint(3, 5))
     for act_template in selected_activities:
         activity = {
-            "id": generate_uuid(),
+            "id": generate_uuid(rng),
             "data": {
                 "careplan_id": care_plan_id,
                 "code": {
@@ -65,4 +69,3 @@ def generate_care_plans_for_resident(
         "care_plans": care_plans,
         "care_plan_activities": care_plan_activities,
     }
-
@@ -1037,3 +1037,75 @@ VITAL_RANGES = {
         },
     },
 }
+
+# --- Billing ---
+# Services billed to every resident each month. "monthly" services are billed
+# once on the 1st with the given probability; "ad-hoc" services happen on a
+# random day, quantity_range times. Prices of "fixed_price" services are drawn
+# once per resident and held for the whole period. "insured" charges are
+# claimed against the resident's coverage; the rest are paid out of pocket.
+BILLING_SERVICES = [
+    {
+        "service": "Monthly Rent",
+        "schedule": "monthly",
+        "probability": 1.0,
+        "price_range": (80000, 150000),
+        "quantity_range": (1, 1),
+        "fixed_price": True,
+        "insured": False,
+    },
+    {
+        "service": "Medication Fee",
+        "schedule": "monthly",
+        "probability": 0.9,
+        "price_range": (5000, 40000),
+        "quantity_range": (1, 1),
+        "fixed_price": False,
+        "insured": True,
+    },
+    {
+        "service": "Activities Fee",
+        "schedule": "monthly",
+        "probability": 0.6,
+        "price_range": (2000, 10000),
+        "quantity_range": (1, 1),
+        "fixed_price": True,
+        "insured": False,
+    },
+    {
+        "service": "Physical Therapy",
+        "schedule": "ad-hoc",
+        "probability": 0.5,
+        "price_range": (5000, 15000),
+        "quantity_range": (1, 4),
+        "fixed_price": False,
+        "insured": True,
+    },
+    {
+        "service": "Specialist Consultation",
+        "schedule": "ad-hoc",
+        "probability": 0.2,
+        "price_range": (15000, 60000),
+        "quantity_range": (1, 2),
+        "fixed_price": False,
+        "insured": True,
+    },
+    {
+        "service": "Transportation",
+        "schedule": "ad-hoc",
+        "probability": 0.3,
+        "price_range": (3000, 12000),
+        "quantity_range": (1, 3),
+        "fixed_price": False,
+        "insured": False,
+    },
+]
+# Share of an insured claim the insurer pays, and the share written off as a
+# contractual adjustment; the resident owes the rest as coinsurance
+INSURER_SHARE_RANGE = (0.7, 0.9)
+CONTRACTUAL_ADJUSTMENT_RANGE = (0.02, 0.1)
+# Days from month end to the claim, from claim to settlement, and from a bill
+# to the resident paying it
+CLAIM_DELAY_DAYS = (1, 10)
+SETTLEMENT_DELAY_DAYS = (7, 45)
+PAYMENT_DELAY_DAYS = (5, 25)
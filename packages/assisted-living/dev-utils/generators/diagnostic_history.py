@@ -3,6 +3,7 @@ import random
 from datetime import datetime
 from .utils import generate_uuid, get_random_datetime
 from .config import CONDITION_STATUSES
+from .terminology import Terminology
 
 
 def generate_diagnostic_history_for_resident(
@@ -10,9 +11,10 @@ def generate_diagnostic_history_for_resident(
     staff_ids: list,
     start_date: datetime,
     end_date: datetime,
-    snomed_disorders: list,
+    snomed_disorders: Terminology,
+    rng: random.Random,
 ) -> list:
-    num_disorders = random.randint(1, 3)
+    num_disorders = rng.randint(1, 3)
     diagnostic_history = []
 
     min_recorded_date = pytz.utc.localize(datetime(year=2020, month=1, day=1))
@@ -21,31 +23,31 @@ def generate_diagnostic_history_for_resident(
 
     for _ in range(num_disorders):
         if snomed_disorders:
-            disorder_example = random.choice(snomed_disorders)
-            clinical_status = random.choice(CONDITION_STATUSES)
+            disorder_example = rng.choice(snomed_disorders)
+            clinical_status = rng.choice(CONDITION_STATUSES)
             abatement_date = (
-                get_random_datetime(start_date, end_date)
+                get_random_datetime(start_date, end_date, rng)
                 if clinical_status == "resolved"
                 else None
             )
             diagnostic_history.append(
                 {
-                    "id": generate_uuid(),
+                    "id": generate_uuid(rng),
                     "data": {
                         "resident_id": resident_id,
-                        "title": disorder_example[0]["display"],
-                        "recorder_id": random.choice(staff_ids),
+                        "title": disorder_example["display"],
+                        "recorder_id": rng.choice(staff_ids),
                         "clinical_status": clinical_status,
                         "recorded_date": get_random_datetime(
-                            min_recorded_date, end_date
+                            min_recorded_date, end_date, rng
                         ),
                         "onset_datetime": get_random_datetime(
-                            min_onset_date, max_onset_date
+                            min_onset_date, max_onset_date, rng
                         ),
                         "abatement_datetime": abatement_date,
                         "code": {
-                            "coding": disorder_example,
-                            "text": disorder_example[0]["display"],
+                            "coding": [snomed_disorders.coding(disorder_example)],
+                            "text": disorder_example["display"],
                         },
                     },
                 }
@@ -11,25 +11,26 @@ def generate_encounters_for_resident(
     start_date: datetime,
     end_date: datetime,
     episodes_of_care_id: str,
+    rng: random.Random,
 ) -> list:
     """Generates a list of encounters for a resident."""
-    num_encounters = random.randint(1, 5)
+    num_encounters = rng.randint(1, 5)
     encounters = []
 
     for _ in range(num_encounters):
-        encounter_type = random.choice(ENCOUNTER_TYPES)
-        encounter_start = get_random_datetime(start_date, end_date)
-        encounter_end = encounter_start + timedelta(hours=random.randint(1, 4))
+        encounter_type = rng.choice(ENCOUNTER_TYPES)
+        encounter_start = get_random_datetime(start_date, end_date, rng)
+        encounter_end = encounter_start + timedelta(hours=rng.randint(1, 4))
 
         encounter = {
-            "id": generate_uuid(),
+            "id": generate_uuid(rng),
             "data": {
                 "subject": {"id": resident_id, "name": resident_name},
-                "status": random.choice(ENCOUNTER_STATUSES),
+                "status": rng.choice(ENCOUNTER_STATUSES),
                 "type": {"coding": [encounter_type], "text": encounter_type["display"]},
                 "period": {"start": encounter_start, "end": encounter_end},
                 "episodes_of_care_id": episodes_of_care_id,
-                "participant_id": random.choice(staff_ids),
+                "participant_id": rng.choice(staff_ids),
                 "recorded_at": encounter_start,
             },
         }
@@ -5,31 +5,33 @@ from .utils import generate_uuid, get_random_datetime
 from .config import EPISODE_STATUSES
 
 
-def generate_episodes_of_care_for_resident(resident_id: str) -> list:
+def generate_episodes_of_care_for_resident(
+    resident_id: str, rng: random.Random
+) -> list:
     episodes_of_care = []
-    num_historical_episodes = random.randint(0, 1)
+    num_historical_episodes = rng.randint(0, 1)
 
     for _ in range(num_historical_episodes):
-        start_year = random.randint(2018, 2022)
-        end_year = random.randint(start_year + 1, 2023)
+        start_year = rng.randint(2018, 2022)
+        end_year = rng.randint(start_year + 1, 2023)
 
         episode_start = pytz.utc.localize(
-            datetime(start_year, random.randint(1, 12), random.randint(1, 28))
+            datetime(start_year, rng.randint(1, 12), rng.randint(1, 28))
         )
         episode_end = pytz.utc.localize(
-            datetime(end_year, random.randint(1, 12), random.randint(1, 28))
+            datetime(end_year, rng.randint(1, 12), rng.randint(1, 28))
         )
 
         if episode_end <= episode_start:
-            episode_end = episode_start + timedelta(days=random.randint(30, 365))
+            episode_end = episode_start + timedelta(days=rng.randint(30, 365))
 
         episodes_of_care.append(
             {
-                "id": generate_uuid(),
+                "id": generate_uuid(rng),
                 "data": {
                     "resident_id": resident_id,
-                    "status": random.choice(["finished", "cancelled"]),
-                    "type": random.choice(
+                    "status": rng.choice(["finished", "cancelled"]),
+                    "type": rng.choice(
                         [
                             {
                                 "code": "pac",
@@ -55,10 +57,10 @@ def generate_episodes_of_care_for_resident(resident_id: str) -> list:
                     ),
                     "period": {
                         "start": get_random_datetime(
-                            episode_start, episode_start + timedelta(days=7)
+                            episode_start, episode_start + timedelta(days=7), rng
                         ),
                         "end": get_random_datetime(
-                            episode_end, episode_end + timedelta(days=7)
+                            episode_end, episode_end + timedelta(days=7), rng
                         ),
                     },
                     "managing_organization": "Golden Years Retreat Homes",
@@ -67,18 +69,18 @@ def generate_episodes_of_care_for_resident(resident_id: str) -> list:
         )
 
     current_start_date = pytz.utc.localize(
-        datetime(2023, random.randint(1, 6), random.randint(1, 28))
+        datetime(2023, rng.randint(1, 6), rng.randint(1, 28))
     )
     episodes_of_care.append(
         {
-            "id": generate_uuid(),
+            "id": generate_uuid(rng),
             "data": {
                 "resident_id": resident_id,
                 "status": "active",
                 "type": "Long Term Care",
                 "period": {
                     "start": get_random_datetime(
-                        current_start_date, current_start_date + timedelta(days=30)
+                        current_start_date, current_start_date + timedelta(days=30), rng
                     ),
                     "end": None,
                 },
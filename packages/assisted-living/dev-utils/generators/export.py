@@ -0,0 +1,150 @@
+import os
+import sqlite3
+from itertools import islice
+from .transform import collection_files, iter_collection
+
+# Rows inserted per transaction
+BATCH_SIZE = 10000
+
+# --- Hot Columns ---
+# Fields pulled out of data into typed, indexed columns. The first field a
+# record has is used; records with none of them get NULL.
+RESIDENT_FIELDS = ["resident_id", "beneficiary_id", "subject.id"]
+TIME_FIELDS = [
+    "effective_datetime",
+    "occurrence_datetime",
+    "onset_datetime",
+    "authored_on",
+    "recorded_date",
+    "recorded_at",
+    "created_date",
+    "created_at",
+    "period.start",
+    "requested_period.start",
+    "occurrence.start",
+]
+STATUS_FIELDS = ["status", "clinical_status", "lifecycle_status"]
+# A CodeableConcept's first code (coding may be a list or a single coding),
+# or a plain code
+CODE_FIELDS = [
+    "code.coding[0].code",
+    "code.coding.code",
+    "medication.code.coding[0].code",
+    "activity_code",
+]
+
+# Collections whose records only reach their resident through a parent
+# record: (field holding the parent's id, parent collection). Their resident
+# and time columns are copied from the parent once both tables are loaded.
+PARENTS = {"care_plan_activities": ("careplan_id", "care_plans")}
+
+COLUMNS = ["id", "data", "resident_id", "effective_datetime", "status", "code"]
+
+
+def _first_of(fields: list) -> str:
+    """SQL for the first of fields that data has."""
+    paths = ", ".join(f"json_extract(data, '$.{field}')" for field in fields)
+    return f"coalesce({paths})"
+
+
+def create_table_sql(collection: str) -> str:
+    """The table for a collection: id, data as JSON, and generated hot columns.
+
+    The hot columns are computed by SQLite from data as rows are inserted
+    (and stored), so records go in as JSON text and are never decoded here.
+    Timestamps are normalized to the generators' UTC "Z" form, which sorts
+    as text. For collections in PARENTS, resident_id and effective_datetime
+    are plain columns, filled in by resolve_parent_sql.
+    """
+    resident_id = "id" if collection == "residents" else _first_of(RESIDENT_FIELDS)
+    if collection in PARENTS:
+        resident_columns = "resident_id TEXT, effective_datetime TEXT, "
+    else:
+        resident_columns = (
+            f"resident_id TEXT GENERATED ALWAYS AS ({resident_id}) STORED, "
+            "effective_datetime TEXT GENERATED ALWAYS AS "
+            f"(replace({_first_of(TIME_FIELDS)}, '+00:00', 'Z')) STORED, "
+        )
+    return (
+        f"CREATE TABLE {collection} ("
+        "id TEXT, "
+        "data JSON, "
+        f"{resident_columns}"
+        f"status TEXT GENERATED ALWAYS AS ({_first_of(STATUS_FIELDS)}) STORED, "
+        f"code TEXT GENERATED ALWAYS AS ({_first_of(CODE_FIELDS)}) STORED)"
+    )
+
+
+def resolve_parent_sql(collection: str) -> str:
+    """Copies each record's resident and time from its parent (see PARENTS)."""
+    field, parent = PARENTS[collection]
+    return (
+        f"UPDATE {collection} SET (resident_id, effective_datetime) = "
+        f"(SELECT resident_id, effective_datetime FROM {parent} "
+        f"WHERE {parent}.id = json_extract({collection}.data, '$.{field}'))"
+    )
+
+
+def create_indexes(db, collection: str):
+    db.execute(f"CREATE INDEX {collection}_id ON {collection} (id)")
+    db.execute(
+        f"CREATE INDEX {collection}_resident "
+        f"ON {collection} (resident_id, effective_datetime)"
+    )
+    db.execute(f"CREATE INDEX {collection}_time ON {collection} (effective_datetime)")
+
+
+def export_collections(paths: dict, db_path: str, batch_size: int = BATCH_SIZE) -> dict:
+    """Loads the collections written for paths into one SQLite database at db_path.
+
+    Each collection becomes a table of COLUMNS: the record's id, its data as a
+    JSON column for json_extract(), and the hot fields as typed columns,
+    indexed on resident and time. Records are streamed in as raw JSON text and
+    inserted batch_size to a transaction, and indexes are only built once a
+    table is loaded (for collections in PARENTS, once the parent columns are
+    filled in after every table is loaded). The database is built under a temporary name without a
+    journal and moved into place when complete. Returns the rows loaded per
+    table.
+    """
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    db = sqlite3.connect(tmp_path, isolation_level=None)
+    db.execute("PRAGMA journal_mode=OFF")
+    db.execute("PRAGMA synchronous=OFF")
+    counts = {}
+    try:
+        for collection, path in paths.items():
+            if not collection_files(path):
+                continue
+            db.execute(create_table_sql(collection))
+            insert = (
+                f"INSERT INTO {collection} (id, data) "
+                "VALUES (json_extract(?1, '$.id'), json_extract(?1, '$.data'))"
+            )
+            rows = ((text,) for text in iter_collection(path, raw=True))
+            count = 0
+            while batch := list(islice(rows, batch_size)):
+                db.execute("BEGIN")
+                db.executemany(insert, batch)
+                db.execute("COMMIT")
+                count += len(batch)
+            if collection not in PARENTS:
+                create_indexes(db, collection)
+            counts[collection] = count
+        for collection, (_, parent) in PARENTS.items():
+            if collection not in counts:
+                continue
+            if parent in counts:
+                db.execute("BEGIN")
+                db.execute(resolve_parent_sql(collection))
+                db.execute("COMMIT")
+            create_indexes(db, collection)
+        db.execute("ANALYZE")
+    except BaseException:
+        db.close()
+        os.remove(tmp_path)
+        raise
+    db.close()
+    os.replace(tmp_path, db_path)
+    return counts
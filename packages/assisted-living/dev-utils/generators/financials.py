@@ -1,12 +1,98 @@
 import random
-from .utils import generate_uuid, get_random_datetime
-from datetime import datetime
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from .utils import get_random_datetime, iter_uuids
+from .config import (
+    BILLING_SERVICES,
+    INSURER_SHARE_RANGE,
+    CONTRACTUAL_ADJUSTMENT_RANGE,
+    CLAIM_DELAY_DAYS,
+    SETTLEMENT_DELAY_DAYS,
+    PAYMENT_DELAY_DAYS,
+)
+
+INSURED_SERVICES = {
+    service["service"] for service in BILLING_SERVICES if service["insured"]
+}
+
+
+def money(value: float) -> dict:
+    return {"value": round(value, 2), "currency": "NGN"}
+
+
+def next_month(moment: datetime) -> datetime:
+    """The first instant of the calendar month after moment's."""
+    return moment.replace(
+        year=moment.year + moment.month // 12,
+        month=moment.month % 12 + 1,
+        day=1,
+        hour=0,
+        minute=0,
+        second=0,
+        microsecond=0,
+    )
+
+
+def days_after(moment: datetime, day_range: tuple, rng: random.Random) -> datetime:
+    return moment + timedelta(
+        days=rng.randint(*day_range), seconds=rng.randrange(24 * 60 * 60)
+    )
+
+
+def generate_monthly_charges(
+    resident_id: str,
+    month_start: datetime,
+    month_end: datetime,
+    fixed_prices: dict,
+    ids: Iterator[str],
+    rng: random.Random,
+) -> list:
+    """Bills one month of BILLING_SERVICES; at most one charge per service."""
+    charges = []
+    for service in BILLING_SERVICES:
+        if rng.random() >= service["probability"]:
+            continue
+        name = service["service"]
+        unit_price_value = fixed_prices.get(name) or round(
+            rng.uniform(*service["price_range"]), 2
+        )
+        occurrence = (
+            month_start
+            if service["schedule"] == "monthly"
+            else get_random_datetime(month_start, month_end, rng)
+        )
+        charges.append(
+            {
+                "id": next(ids),
+                "data": {
+                    "resident_id": resident_id,
+                    "service": name,
+                    "quantity": rng.randint(*service["quantity_range"]),
+                    "unit_price": {"value": unit_price_value, "currency": "NGN"},
+                    "occurrence_datetime": occurrence,
+                },
+            }
+        )
+    return charges
 
 
 def generate_financial_data_for_resident(
-    resident_id: str, resident_name: str, start_date: datetime, end_date: datetime
+    resident_id: str,
+    resident_name: str,
+    start_date: datetime,
+    end_date: datetime,
+    rng: random.Random,
 ) -> dict:
-    """Generates a dictionary of related financial data for a single resident."""
+    """Generates a dictionary of related financial data for a single resident.
+
+    Every month from start_date to end_date is billed, claimed and paid in
+    turn: insured charges go on a monthly claim that the insurer settles
+    (payment plus contractual adjustment) some weeks later, and the resident
+    pays the uninsured charges and their coinsurance out of pocket. Anything
+    not yet settled or paid by end_date stays on the account balance. Each
+    month is a constant amount of work and totals are kept as running sums,
+    so the cost is linear in the length of the period.
+    """
     accounts = []
     coverages = []
     all_charges = []
@@ -22,7 +108,7 @@ def generate_financial_data_for_resident(
             "data": {
                 "subject": {"id": resident_id, "name": resident_name},
                 "balance": {"value": 0, "currency": "NGN"},
-                "authored_on": get_random_datetime(start_date, end_date),
+                "authored_on": get_random_datetime(start_date, end_date, rng),
                 "billing_status": {
                     "coding": [
                         {
@@ -51,136 +137,133 @@ def generate_financial_data_for_resident(
                     "start": start_date.isoformat(),
                     "end": end_date.isoformat(),
                 },
-                "authored_on": get_random_datetime(start_date, end_date),
+                "authored_on": get_random_datetime(start_date, end_date, rng),
             },
         }
     )
 
-    # --- 3. Generate All Charges ---
-    total_charges_value = 0
-    for _ in range(random.randint(5, 15)):
-        unit_price_value = round(random.uniform(5000, 150000), 2)
-        quantity = random.randint(1, 2)
-        total_charges_value += unit_price_value * quantity
+    ids = iter_uuids(rng)
 
-        charge = {
-            "id": generate_uuid(),
-            "data": {
-                "resident_id": resident_id,
-                "service": random.choice(
-                    [
-                        "Monthly Rent",
-                        "Physical Therapy",
-                        "Medication Fee",
-                        "Specialist Consultation",
-                        "Activities Fee",
-                        "Transportation",
-                    ]
-                ),
-                "quantity": quantity,
-                "unit_price": {"value": unit_price_value, "currency": "NGN"},
-                "occurrence_datetime": get_random_datetime(start_date, end_date),
-            },
-        }
-        all_charges.append(charge)
-
-    # --- 4. Separate Claimed vs. Unclaimed Charges ---
-    claimed_charges = random.sample(
-        all_charges, k=min(len(all_charges), random.randint(3, 10))
-    )
-    unclaimed_charges = [c for c in all_charges if c not in claimed_charges]
-    total_unclaimed_value = sum(
-        c["data"]["unit_price"]["value"] * c["data"]["quantity"]
-        for c in unclaimed_charges
-    )
-
-    # --- 5. Create a Claim for the claimed charges ---
-    claim_total_value = 0
-    if claimed_charges:
-        claim_total_value = sum(
-            c["data"]["unit_price"]["value"] * c["data"]["quantity"]
-            for c in claimed_charges
-        )
-        claim_id = f"claim_{resident_id}"
-        claims.append(
+    def pay(amount, claim_id, on, payor, method, coverage=None):
+        amount = round(amount, 2)
+        payments.append(
             {
-                "id": claim_id,
+                "id": next(ids),
                 "data": {
                     "resident_id": resident_id,
-                    "authored_on": get_random_datetime(start_date, end_date),
-                    "status": "adjudicated",
-                    "coverage_id": coverage_id,
-                    "charge_ids": [c["id"] for c in claimed_charges],
-                    "total": {"value": claim_total_value, "currency": "NGN"},
+                    "claim_id": claim_id,
+                    "coverage_id": coverage,
+                    "amount": money(amount),
+                    "payor": payor,
+                    "occurrence_datetime": on,
+                    "method": method,
                 },
             }
         )
+        return amount
 
-        # --- 6. Generate Insurer Payment and Adjustment for the Claim ---
-        insurer_paid_amount = round(
-            claim_total_value * random.uniform(0.7, 0.95), 2
-        )
-        patient_responsibility_from_claim = claim_total_value - insurer_paid_amount
+    # Recurring services such as rent keep one price for the whole period
+    fixed_prices = {
+        service["service"]: round(rng.uniform(*service["price_range"]), 2)
+        for service in BILLING_SERVICES
+        if service["fixed_price"]
+    }
+    total_charged = 0.0
+    total_paid = 0.0
+    total_adjusted = 0.0
 
-        payments.append(
-            {
-                "id": generate_uuid(),
-                "data": {
-                    "resident_id": resident_id,
-                    "claim_id": claim_id,
-                    "coverage_id": coverage_id,
-                    "amount": {"value": insurer_paid_amount, "currency": "NGN"},
-                    "payor": payor_org,
-                    "occurrence_datetime": get_random_datetime(start_date, end_date),
-                    "method": "EFT",
-                },
-            }
+    month_start = start_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while month_start <= end_date:
+        statement_date = next_month(month_start)
+        month_end = min(statement_date - timedelta(microseconds=1), end_date)
+
+        # --- 3. Bill the month's charges ---
+        charges = generate_monthly_charges(
+            resident_id, max(month_start, start_date), month_end, fixed_prices, ids, rng
         )
-        adjustments.append(
-            {
-                "id": generate_uuid(),
-                "data": {
-                    "resident_id": resident_id,
-                    "claim_id": claim_id,
-                    "reason": "Contractual Adjustment",
-                    "approved_amount": {
-                        "value": patient_responsibility_from_claim,
-                        "currency": "NGN",
+        all_charges.extend(charges)
+
+        # --- 4. Separate Claimed vs. Unclaimed Charges, in one pass ---
+        claimed_charges = []
+        claimed_value = 0.0
+        unclaimed_value = 0.0
+        for charge in charges:
+            value = charge["data"]["unit_price"]["value"] * charge["data"]["quantity"]
+            if charge["data"]["service"] in INSURED_SERVICES:
+                claimed_charges.append(charge)
+                claimed_value += value
+            else:
+                unclaimed_value += value
+        total_charged += claimed_value + unclaimed_value
+
+        # --- 5. Create the month's Claim and settle it once adjudicated ---
+        claim_on = days_after(statement_date, CLAIM_DELAY_DAYS, rng)
+        if claimed_charges and claim_on <= end_date:
+            claim_id = f"claim_{resident_id}_{month_start:%Y%m}"
+            settled_on = days_after(claim_on, SETTLEMENT_DELAY_DAYS, rng)
+            settled = settled_on <= end_date
+            claims.append(
+                {
+                    "id": claim_id,
+                    "data": {
+                        "resident_id": resident_id,
+                        "authored_on": claim_on,
+                        "status": "paid" if settled else "submitted",
+                        "coverage_id": coverage_id,
+                        "charge_ids": [c["id"] for c in claimed_charges],
+                        "total": money(claimed_value),
                     },
-                    "authored_on": get_random_datetime(start_date, end_date),
-                },
-            }
-        )
+                }
+            )
 
-    # --- 7. Generate Out-of-Pocket Payment ---
-    # Resident pays for unclaimed charges + their responsibility from the claim
-    total_oop_payment = total_unclaimed_value + (
-        patient_responsibility_from_claim if claimed_charges else 0
-    )
-    if total_oop_payment > 0:
-        payments.append(
-            {
-                "id": generate_uuid(),
-                "data": {
-                    "resident_id": resident_id,
-                    "claim_id": None,  # No claim for OOP
-                    "coverage_id": None,
-                    "amount": {"value": total_oop_payment, "currency": "NGN"},
-                    "payor": resident_name,  # Payor is the resident
-                    "occurrence_datetime": get_random_datetime(start_date, end_date),
-                    "method": "Credit Card",
-                },
-            }
-        )
+            # --- 6. Insurer Payment, Adjustment and the resident's coinsurance ---
+            if settled:
+                insurer_paid = round(
+                    claimed_value * rng.uniform(*INSURER_SHARE_RANGE), 2
+                )
+                adjusted = round(
+                    claimed_value * rng.uniform(*CONTRACTUAL_ADJUSTMENT_RANGE), 2
+                )
+                total_paid += pay(
+                    insurer_paid, claim_id, settled_on, payor_org, "EFT", coverage_id
+                )
+                adjustments.append(
+                    {
+                        "id": next(ids),
+                        "data": {
+                            "resident_id": resident_id,
+                            "claim_id": claim_id,
+                            "reason": "Contractual Adjustment",
+                            "approved_amount": money(adjusted),
+                            "authored_on": settled_on,
+                        },
+                    }
+                )
+                total_adjusted += adjusted
+
+                coinsurance_on = days_after(settled_on, PAYMENT_DELAY_DAYS, rng)
+                if coinsurance_on <= end_date:
+                    total_paid += pay(
+                        claimed_value - insurer_paid - adjusted,
+                        claim_id,
+                        coinsurance_on,
+                        resident_name,
+                        "Credit Card",
+                    )
+
+        # --- 7. Generate Out-of-Pocket Payment for the uninsured charges ---
+        paid_on = days_after(statement_date, PAYMENT_DELAY_DAYS, rng)
+        if unclaimed_value > 0 and paid_on <= end_date:
+            total_paid += pay(
+                unclaimed_value, None, paid_on, resident_name, "Credit Card"
+            )
+
+        month_start = statement_date
 
     # --- 8. Update final Account Balance ---
-    final_balance = (
-        total_charges_value
-        - sum(p["data"]["amount"]["value"] for p in payments)
-        - sum(a["data"]["approved_amount"]["value"] for a in adjustments)
+    accounts[0]["data"]["balance"]["value"] = round(
+        total_charged - total_paid - total_adjusted, 2
     )
-    if accounts:
-        accounts[0]["data"]["balance"]["value"] = round(final_balance, 2)
 
     return {
         "accounts": accounts,
@@ -189,4 +272,4 @@ def generate_financial_data_for_resident(
         "claims": claims,
         "payments": payments,
         "adjustments": adjustments,
-    }
\ No newline at end of file
+    }
@@ -1,16 +1,38 @@
+import hashlib
+import json
+import random
 from .utils import generate_uuid
 from .config import CARE_PLAN_GOALS
 
 
-def generate_goals(resident_id: str) -> dict:
+def generate_goals(resident_id: str, rng: random.Random) -> dict:
     """Generates a list of standalone goal documents and returns them along with their IDs."""
     goals = []
     goal_ids = []
     for goal_template in CARE_PLAN_GOALS:
-        goal_id = generate_uuid()
+        goal_id = generate_uuid(rng)
         goal_ids.append(goal_id)
         goal = {"id": goal_id, "data": {"resident_id": resident_id, **goal_template}}
         goals.append(goal)
 
     return {"goals": goals, "goal_ids": goal_ids}
 
+
+def catalog_goal_id(goal_template: dict) -> str:
+    """Content-addressed id: the same goal content always gets the same id."""
+    content = json.dumps(goal_template, sort_keys=True, separators=(",", ":"))
+    return "goal_" + hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+def generate_goal_catalog() -> dict:
+    """Generates the shared goal catalog: one document per distinct goal.
+
+    Unlike generate_goals, nothing here is tied to a resident; residents
+    reference catalog goals by id instead of holding copies of them.
+    """
+    catalog = {}
+    for goal_template in CARE_PLAN_GOALS:
+        goal_id = catalog_goal_id(goal_template)
+        catalog[goal_id] = {"id": goal_id, "data": dict(goal_template)}
+
+    return {"goals": list(catalog.values()), "goal_ids": list(catalog)}
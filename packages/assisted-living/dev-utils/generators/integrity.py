@@ -0,0 +1,191 @@
+import hashlib
+import json
+import math
+import os
+from collections import Counter
+from .transform import collection_files, detect_format, iter_collection
+from .writers import output_path
+
+# (collection, field, collection its ids refer to). A field may hold one id or
+# a list of them, and may be a dotted path into nested objects; null means no
+# reference.
+REFERENCES = [
+    ("goals", "resident_id", "residents"),
+    ("addresses", "resident_id", "residents"),
+    ("allergies", "resident_id", "residents"),
+    ("prescriptions", "resident_id", "residents"),
+    ("prescription_administration", "resident_id", "residents"),
+    ("prescription_administration", "prescription_id", "prescriptions"),
+    ("observations", "resident_id", "residents"),
+    ("diagnostic_history", "resident_id", "residents"),
+    ("coverages", "beneficiary_id", "residents"),
+    ("charges", "resident_id", "residents"),
+    ("claims", "resident_id", "residents"),
+    ("claims", "coverage_id", "coverages"),
+    ("claims", "charge_ids", "charges"),
+    ("payments", "resident_id", "residents"),
+    ("payments", "claim_id", "claims"),
+    ("payments", "coverage_id", "coverages"),
+    ("adjustments", "resident_id", "residents"),
+    ("adjustments", "claim_id", "claims"),
+    ("episodes_of_care", "resident_id", "residents"),
+    ("encounters", "subject.id", "residents"),
+    ("encounters", "episodes_of_care_id", "episodes_of_care"),
+    ("care_plans", "resident_id", "residents"),
+    ("care_plans", "goal_ids", "goals"),
+    ("care_plan_activities", "careplan_id", "care_plans"),
+    ("identifiers", "resident_id", "residents"),
+    ("tasks", "resident_id", "residents"),
+    ("procedures", "subject.id", "residents"),
+]
+
+# Share of ids missing from a Bloom filter index that it wrongly reports present
+BLOOM_ERROR_RATE = 0.001
+# How many dangling ids are kept per reference
+EXAMPLES_PER_REFERENCE = 3
+
+
+class BloomFilter:
+    """A set of strings in a fixed bit array, for id indexes too large for a set.
+
+    Membership tests never miss an id that was added, but report an id that
+    wasn't as present with probability error_rate, once capacity ids are in.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = BLOOM_ERROR_RATE):
+        capacity = max(1, capacity)
+        self.size = max(8, round(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Double hashing: the k positions are h1 + i * h2 for two 64-bit hashes
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+def field_value(data: dict, path: tuple):
+    """The value at path (a dotted field, split) in data, or None."""
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def count_records(path: str) -> int:
+    """Counts the records of a collection without decoding them.
+
+    Sharded collections have their count in the manifest. Otherwise records
+    are counted from the raw bytes: one per line of NDJSON, and one per
+    opening brace at the array's indent in a JSON array (the writers escape
+    newlines inside strings, so neither can appear in a value).
+    """
+    manifest_path = output_path(path, "json", sharded=True)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            return json.load(f)["records"]
+    count = 0
+    for file_path in collection_files(path):
+        marker = b"\n" if detect_format(file_path) == "ndjson" else b"\n  {"
+        with open(file_path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                count += chunk.count(marker)
+    return count
+
+
+def check_order(collections: list) -> list:
+    """collections in an order that reads every referenced collection first."""
+    order = []
+
+    def visit(name):
+        if name in order:
+            return
+        for source, _, target in REFERENCES:
+            if source == name and target in collections:
+                visit(target)
+        order.append(name)
+
+    for name in collections:
+        visit(name)
+    return order
+
+
+def check_integrity(paths: dict, bloom_above: int = None) -> dict:
+    """Checks every reference in REFERENCES between the collections in paths.
+
+    paths maps collection names to the paths they were written for. Each
+    collection is streamed once: its references are checked against the
+    indexes of the collections they point to, which were read before it, and
+    its own ids are indexed if anything refers to it. Indexes are sets, or
+    Bloom filters (see BloomFilter) for collections of more than bloom_above
+    records, which can let a dangling reference through but take a fraction
+    of the memory. Returns, per (collection, field, target), the number of
+    references checked and of dangling ones, with a few of the dangling ids.
+    """
+    present = {name for name, path in paths.items() if collection_files(path)}
+    references = [
+        reference
+        for reference in REFERENCES
+        if reference[0] in present and reference[2] in present
+    ]
+    targets = {target for _, _, target in references}
+    outgoing = {}
+    for reference in references:
+        outgoing.setdefault(reference[0], []).append(reference)
+
+    indexes = {}
+    checked = Counter()
+    dangling = Counter()
+    examples = {}
+    for name in check_order(sorted({source for source, _, _ in references} | targets)):
+        index = None
+        if name in targets:
+            index = set()
+            if bloom_above is not None:
+                count = count_records(paths[name])
+                if count > bloom_above:
+                    index = BloomFilter(count)
+        checks = [
+            (reference, tuple(reference[1].split(".")), indexes[reference[2]])
+            for reference in outgoing.get(name, [])
+        ]
+        for record in iter_collection(paths[name]):
+            if index is not None:
+                index.add(record["id"])
+            data = record["data"]
+            for reference, field, target_index in checks:
+                value = field_value(data, field)
+                if value is None:
+                    continue
+                for referenced_id in value if isinstance(value, list) else (value,):
+                    checked[reference] += 1
+                    if referenced_id not in target_index:
+                        dangling[reference] += 1
+                        ids = examples.setdefault(reference, [])
+                        if len(ids) < EXAMPLES_PER_REFERENCE:
+                            ids.append(referenced_id)
+        if index is not None:
+            indexes[name] = index
+
+    return {
+        reference: {
+            "checked": checked[reference],
+            "dangling": dangling[reference],
+            "examples": examples.get(reference, []),
+            "index": type(indexes[reference[2]]).__name__,
+        }
+        for reference in references
+    }
@@ -1,8 +1,38 @@
 import random
-from datetime import datetime
-from .utils import generate_uuid, get_random_datetime
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from itertools import accumulate
+from .utils import generate_uuid, generate_uuids, get_random_datetime
 from .config import OBSERVATION_STATUSES, VITAL_RANGES
 
+# How many observations a resident's history has
+OBSERVATION_COUNT_RANGE = (3, 8)
+
+# --- Vital Sign Series ---
+# Each reading moves towards the resident's baseline by this share of the gap...
+SERIES_REVERSION = 0.1
+# ...plus a normal step with this standard deviation, as a share of the range
+SERIES_STEP = 0.05
+# Readings are taken within half an hour of the scheduled time
+MINUTE_JITTER = range(-30, 31)
+# Days of readings generated per batch; bounds memory for long histories
+BATCH_DAYS = 366
+
+ONE_MINUTE = timedelta(minutes=1)
+MINUTES_PER_DAY = 24 * 60
+
+VITAL_SIGNS_CATEGORY = [
+    {
+        "coding": [
+            {
+                "system": "http://terminology.hl7.org/CodeSystem/observation-category",
+                "code": "vital-signs",
+                "display": "Vital Signs",
+            }
+        ]
+    }
+]
+
 
 def make_observation(
     code: str,
@@ -10,6 +40,7 @@ def make_observation(
     staff_ids: list,
     start_date: datetime,
     end_date: datetime,
+    rng: random.Random,
 ) -> dict:
     """Generate a FHIR Observation resource for a given vital sign code."""
     vital = VITAL_RANGES.get(code)
@@ -18,30 +49,20 @@ def make_observation(
 
     # Randomize value
     if vital["type"] == "int":
-        value = random.randint(vital["min"], vital["max"])
+        value = rng.randint(vital["min"], vital["max"])
     else:
-        value = round(random.uniform(vital["min"], vital["max"]), 1)
+        value = round(rng.uniform(vital["min"], vital["max"]), 1)
 
     # Generate a FHIR Observation resource
     observation = {
-        "id": generate_uuid(),
+        "id": generate_uuid(rng),
         "data": {
             "resident_id": resident_id,
-            "recorder_id": random.choice(staff_ids),
-            "status": random.choice(OBSERVATION_STATUSES),
-            "category": [
-                {
-                    "coding": [
-                        {
-                            "system": "http://terminology.hl7.org/CodeSystem/observation-category",
-                            "code": "vital-signs",
-                            "display": "Vital Signs",
-                        }
-                    ]
-                }
-            ],
+            "recorder_id": rng.choice(staff_ids),
+            "status": rng.choice(OBSERVATION_STATUSES),
+            "category": VITAL_SIGNS_CATEGORY,
             "code": {"coding": vital["coding"], "text": vital["coding"][0]["display"]},
-            "effective_datetime": get_random_datetime(start_date, end_date),
+            "effective_datetime": get_random_datetime(start_date, end_date, rng),
             "value_quantity": {
                 "value": value,
                 "unit": vital["unit"]["display"],
@@ -63,18 +84,159 @@ def generate_observations_for_resident(
     start_date: datetime,
     end_date: datetime,
     loinc_codes: list,
+    rng: random.Random,
+    num_observations: int = None,
 ) -> list:
-    num_observations = random.randint(3, 8)
+    """Generates the resident's observations between start_date and end_date.
+
+    Their number is drawn from OBSERVATION_COUNT_RANGE unless given.
+    """
+    if num_observations is None:
+        num_observations = rng.randint(*OBSERVATION_COUNT_RANGE)
     observations = []
     for _ in range(num_observations):
         if loinc_codes:
             observations.append(
                 make_observation(
-                    random.choice(loinc_codes),
+                    rng.choice(loinc_codes),
                     resident_id=resident_id,
                     staff_ids=staff_ids,
                     start_date=start_date,
                     end_date=end_date,
+                    rng=rng,
                 )
             )
     return observations
+
+
+def vital_baselines(loinc_codes: list, rng: random.Random) -> dict:
+    """Draws the resident's resting value of each vital, inside the middle half of its range."""
+    baselines = {}
+    for code in loinc_codes:
+        low, high = VITAL_RANGES[code]["min"], VITAL_RANGES[code]["max"]
+        baselines[code] = rng.uniform(low + (high - low) / 4, high - (high - low) / 4)
+    return baselines
+
+
+def expand_vital_series(
+    resident_id: str,
+    code: str,
+    staff_ids: list,
+    midnight: datetime,
+    interval_minutes: int,
+    first_reading: int,
+    count: int,
+    value: float,
+    baseline: float,
+    rng: random.Random,
+    first_offset: int,
+    last_offset: int,
+) -> tuple:
+    """Generates count readings of one vital, from reading first_reading on.
+
+    The values, timestamps, recorders, statuses and ids of the whole batch are
+    drawn as arrays first; the records are only built for the readings whose
+    minute since midnight falls between first_offset and last_offset. Each
+    value continues a walk from value that is pulled back towards baseline and
+    kept inside the vital's range. Returns (records, the last value).
+    """
+    vital = VITAL_RANGES[code]
+    low, high = vital["min"], vital["max"]
+    width = high - low
+
+    def walk(previous, step):
+        return min(
+            high, max(low, previous + SERIES_REVERSION * (baseline - previous) + step)
+        )
+
+    steps = [rng.gauss(0, SERIES_STEP * width) for _ in range(count)]
+    values = list(accumulate(steps, walk, initial=value))[1:]
+    if vital["type"] == "int":
+        rounded = [round(v) for v in values]
+    else:
+        rounded = [round(v, 1) for v in values]
+    jitter = rng.choices(MINUTE_JITTER, k=count)
+    offsets = [
+        (first_reading + i) * interval_minutes + minutes
+        for i, minutes in enumerate(jitter)
+    ]
+    recorder_ids = rng.choices(staff_ids, k=count)
+    statuses = rng.choices(OBSERVATION_STATUSES, k=count)
+    ids = generate_uuids(count, rng)
+
+    code_concept = {"coding": vital["coding"], "text": vital["coding"][0]["display"]}
+    unit = vital["unit"]
+    records = [
+        {
+            "id": record_id,
+            "data": {
+                "resident_id": resident_id,
+                "recorder_id": recorder_id,
+                "status": status,
+                "category": VITAL_SIGNS_CATEGORY,
+                "code": code_concept,
+                "effective_datetime": midnight + offset * ONE_MINUTE,
+                "value_quantity": {
+                    "value": reading,
+                    "unit": unit["display"],
+                    "system": unit["system"],
+                    "code": unit["code"],
+                },
+                "body_site": vital["body_site"],
+                "method": vital["method"],
+                "device": vital["device"],
+            },
+        }
+        for record_id, offset, reading, recorder_id, status in zip(
+            ids, offsets, rounded, recorder_ids, statuses
+        )
+        if first_offset <= offset <= last_offset
+    ]
+    return records, values[-1]
+
+
+def generate_vital_series_for_resident(
+    resident_id: str,
+    staff_ids: list,
+    start_date: datetime,
+    end_date: datetime,
+    loinc_codes: list,
+    interval_hours: float,
+    baselines: dict,
+    rng: random.Random,
+    after: datetime = None,
+) -> Iterator[dict]:
+    """Yields a reading of every vital sign every interval_hours, lazily.
+
+    Readings are scheduled from midnight of start_date up to end_date, so a
+    resident's history can run to tens of thousands of them. baselines (see
+    vital_baselines) are the values each series starts from and reverts to.
+    With after, only readings after it are generated, starting from its day,
+    with each series restarting from its baseline.
+    """
+    midnight = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    interval_minutes = max(1, round(interval_hours * 60))
+    last_offset = (end_date - midnight) // ONE_MINUTE
+    first_offset = (after - midnight) // ONE_MINUTE + 1 if after else 0
+    total = last_offset // interval_minutes + 1
+    skipped = max(0, first_offset - MINUTE_JITTER[-1]) // interval_minutes
+    per_batch = max(1, BATCH_DAYS * MINUTES_PER_DAY // interval_minutes)
+
+    for code in loinc_codes:
+        value = baselines[code]
+        for first_reading in range(skipped, total, per_batch):
+            records, value = expand_vital_series(
+                resident_id,
+                code,
+                staff_ids,
+                midnight,
+                interval_minutes,
+                first_reading,
+                min(per_batch, total - first_reading),
+                value,
+                baselines[code],
+                rng,
+                first_offset,
+                last_offset,
+            )
+            yield from records
@@ -0,0 +1,813 @@
+import ast
+import hashlib
+import inspect
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, time
+from itertools import islice
+from . import (
+    addresses,
+    allergies,
+    care_plans,
+    config,
+    diagnostic_history,
+    encounters,
+    episodes_of_care,
+    financials,
+    goals,
+    identifiers,
+    observations,
+    prescription_administration,
+    prescriptions,
+    procedures,
+    profiling,
+    tasks,
+)
+from .cache import GenerationCache, file_fingerprint, fingerprint
+from .transform import iter_collection
+from .utils import get_random_datetime, make_rng
+from .writers import WRITERS
+
+FINANCIAL_COLLECTIONS = [
+    "accounts",
+    "charges",
+    "claims",
+    "coverages",
+    "payments",
+    "adjustments",
+]
+
+
+# --- Generators ---
+# Each run function takes (resident, span, context, rng, upstream) and returns
+# a dict of collection -> records, plus any indexes its dependants read (keys
+# that aren't collections are never written). span holds the resident's
+# effective end dates and upstream the outputs of the generators it depends on.
+def _run_goals(resident, span, context, rng, upstream):
+    if context["goal_mode"] == "catalog":
+        # The catalog itself is written once per run by generate_residents
+        return {"goals": [], "goal_ids": goals.generate_goal_catalog()["goal_ids"]}
+    resident_goals = goals.generate_goals(resident["id"], rng)
+    # goal_ids is the resident's goal index for care plans; it isn't a collection
+    return {"goals": resident_goals["goals"], "goal_ids": resident_goals["goal_ids"]}
+
+
+def _run_allergies(resident, span, context, rng, upstream):
+    return {
+        "allergies": allergies.generate_allergies_for_resident(
+            resident["id"],
+            context["staff_ids"],
+            context["start_date"],
+            span["end_date"],  # Use general effective_end_date for clinical
+            context["snomed_allergy_names"],
+            context["snomed_allergy_reactions"],
+            context["snomed_allergy_substances"],
+            rng,
+        )
+    }
+
+
+def _run_prescriptions(resident, span, context, rng, upstream):
+    return {
+        "prescriptions": prescriptions.generate_prescriptions_for_resident(
+            resident["id"],
+            context["staff_ids"],
+            context["start_date"],
+            context["intermediary_date"],
+            span["end_date"],  # Use general effective_end_date for clinical
+            config.PRESCRIPTION_TEMPLATES,
+            config.DOSAGE_INSTRUCTIONS,
+            rng,
+        )
+    }
+
+
+def _run_prescription_administration(resident, span, context, rng, upstream):
+    return {
+        "prescription_administration": prescription_administration.generate_prescription_administration_for_resident(
+            resident["id"],
+            upstream["prescriptions"]["prescriptions"],
+            context["staff_ids"],
+            span["end_date"],
+            rng,
+        )
+    }
+
+
+def _run_observations(resident, span, context, rng, upstream):
+    if context["vitals_interval"]:
+        # Baselines have their own stream, so --advance runs can redraw them
+        baselines = observations.vital_baselines(
+            context["loinc_codes"],
+            make_rng(context["seed"], resident["id"], "vital_baselines"),
+        )
+        return {
+            "observations": observations.generate_vital_series_for_resident(
+                resident["id"],
+                context["staff_ids"],
+                context["start_date"],
+                span["end_date"],
+                context["loinc_codes"],
+                context["vitals_interval"],
+                baselines,
+                rng,
+            )
+        }
+    return {
+        "observations": observations.generate_observations_for_resident(
+            resident["id"],
+            context["staff_ids"],
+            context["start_date"],
+            span["end_date"],
+            context["loinc_codes"],
+            rng,
+        )
+    }
+
+
+def _run_diagnostic_history(resident, span, context, rng, upstream):
+    return {
+        "diagnostic_history": diagnostic_history.generate_diagnostic_history_for_resident(
+            resident["id"],
+            context["staff_ids"],
+            context["start_date"],
+            span["end_date"],
+            context["snomed_disorders"],
+            rng,
+        )
+    }
+
+
+def _run_episodes_of_care(resident, span, context, rng, upstream):
+    return {
+        "episodes_of_care": episodes_of_care.generate_episodes_of_care_for_resident(
+            resident["id"], rng
+        )
+    }
+
+
+def _run_care_plans(resident, span, context, rng, upstream):
+    # Care plans only reference the resident's own goals; a run-wide goal list
+    # would make each resident cost more than the one before and leak goals
+    # across residents.
+    return care_plans.generate_care_plans_for_resident(
+        resident["id"],
+        context["staff_ids"],
+        context["start_date"],
+        span["end_date"],
+        upstream["goals"]["goal_ids"],
+        rng,
+    )
+
+
+def _run_addresses(resident, span, context, rng, upstream):
+    return {"addresses": addresses.generate_address_for_resident(resident["id"], rng)}
+
+
+def _run_identifiers(resident, span, context, rng, upstream):
+    return {
+        "identifiers": identifiers.generate_identifiers_for_resident(
+            resident["id"], resident["data"]["resident_code"]
+        )
+    }
+
+
+def _run_financials(resident, span, context, rng, upstream):
+    return financials.generate_financial_data_for_resident(
+        resident["id"],
+        resident["data"]["resident_name"],
+        context["start_date"],
+        span["financial_end_date"],  # Use financial effective_end_date
+        rng,
+    )
+
+
+def _run_tasks(resident, span, context, rng, upstream):
+    return {
+        "tasks": tasks.generate_tasks_for_resident(
+            resident["id"],
+            context["staff_ids"],
+            context["start_date"],
+            span["end_date"],
+            rng,
+        )
+    }
+
+
+def _run_procedures(resident, span, context, rng, upstream):
+    return {
+        "procedures": procedures.generate_procedures_for_resident(
+            resident["id"],
+            resident["data"]["resident_name"],
+            context["staff_ids"],
+            context["start_date"],
+            span["end_date"],
+            rng,
+        )
+    }
+
+
+def _run_encounters(resident, span, context, rng, upstream):
+    episode = rng.choice(upstream["episodes_of_care"]["episodes_of_care"])
+    return {
+        "encounters": encounters.generate_encounters_for_resident(
+            resident["id"],
+            resident["data"]["resident_name"],
+            context["staff_ids"],
+            context["start_date"],
+            span["end_date"],
+            episode["id"],
+            rng,
+        )
+    }
+
+
+# --- Reading Outputs Back ---
+# Generators others depend on can have their output read back from disk
+# instead of regenerated. Each load function takes (resident, records,
+# context), records holding the resident's records of each of the
+# generator's collections as written, and returns what run would have.
+def _load_records(resident, records, context):
+    return records
+
+
+def _load_goals(resident, records, context):
+    if context["goal_mode"] == "catalog":
+        # The catalog is the same for everyone and cheap to rebuild
+        return _run_goals(resident, None, context, None, {})
+    return {
+        "goals": records["goals"],
+        "goal_ids": [goal["id"] for goal in records["goals"]],
+    }
+
+
+def _load_prescriptions(resident, records, context):
+    # Administrations are scheduled from the datetimes and times the
+    # prescriptions were generated with, which were written as text
+    for rx_record in records["prescriptions"]:
+        period = rx_record["data"]["period"]
+        for key in ("start", "end"):
+            if period.get(key):
+                period[key] = datetime.fromisoformat(period[key])
+        for dosage_instruction in rx_record["data"]["dosage_instruction"]:
+            repeat = dosage_instruction["timing"]["repeat"]
+            if "time_of_day" in repeat:
+                repeat["time_of_day"] = [
+                    time.fromisoformat(t) for t in repeat["time_of_day"]
+                ]
+    return records
+
+
+# Every generator, after the generators it depends on. "module", "config" (names
+# in generators.config) and "context" (keys of the run context) list everything
+# a generator's output depends on besides the seed and the resident; they make
+# up its cache key. "load" (optional) reads its output back, see above.
+GENERATORS = [
+    {
+        "name": "goals",
+        "collections": ["goals"],
+        "depends_on": [],
+        "module": goals,
+        "config": ["CARE_PLAN_GOALS"],
+        "context": ["goal_mode"],
+        "run": _run_goals,
+        "load": _load_goals,
+    },
+    {
+        "name": "allergies",
+        "collections": ["allergies"],
+        "depends_on": [],
+        "module": allergies,
+        "config": ["ALLERGY_STATUSES", "ALLERGY_TYPES"],
+        "context": [
+            "staff_ids",
+            "start_date",
+            "snomed_allergy_names",
+            "snomed_allergy_reactions",
+            "snomed_allergy_substances",
+        ],
+        "run": _run_allergies,
+    },
+    {
+        "name": "prescriptions",
+        "collections": ["prescriptions"],
+        "depends_on": [],
+        "module": prescriptions,
+        "config": [
+            "PRESCRIPTION_TEMPLATES",
+            "DOSAGE_INSTRUCTIONS",
+            "PRESCRIPTION_STATUSES",
+            "PRESCRIPTION_ADHERENCE_STATUSES",
+        ],
+        "context": ["staff_ids", "start_date", "intermediary_date"],
+        "run": _run_prescriptions,
+        "load": _load_prescriptions,
+    },
+    {
+        "name": "prescription_administration",
+        "collections": ["prescription_administration"],
+        "depends_on": ["prescriptions"],
+        "module": prescription_administration,
+        "config": ["ADMINISTRATION_STATUSES"],
+        "context": ["staff_ids"],
+        "run": _run_prescription_administration,
+    },
+    {
+        "name": "observations",
+        "collections": ["observations"],
+        "depends_on": [],
+        "module": observations,
+        "config": ["OBSERVATION_STATUSES", "VITAL_RANGES"],
+        "context": ["staff_ids", "start_date", "loinc_codes", "vitals_interval"],
+        "run": _run_observations,
+    },
+    {
+        "name": "diagnostic_history",
+        "collections": ["diagnostic_history"],
+        "depends_on": [],
+        "module": diagnostic_history,
+        "config": ["CONDITION_STATUSES"],
+        "context": ["staff_ids", "start_date", "snomed_disorders"],
+        "run": _run_diagnostic_history,
+    },
+    {
+        "name": "episodes_of_care",
+        "collections": ["episodes_of_care"],
+        "depends_on": [],
+        "module": episodes_of_care,
+        "config": ["EPISODE_STATUSES"],
+        "context": [],
+        "run": _run_episodes_of_care,
+        "load": _load_records,
+    },
+    {
+        "name": "care_plans",
+        "collections": ["care_plans", "care_plan_activities"],
+        "depends_on": ["goals"],
+        "module": care_plans,
+        "config": ["CARE_PLAN_ACTIVITIES"],
+        "context": ["staff_ids", "start_date"],
+        "run": _run_care_plans,
+    },
+    {
+        "name": "addresses",
+        "collections": ["addresses"],
+        "depends_on": [],
+        "module": addresses,
+        "config": [],
+        "context": [],
+        "run": _run_addresses,
+    },
+    {
+        "name": "identifiers",
+        "collections": ["identifiers"],
+        "depends_on": [],
+        "module": identifiers,
+        "config": [],
+        "context": [],
+        "run": _run_identifiers,
+    },
+    {
+        "name": "financials",
+        "collections": FINANCIAL_COLLECTIONS,
+        "depends_on": [],
+        "module": financials,
+        "config": [
+            "BILLING_SERVICES",
+            "INSURER_SHARE_RANGE",
+            "CONTRACTUAL_ADJUSTMENT_RANGE",
+            "CLAIM_DELAY_DAYS",
+            "SETTLEMENT_DELAY_DAYS",
+            "PAYMENT_DELAY_DAYS",
+        ],
+        "context": ["start_date"],
+        "run": _run_financials,
+    },
+    {
+        "name": "tasks",
+        "collections": ["tasks"],
+        "depends_on": [],
+        "module": tasks,
+        "config": ["TASK_STATUSES", "TASK_PRIORITIES"],
+        "context": ["staff_ids", "start_date"],
+        "run": _run_tasks,
+    },
+    {
+        "name": "procedures",
+        "collections": ["procedures"],
+        "depends_on": [],
+        "module": procedures,
+        "config": ["PROCEDURE_STATUSES", "SNOMED_PROCEDURES"],
+        "context": ["staff_ids", "start_date"],
+        "run": _run_procedures,
+    },
+    {
+        "name": "encounters",
+        "collections": ["encounters"],
+        "depends_on": ["episodes_of_care"],
+        "module": encounters,
+        "config": ["ENCOUNTER_STATUSES", "ENCOUNTER_TYPES"],
+        "context": ["staff_ids", "start_date"],
+        "run": _run_encounters,
+    },
+]
+
+COLLECTIONS = [name for step in GENERATORS for name in step["collections"]]
+
+
+def reached_modules(module) -> list:
+    """The generators modules module reaches through its relative imports,
+    directly or not, module itself included; config is left out."""
+    package = os.path.dirname(__file__)
+    reached = []
+    pending = [module.__file__]
+    while pending:
+        path = pending.pop()
+        if path in reached:
+            continue
+        reached.append(path)
+        with open(path, "r") as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.level == 1:
+                names = [node.module] if node.module else [a.name for a in node.names]
+                for name in names:
+                    if name != "config":
+                        pending.append(os.path.join(package, f"{name}.py"))
+    return sorted(reached)
+
+
+def config_names(path: str) -> set:
+    """The names in generators.config a module's source refers to."""
+    with open(path, "r") as f:
+        tree = ast.parse(f.read())
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module == "config":
+            names.update(alias.name for alias in node.names)
+        elif (
+            isinstance(node, ast.Attribute)
+            and isinstance(node.value, ast.Name)
+            and node.value.id == "config"
+        ):
+            names.add(node.attr)
+    return names
+
+
+def generator_fingerprints(context: dict) -> dict:
+    """Fingerprints what each generator's output depends on for this run.
+
+    Covers the source of this module (which holds every run function) and of
+    every generators module the generator's module reaches, such as utils and
+    terminology; the config values named in its step or referred to by those
+    modules; the context entries it reads; and the seed. A change to any of
+    them invalidates that generator's cache entries, and only those.
+    """
+    fingerprints = {}
+    for step in GENERATORS:
+        modules = reached_modules(step["module"])
+        names = set(step["config"]).union(*(config_names(path) for path in modules))
+        fingerprints[step["name"]] = fingerprint(
+            context["seed"],
+            step["name"],
+            file_fingerprint(__file__, *modules),
+            {name: getattr(config, name) for name in sorted(names)},
+            {key: context[key] for key in step["context"]},
+        )
+    return fingerprints
+
+
+def prepare_resident(index: int, resident: dict, context: dict) -> dict:
+    """Fills in a resident's derived fields and returns its effective end dates."""
+    rng = make_rng(context["seed"], resident["id"], "resident")
+    start_date = context["start_date"]
+    end_date = context["end_date"]
+
+    resident["data"]["resident_code"] = f"{index+1:05d}"  # Add resident_code
+    resident["data"]["created_at"] = get_random_datetime(start_date, end_date, rng)
+
+    # Decide whether to deactivate the resident (e.g., 20% chance)
+    if rng.random() < 0.2:
+        # Ensure deactivation date is after creation date
+        deactivation_start_date = resident["data"]["created_at"]
+        resident["data"]["deactivated_at"] = get_random_datetime(
+            deactivation_start_date, end_date, rng
+        )
+    else:
+        resident["data"]["deactivated_at"] = None
+
+    # Determine the effective end date for generating subcollection data
+    effective_end_date = (
+        resident["data"]["deactivated_at"]
+        if resident["data"]["deactivated_at"]
+        else end_date
+    )
+
+    return {
+        "end_date": effective_end_date,
+        # Ensure financial data does not go past the current date or deactivation date
+        "financial_end_date": min(effective_end_date, context["financial_end_date"]),
+    }
+
+
+def resident_keys(resident: dict, span: dict, context: dict) -> dict:
+    """Cache keys for each of a resident's generators.
+
+    A key covers the generator fingerprint, the resident record, its span and
+    the keys of the generators it depends on.
+    """
+    resident_fingerprint = fingerprint(resident, span)
+    keys = {}
+    for step in GENERATORS:
+        keys[step["name"]] = fingerprint(
+            context["generator_fingerprints"][step["name"]],
+            resident_fingerprint,
+            [keys[name] for name in step["depends_on"]],
+        )
+    return keys
+
+
+def required_generators(collections) -> list:
+    """The generators needed to produce collections, dependencies included."""
+    required = {
+        step["name"]
+        for step in GENERATORS
+        if set(step["collections"]).intersection(collections)
+    }
+    # Dependencies always precede their dependants, so one backwards pass
+    # picks up transitive dependencies too.
+    for step in reversed(GENERATORS):
+        if step["name"] in required:
+            required.update(step["depends_on"])
+    return [step for step in GENERATORS if step["name"] in required]
+
+
+def read_outputs(step: dict, paths: dict) -> dict:
+    """Reads a generator's collections back from disk, by resident.
+
+    paths maps each of the step's collections to the path it was written
+    for. Returns {resident_id: {collection: records}}, records in the order
+    they were written; a step's load function turns them back into outputs.
+    Only generators others depend on are read back, and their collections
+    are small next to their dependants', so they are simply held in memory.
+    """
+    outputs = {}
+    for collection in step["collections"]:
+        for record in iter_collection(paths[collection]):
+            resident_records = outputs.setdefault(record["data"].get("resident_id"), {})
+            resident_records.setdefault(collection, []).append(record)
+    return outputs
+
+
+def generate_resident(
+    index: int, resident: dict, context: dict, writers: dict, cache=None
+) -> dict:
+    """Generates a resident's subcollections into writers.
+
+    Only the generators needed for the collections in writers run. Records go
+    straight to writers[collection] as they are produced. Every generator draws
+    from its own stream keyed by the run seed, the resident id and the
+    generator, so a resident's records are the same whichever process or order
+    produces them, and changing one generator leaves the others' output
+    untouched. With a cache, a generator whose key is cached is not rerun, and
+    a generator in context["upstream_records"] (see read_outputs) is not run
+    at all. Returns the updated resident record.
+    """
+    with profiling.stage("prepare"):
+        span = prepare_resident(index, resident, context)
+        keys = resident_keys(resident, span, context) if cache else {}
+
+    results = {}
+    upstream_records = context.get("upstream_records", {})
+    for step in required_generators(writers):
+        name = step["name"]
+        if name in upstream_records:
+            # Output read back from disk by read_outputs
+            records = upstream_records[name].get(resident["id"], {})
+            results[name] = step["load"](
+                resident,
+                {
+                    collection: records.get(collection, [])
+                    for collection in step["collections"]
+                },
+                context,
+            )
+            continue
+        outputs = None
+        if cache:
+            with profiling.stage("cache"):
+                outputs = cache.get(resident["id"], name, keys[name])
+        if outputs is None:
+            rng = make_rng(context["seed"], resident["id"], name)
+            with profiling.stage(f"generate:{name}"):
+                outputs = step["run"](resident, span, context, rng, results)
+                # Lazy records would otherwise be generated while being written
+                if cache or profiling.enabled():
+                    outputs = {key: list(records) for key, records in outputs.items()}
+            if cache:
+                with profiling.stage("cache"):
+                    cache.put(resident["id"], name, keys[name], outputs)
+        results[name] = outputs
+        for collection, records in outputs.items():
+            if collection in writers:
+                with profiling.stage(f"write:{collection}"):
+                    writers[collection].write_all(records)
+
+    if cache:
+        with profiling.stage("cache"):
+            cache.commit()
+    return resident
+
+
+def plan_collections(residents, context: dict) -> dict:
+    """Fingerprints the content every collection file would have for residents.
+
+    Only resident fields and cache keys are computed, never records, so the
+    pass is cheap. A collection whose fingerprint matches the one its file was
+    last written with does not need rewriting.
+    """
+    # The writer code, format and sharding decide the bytes as much as the
+    # records do
+    writer_class = WRITERS[context["output_format"]]
+    writer_fingerprint = fingerprint(
+        context["output_format"],
+        file_fingerprint(inspect.getfile(writer_class)),
+        context.get("shard_records"),
+        context.get("shard_bytes"),
+    )
+    hashers = {
+        name: hashlib.sha256(writer_fingerprint.encode("ascii")) for name in COLLECTIONS
+    }
+    for index, resident in enumerate(residents):
+        span = prepare_resident(index, resident, context)
+        keys = resident_keys(resident, span, context)
+        for step in GENERATORS:
+            for collection in step["collections"]:
+                hashers[collection].update(keys[step["name"]].encode("ascii"))
+    return {name: hasher.hexdigest() for name, hasher in hashers.items()}
+
+
+# --- Process pool ---
+_worker_context = None
+_worker_cache = None
+
+
+def _init_worker(context: dict):
+    global _worker_context, _worker_cache
+    _worker_context = context
+    if context.get("cache_path"):
+        _worker_cache = GenerationCache(context["cache_path"])
+
+
+def _generate_batch_in_worker(
+    start: int, batch: list, collections: list, fragment_dir: str
+) -> tuple:
+    """Generates a batch of residents into fragment files under fragment_dir.
+
+    Records are encoded in the worker and spilled to disk, so neither the
+    worker nor the parent holds a batch's records in memory. Returns the
+    residents and, per collection, the sizes of the records in its fragment.
+    """
+    writer_class = WRITERS[_worker_context["output_format"]]
+    writers = {
+        name: writer_class(os.path.join(fragment_dir, name), fragment=True)
+        for name in collections
+    }
+    residents = [
+        generate_resident(
+            start + offset, resident, _worker_context, writers, _worker_cache
+        )
+        for offset, resident in enumerate(batch)
+    ]
+    for writer in writers.values():
+        writer.close()
+    return residents, {name: writer.record_sizes for name, writer in writers.items()}
+
+
+def generator_groups(collections) -> list:
+    """Splits the generators needed for collections into independent groups.
+
+    The generators form a DAG whose edges are their depends_on; each group is
+    one connected part of it, such as prescriptions and prescription
+    administration, or observations alone. Groups share no inputs or
+    outputs, so a resident's groups can run at the same time on different
+    workers. Returns the collections (of those given) each group writes.
+    """
+    steps = required_generators(collections)
+    group_of = {}
+    for step in steps:
+        # Dependencies come first, so their groups already exist to merge into
+        merged = {step["name"]}
+        for name in step["depends_on"]:
+            merged |= group_of[name]
+        for name in merged:
+            group_of[name] = merged
+    groups = []
+    for step in steps:
+        group = group_of[step["name"]]
+        if group not in groups:
+            groups.append(group)
+    return [
+        [
+            collection
+            for step in steps
+            if step["name"] in group
+            for collection in step["collections"]
+            if collection in collections
+        ]
+        for group in groups
+    ]
+
+
+def generate_residents(
+    residents, context: dict, writers: dict, workers: int = 1, batch_size: int = 8
+):
+    """Generates every resident's subcollections into writers.
+
+    Yields the updated resident records in input order. With more than one
+    worker, generation is scheduled over the generator DAG: every batch of
+    residents is split into one task per independent group of generators
+    (see generator_groups), so the groups of a batch run concurrently on a
+    process pool. Each collection's fragments are spliced into its writer in
+    batch order as soon as they are ready, overlapping writing with the
+    generation still in flight, and the output is identical to a serial run
+    for the same seed. At most two batches per worker are in flight at a
+    time, which keeps memory flat however many residents there are. When
+    context has a cache_path, cached generator output is reused. In goal
+    catalog mode the shared catalog is written to the goals writer first.
+    """
+    if context["goal_mode"] == "catalog" and "goals" in writers:
+        writers["goals"].write_all(goals.generate_goal_catalog()["goals"])
+
+    if workers <= 1:
+        cache = (
+            GenerationCache(context["cache_path"])
+            if context.get("cache_path")
+            else None
+        )
+        try:
+            for index, resident in enumerate(residents):
+                yield generate_resident(index, resident, context, writers, cache)
+        finally:
+            if cache:
+                cache.close()
+        return
+
+    # With nothing to write, one group still prepares the residents
+    groups = generator_groups(writers) or [[]]
+
+    def splice(batch_dir, future):
+        batch_residents, record_sizes = future.result()
+        for name, sizes in record_sizes.items():
+            fragment_path = os.path.join(batch_dir, name)
+            writers[name].append_fragment(fragment_path, len(sizes), sizes)
+            os.remove(fragment_path)
+        os.rmdir(batch_dir)
+        return batch_residents
+
+    residents = iter(residents)
+    # Per group, its batches' (fragment dir, future) in batch order
+    queues = [deque() for _ in groups]
+    spliced = [0] * len(groups)
+    finished = deque()
+    submitted = yielded = start = 0
+    exhausted = False
+    with tempfile.TemporaryDirectory(
+        prefix=".fragments-", dir=context["output_dir"]
+    ) as fragment_root, ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(context,)
+    ) as executor:
+        while True:
+            while not exhausted and submitted - yielded < workers * 2:
+                batch = list(islice(residents, batch_size))
+                if not batch:
+                    exhausted = True
+                    break
+                for index, collections in enumerate(groups):
+                    batch_dir = os.path.join(fragment_root, f"{start}-{index}")
+                    os.mkdir(batch_dir)
+                    future = executor.submit(
+                        _generate_batch_in_worker, start, batch, collections, batch_dir
+                    )
+                    queues[index].append((batch_dir, future))
+                start += len(batch)
+                submitted += 1
+            if not any(queues):
+                break
+
+            # Splice whatever is ready at the head of each group's queue
+            wait(
+                [queue[0][1] for queue in queues if queue], return_when=FIRST_COMPLETED
+            )
+            for index, queue in enumerate(queues):
+                while queue and queue[0][1].done():
+                    batch_residents = splice(*queue.popleft())
+                    if index == 0:
+                        finished.append(batch_residents)
+                    spliced[index] += 1
+            # A batch's residents are done once every group has spliced it
+            while yielded < min(spliced):
+                yield from finished.popleft()
+                yielded += 1
@@ -1,68 +1,126 @@
 import random
+from collections.abc import Iterator
 from datetime import datetime, timedelta, time
-import pytz
-from .utils import generate_uuid
+from .utils import generate_uuids
 from .config import ADMINISTRATION_STATUSES
 
+# Administrations are jittered around the scheduled time of day
+HOUR_JITTER = range(-2, 3)
+MINUTE_JITTER = range(-30, 31)
+# Days of a prescription expanded per batch; bounds memory for long histories
+BATCH_DAYS = 366
 
-def generate_prescription_administration_for_resident(
-    resident_id: str, resident_prescriptions: list, staff_ids: list, end_date: datetime
+ONE_DAY = timedelta(days=1)
+ONE_MINUTE = timedelta(minutes=1)
+MINUTES_PER_DAY = 24 * 60
+
+
+def expand_prescription_administration(
+    resident_id: str,
+    rx_record: dict,
+    staff_ids: list,
+    first_day: int,
+    num_days: int,
+    end_date: datetime,
+    rng: random.Random,
+    after: datetime = None,
 ) -> list:
-    prescription_administration = []
-    for rx_record in resident_prescriptions:
-        timing = rx_record["data"]["dosage_instruction"][0]["timing"]
-        doses_per_day = timing["repeat"]["frequency"]
-        if doses_per_day == 0:
-            continue
+    """Expands num_days of one prescription, from first_day on, into records.
+
+    Timestamps, jitter, recorders, statuses and ids for every dose in the
+    window are computed as whole arrays first; the records are only built once
+    the doses falling after end_date (or at or before after) have been dropped.
+    """
+    dosage_instruction = rx_record["data"]["dosage_instruction"][0]
+    repeat = dosage_instruction["timing"]["repeat"]
+    doses_per_day = repeat["frequency"]
+    time_of_day = repeat.get("time_of_day", [time(9, 0)])
+    count = num_days * doses_per_day
 
-        start_date_str = rx_record["data"]["period"]["start"]
-        current_date = start_date_str
-        time_of_day = timing["repeat"].get("time_of_day", [time(9, 0)])
-        while current_date <= end_date:
-            for i, dose_num in enumerate(range(doses_per_day)):
-                hour = time_of_day[i].hour
-                minute = time_of_day[i].minute
-                hour_offset = random.randint(-2, 2)
-                minute_offset = random.randint(-30, 30)
-                admin_time = pytz.utc.localize(
-                    datetime(
-                        current_date.year,
-                        current_date.month,
-                        current_date.day,
-                        hour,
-                        minute,
-                        0,
-                    )
-                    + timedelta(hours=hour_offset, minutes=minute_offset)
-                )
+    # Scheduled minutes since midnight of the prescription's first day
+    schedule = [t.hour * 60 + t.minute for t in time_of_day[:doses_per_day]]
+    scheduled = [
+        day * MINUTES_PER_DAY + minute
+        for day in range(first_day, first_day + num_days)
+        for minute in schedule
+    ]
+    hour_offsets = rng.choices(HOUR_JITTER, k=count)
+    minute_offsets = rng.choices(MINUTE_JITTER, k=count)
+    offsets = [
+        at + 60 * hours + minutes
+        for at, hours, minutes in zip(scheduled, hour_offsets, minute_offsets)
+    ]
+    dose_numbers = list(range(1, doses_per_day + 1)) * num_days
+    recorder_ids = rng.choices(staff_ids, k=count)
+    statuses = rng.choices(ADMINISTRATION_STATUSES, k=count)
+    ids = generate_uuids(count, rng)
 
-                if admin_time > end_date:
-                    continue
+    start_date = rx_record["data"]["period"]["start"]
+    midnight = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    last_offset = (end_date - midnight) // ONE_MINUTE
+    first_offset = (after - midnight) // ONE_MINUTE + 1 if after else 0
+    prescription_id = rx_record["id"]
+    medication = rx_record["data"]["medication"]
+    route = dosage_instruction["route"]
+    administered_dose = dosage_instruction["dose_and_rate"][0]["dose_quantity"]
 
-                administered_dosage = rx_record["data"]["dosage_instruction"][0][
-                    "dose_and_rate"
-                ][0]["dose_quantity"]
+    return [
+        {
+            "id": record_id,
+            "data": {
+                "resident_id": resident_id,
+                "prescription_id": prescription_id,
+                "medication": medication,
+                "recorder_id": recorder_id,
+                "status": status,
+                "effective_datetime": midnight + offset * ONE_MINUTE,
+                "dosage": {
+                    "route": route,
+                    "administered_dose": administered_dose,
+                    "dose_number": dose_number,  # 1-based
+                },
+            },
+        }
+        for record_id, offset, dose_number, recorder_id, status in zip(
+            ids, offsets, dose_numbers, recorder_ids, statuses
+        )
+        if first_offset <= offset <= last_offset
+    ]
+
+
+def generate_prescription_administration_for_resident(
+    resident_id: str,
+    resident_prescriptions: list,
+    staff_ids: list,
+    end_date: datetime,
+    rng: random.Random,
+    after: datetime = None,
+) -> Iterator[dict]:
+    """Yields administration records lazily; a resident's history can run to
+    thousands of doses, so callers stream them rather than building a list.
+
+    With after, only doses after it are generated, starting from its day, so
+    extending a history costs only the days added.
+    """
+    for rx_record in resident_prescriptions:
+        doses_per_day = rx_record["data"]["dosage_instruction"][0]["timing"]["repeat"][
+            "frequency"
+        ]
+        start_date = rx_record["data"]["period"]["start"]
+        if doses_per_day == 0 or start_date > end_date:
+            continue
 
-                prescription_administration.append(
-                    {
-                        "id": generate_uuid(),
-                        "data": {
-                            "resident_id": resident_id,
-                            "prescription_id": rx_record["id"],
-                            "medication": rx_record["data"]["medication"],
-                            "recorder_id": random.choice(staff_ids),
-                            "status": random.choice(ADMINISTRATION_STATUSES),
-                            "effective_datetime": admin_time,
-                            "dosage": {
-                                "route": rx_record["data"]["dosage_instruction"][0][
-                                    "route"
-                                ],
-                                "administered_dose": administered_dosage,
-                                "dose_number": dose_num
-                                + 1,  # Add the dose number (1-based)
-                            },
-                        },
-                    }
-                )
-            current_date += timedelta(days=1)
-    return prescription_administration
+        # One administration day per calendar day from the start, inclusive
+        total_days = (end_date - start_date) // ONE_DAY + 1
+        skipped_days = (after - start_date) // ONE_DAY if after else 0
+        for first_day in range(max(0, skipped_days), total_days, BATCH_DAYS):
+            yield from expand_prescription_administration(
+                resident_id,
+                rx_record,
+                staff_ids,
+                first_day,
+                min(BATCH_DAYS, total_days - first_day),
+                end_date,
+                rng,
+                after,
+            )
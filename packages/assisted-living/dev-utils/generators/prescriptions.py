@@ -12,18 +12,19 @@ def generate_prescriptions_for_resident(
     end_date: datetime,
     prescriptions_templates: list,
     dosage_instructions: dict,
+    rng: random.Random,
 ) -> list:
-    num_prescriptions = random.randint(1, 3)
+    num_prescriptions = rng.randint(1, 3)
     prescriptions = []
     for _ in range(num_prescriptions):
         if prescriptions_templates:
-            rx_template = random.choice(prescriptions_templates)
+            rx_template = rng.choice(prescriptions_templates)
 
             dosage_obj = {
-                "timing": random.choice(dosage_instructions["timing"]),
-                "site": random.choice(dosage_instructions["site"]),
-                "route": random.choice(dosage_instructions["route"]),
-                "method": random.choice(dosage_instructions["method"]),
+                "timing": rng.choice(dosage_instructions["timing"]),
+                "site": rng.choice(dosage_instructions["site"]),
+                "route": rng.choice(dosage_instructions["route"]),
+                "method": rng.choice(dosage_instructions["method"]),
                 "dose_and_rate": [
                     {
                         "dose_quantity": {
@@ -35,16 +36,18 @@ def generate_prescriptions_for_resident(
             }
 
             rx_record = {
-                "id": generate_uuid(),
+                "id": generate_uuid(rng),
                 "data": {
                     "resident_id": resident_id,
-                    "recorder_id": random.choice(staff_ids),
+                    "recorder_id": rng.choice(staff_ids),
                     "period": {
-                        "start": get_random_datetime(start_date, intermediary_date),
-                        "end": get_random_datetime(intermediary_date, end_date),
+                        "start": get_random_datetime(
+                            start_date, intermediary_date, rng
+                        ),
+                        "end": get_random_datetime(intermediary_date, end_date, rng),
                     },
-                    "status": random.choice(PRESCRIPTION_STATUSES),
-                    "adherence": random.choice(PRESCRIPTION_ADHERENCE_STATUSES),
+                    "status": rng.choice(PRESCRIPTION_STATUSES),
+                    "adherence": rng.choice(PRESCRIPTION_ADHERENCE_STATUSES),
                     "medication": rx_template,
                     "dosage_instruction": [dosage_obj],
                 },
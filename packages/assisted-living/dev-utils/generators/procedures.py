@@ -10,18 +10,19 @@ def generate_procedures_for_resident(
     staff_ids: list,
     start_date: datetime,
     end_date: datetime,
+    rng: random.Random,
 ) -> list:
     """Generates a list of procedures for a resident that conforms to the ProcedureSchema."""
-    num_procedures = random.randint(0, 3)
+    num_procedures = rng.randint(0, 3)
     procedures = []
 
     for _ in range(num_procedures):
-        procedure_code = random.choice(SNOMED_PROCEDURES)
-        performed_time = get_random_datetime(start_date, end_date)
-        performer_id = random.choice(staff_ids)
+        procedure_code = rng.choice(SNOMED_PROCEDURES)
+        performed_time = get_random_datetime(start_date, end_date, rng)
+        performer_id = rng.choice(staff_ids)
 
         procedure = {
-            "id": generate_uuid(),
+            "id": generate_uuid(rng),
             "data": {
                 "subject": {"id": resident_id, "name": resident_name},
                 "focus": f"Procedure for {resident_id}",
@@ -35,21 +36,21 @@ def generate_procedures_for_resident(
                     ],
                     "text": procedure_code["display"],
                 },
-                "status": random.choice(PROCEDURE_STATUSES),
+                "status": rng.choice(PROCEDURE_STATUSES),
                 "occurrence": {
                     "start": performed_time,
-                    "end": performed_time + timedelta(minutes=random.randint(15, 60)),
+                    "end": performed_time + timedelta(minutes=rng.randint(15, 60)),
                 },
                 "performer": {
                     "id": performer_id,
                     "name": f"Staff Member {staff_ids.index(performer_id) + 1}",
                     "period": {
                         "start": performed_time,
-                        "end": performed_time + timedelta(minutes=random.randint(10, 60)),
+                        "end": performed_time + timedelta(minutes=rng.randint(10, 60)),
                     },
                 },
                 "outcome": "successful",
-                "recorded_at": performed_time + timedelta(minutes=random.randint(5, 30)),
+                "recorded_at": performed_time + timedelta(minutes=rng.randint(5, 30)),
             },
         }
         procedures.append(procedure)
@@ -0,0 +1,128 @@
+import cProfile
+import os
+import signal
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Stack sampling interval, in seconds of CPU time
+SAMPLE_INTERVAL = 0.001
+
+_profiler = None
+
+
+class Profiler:
+    """Profiles a run by stage.
+
+    Stages are named scopes (e.g. "generate:observations") entered with
+    stage(). By default the profiler only records each stage's call count and
+    wall time, which costs next to nothing. With stacks=True it instead runs
+    cProfile over the whole run and samples the Python stack on a CPU timer,
+    filing each sample under the stages active when it was taken, which gives
+    collapsed stacks for flamegraph tools. Both slow pure-Python code (such as
+    the JSON encoder) several times over, so stage times aren't reported in
+    that mode.
+    """
+
+    def __init__(self, stacks: bool = False):
+        self.stacks = stacks
+        self.profile = cProfile.Profile() if stacks else None
+        self.stage_seconds = defaultdict(float)
+        self.stage_calls = Counter()
+        self.samples = Counter()
+        self._stages = []
+
+    def _sample(self, signum, frame):
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            filename = os.path.basename(code.co_filename)
+            frames.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+            frame = frame.f_back
+        self.samples[";".join(["run", *self._stages, *reversed(frames)])] += 1
+
+    def start(self):
+        if not self.stacks:
+            return
+        signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, SAMPLE_INTERVAL, SAMPLE_INTERVAL)
+        self.profile.enable()
+
+    def stop(self):
+        if not self.stacks:
+            return
+        self.profile.disable()
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+    @contextmanager
+    def stage(self, name: str):
+        self._stages.append(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] += time.perf_counter() - started
+            self.stage_calls[name] += 1
+            self._stages.pop()
+
+    def breakdown(self) -> str:
+        """Formats the per-stage time breakdown, slowest stage first."""
+        total = sum(self.stage_seconds.values()) or 1.0
+        lines = [f"{'stage':<40} {'calls':>9} {'seconds':>9} {'share':>7}"]
+        for name, seconds in sorted(
+            self.stage_seconds.items(), key=lambda item: item[1], reverse=True
+        ):
+            lines.append(
+                f"{name:<40} {self.stage_calls[name]:>9} {seconds:>9.3f} "
+                f"{seconds / total:>7.1%}"
+            )
+        return "\n".join(lines)
+
+    def write(self, output_dir: str) -> list:
+        """Writes the breakdown, or with stacks the cProfile stats and collapsed
+        stacks, to output_dir."""
+        os.makedirs(output_dir, exist_ok=True)
+        if not self.stacks:
+            stages_path = os.path.join(output_dir, "stages.txt")
+            with open(stages_path, "w") as f:
+                f.write(self.breakdown() + "\n")
+            return [stages_path]
+        stats_path = os.path.join(output_dir, "profile.pstats")
+        self.profile.dump_stats(stats_path)
+        # One "frame;frame;... count" line per stack: flamegraph.pl, speedscope
+        # and similar tools read this directly
+        stacks_path = os.path.join(output_dir, "stacks.collapsed")
+        with open(stacks_path, "w") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+        return [stats_path, stacks_path]
+
+
+def start(stacks: bool = False) -> Profiler:
+    """Starts profiling; stage() scopes are recorded until stop()."""
+    global _profiler
+    _profiler = Profiler(stacks)
+    _profiler.start()
+    return _profiler
+
+
+def stop() -> Profiler:
+    global _profiler
+    profiler, _profiler = _profiler, None
+    profiler.stop()
+    return profiler
+
+
+def enabled() -> bool:
+    return _profiler is not None
+
+
+@contextmanager
+def stage(name: str):
+    """Times the enclosed block as stage name while profiling; else a no-op."""
+    if _profiler is None:
+        yield
+        return
+    with _profiler.stage(name):
+        yield
@@ -0,0 +1,163 @@
+import random
+from collections.abc import Iterator
+from datetime import date, timedelta
+from .utils import generate_uuid, make_rng
+
+FIRST_NAMES = {
+    "female": [
+        "Julia",
+        "Kayla",
+        "Nadine",
+        "Pearl",
+        "Stephanie",
+        "Melody",
+        "Barbara",
+        "Susan",
+        "Jennifer",
+        "Dorothy",
+        "Margaret",
+        "Ruth",
+        "Helen",
+        "Evelyn",
+        "Grace",
+        "Irene",
+        "Adaeze",
+        "Funmilayo",
+        "Ngozi",
+        "Yetunde",
+    ],
+    "male": [
+        "Jeff",
+        "Alfred",
+        "Max",
+        "Horace",
+        "James",
+        "Robert",
+        "Charles",
+        "Michael",
+        "Harold",
+        "Walter",
+        "Arthur",
+        "Frank",
+        "Eugene",
+        "Raymond",
+        "Samuel",
+        "Peter",
+        "Chinedu",
+        "Emeka",
+        "Olumide",
+        "Tunde",
+    ],
+    "other": [
+        "Alex",
+        "Jordan",
+        "Taylor",
+        "Morgan",
+        "Casey",
+        "Jamie",
+        "Riley",
+        "Avery",
+        "Quinn",
+        "Rowan",
+        "Sage",
+        "Remi",
+    ],
+}
+LAST_NAMES = [
+    "White",
+    "Littel",
+    "Dietrich",
+    "O'Keefe",
+    "Kihn",
+    "Nolan",
+    "Oberbrunner",
+    "Hudson",
+    "Harvey",
+    "Garcia",
+    "Moore",
+    "Smith",
+    "Jones",
+    "Anderson",
+    "Martin",
+    "Miller",
+    "Adeyemi",
+    "Okafor",
+    "Balogun",
+    "Eze",
+    "Nwosu",
+    "Bello",
+    "Johnson",
+    "Brown",
+]
+GENDERS = ["male", "female", "other"]
+GENDER_WEIGHTS = [115, 99, 69]  # Matches the hand-made residents file
+PRIMARY_CARE_PHYSICIANS = [
+    "Dr. Jennifer Garcia",
+    "Dr. Barbara Moore",
+    "Dr. James Smith",
+    "Dr. Robert Jones",
+    "Dr. Susan Anderson",
+    "Dr. Charles Martin",
+    "Dr. Michael Miller",
+]
+EMAIL_DOMAINS = ["hotmail.com", "gmail.com", "yahoo.com"]
+ROOM_LETTERS = "ABCD"
+
+# Residents are born between these dates (ages roughly 65-100)
+OLDEST_DOB = date(1925, 1, 1)
+YOUNGEST_DOB = date(1960, 12, 31)
+
+
+def generate_phone(rng: random.Random) -> str:
+    return (
+        f"({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(0, 9999):04d}"
+    )
+
+
+def generate_room(rng: random.Random) -> str:
+    """Rooms are either floor-numbered (e.g. 310) or wing-lettered (e.g. 12B)."""
+    if rng.random() < 0.5:
+        return f"{rng.randint(1, 4)}{rng.randint(1, 30):02d}"
+    return f"{rng.randint(1, 20)}{rng.choice(ROOM_LETTERS)}"
+
+
+def synthesize_resident(
+    index: int, facility_ids: list, avatar_urls: list, rng: random.Random
+) -> dict:
+    """Makes one resident record shaped like those in the residents file."""
+    gender = rng.choices(GENDERS, weights=GENDER_WEIGHTS)[0]
+    first_name = rng.choice(FIRST_NAMES[gender])
+    last_name = rng.choice(LAST_NAMES)
+    dob = OLDEST_DOB + timedelta(days=rng.randint(0, (YOUNGEST_DOB - OLDEST_DOB).days))
+
+    return {
+        "id": generate_uuid(rng),
+        "data": {
+            "resident_name": f"{first_name} {last_name}",
+            "gender": gender,
+            "facility_id": rng.choice(facility_ids),
+            "room_no": generate_room(rng),
+            "avatar_url": rng.choice(avatar_urls) if avatar_urls else "",
+            "dob": dob.strftime("%m/%d/%Y"),
+            "pcp": rng.choice(PRIMARY_CARE_PHYSICIANS),
+            # The index keeps addresses unique however many residents there are
+            "resident_email": f"{first_name}{last_name}{index + 1}@{rng.choice(EMAIL_DOMAINS)}",
+            "cell_phone": generate_phone(rng),
+            "work_phone": generate_phone(rng),
+            "home_phone": generate_phone(rng),
+        },
+    }
+
+
+def synthesize_residents(
+    count: int, facility_ids: list, avatar_urls: list, seed
+) -> Iterator[dict]:
+    """Yields count synthetic residents lazily.
+
+    Each resident draws from its own stream keyed by the seed and its index,
+    so the same seed always yields the same residents and nothing has to be
+    held in memory.
+    """
+    for index in range(count):
+        rng = make_rng(seed, "synthetic-resident", index)
+        yield synthesize_resident(index, facility_ids, avatar_urls, rng)
@@ -3,12 +3,24 @@ from datetime import timedelta, datetime
 from .utils import generate_uuid, get_random_datetime
 from .config import TASK_STATUSES, TASK_PRIORITIES
 
+# How many tasks a resident's history has
+TASK_COUNT_RANGE = (1, 4)
+
 
 def generate_tasks_for_resident(
-    resident_id: str, staff_ids: list, start_date: datetime, end_date: datetime
+    resident_id: str,
+    staff_ids: list,
+    start_date: datetime,
+    end_date: datetime,
+    rng: random.Random,
+    num_tasks: int = None,
 ) -> list:
-    """Generates a list of tasks for a resident that conforms to the TaskSchema."""
-    num_tasks = random.randint(1, 4)
+    """Generates a list of tasks for a resident that conforms to the TaskSchema.
+
+    Their number is drawn from TASK_COUNT_RANGE unless given.
+    """
+    if num_tasks is None:
+        num_tasks = rng.randint(*TASK_COUNT_RANGE)
     tasks = []
 
     sample_activities = {
@@ -19,22 +31,22 @@ def generate_tasks_for_resident(
     }
 
     for _ in range(num_tasks):
-        activity_code = random.choice(list(sample_activities.keys()))
+        activity_code = rng.choice(list(sample_activities.keys()))
         description = sample_activities.get(activity_code, sample_activities["default"])
-        created_time = get_random_datetime(start_date, end_date)
-        performer_id = random.choice(staff_ids)
+        created_time = get_random_datetime(start_date, end_date, rng)
+        performer_id = rng.choice(staff_ids)
 
         task = {
-            "id": generate_uuid(),
+            "id": generate_uuid(rng),
             "data": {
                 "resident_id": resident_id,
                 "activity_code": activity_code,
-                "status": random.choice(TASK_STATUSES),
+                "status": rng.choice(TASK_STATUSES),
                 "intent": "order",  # Assuming most tasks are orders
-                "priority": random.choice(TASK_PRIORITIES),
+                "priority": rng.choice(TASK_PRIORITIES),
                 "requested_period": {
                     "start": created_time,
-                    "end": created_time + timedelta(days=random.randint(1, 7)),
+                    "end": created_time + timedelta(days=rng.randint(1, 7)),
                 },
                 "execution_period": {
                     "start": created_time,  # Can be updated later
@@ -45,7 +57,7 @@ def generate_tasks_for_resident(
                     "name": f"Staff Member {staff_ids.index(performer_id) + 1}",
                     "period": {
                         "start": created_time,
-                        "end": created_time + timedelta(minutes=random.randint(10, 60)),
+                        "end": created_time + timedelta(minutes=rng.randint(10, 60)),
                     },
                 },
                 "notes": description,
@@ -0,0 +1,157 @@
+import csv
+import os
+import pickle
+import re
+from .cache import fingerprint
+
+SNOMED_SYSTEM = "http://snomed.info/sct"
+LOINC_SYSTEM = "http://loinc.org"
+CACHE_DIR = "demo-data/.cache/terminology"
+# Bump when parsing changes, so indexes compiled by older code are rebuilt
+INDEX_VERSION = 1
+
+# "Asthma (disorder)" -> "Asthma "; compiled once rather than per line
+SEMANTIC_TAG = re.compile(r"\([^)]*\)")
+# RF2 description type of a concept's fully specified name
+RF2_FULLY_SPECIFIED_NAME = "900000000000003001"
+
+
+class Terminology:
+    """Concepts of one code system, indexed by code.
+
+    Concepts are dicts with a code, a display and any extra fields of the
+    source (e.g. a reaction's severity). They can be looked up by code in
+    O(1) and, being a sequence, sampled with rng.choice. str() gives a digest
+    of the content, which is what generator cache keys see of it.
+    """
+
+    def __init__(self, system: str, concepts: list):
+        self.system = system
+        self.concepts = concepts
+        self.by_code = {concept["code"]: concept for concept in concepts}
+        self.digest = fingerprint(system, concepts)
+
+    def __len__(self):
+        return len(self.concepts)
+
+    def __getitem__(self, position: int) -> dict:
+        return self.concepts[position]
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.by_code
+
+    def __str__(self):
+        return f"Terminology({self.system}, {self.digest})"
+
+    def lookup(self, code: str):
+        return self.by_code.get(code)
+
+    def coding(self, concept: dict) -> dict:
+        """The FHIR coding of concept."""
+        return {
+            "system": self.system,
+            "code": concept["code"],
+            "display": concept["display"],
+        }
+
+
+# --- Source Readers ---
+# Each yields concept dicts from one kind of source file.
+def read_pipe_file(path: str, fields: tuple = ()):
+    """Reads the example files: "code |Display (tag)|extra|..." per line."""
+    with open(path, "r") as f:
+        for line in f:
+            parts = line.strip().split("|")
+            if len(parts) < 2 + len(fields):
+                continue
+            concept = {
+                "code": parts[0].strip(),
+                "display": SEMANTIC_TAG.sub("", parts[1]).strip(),
+            }
+            for offset, field in enumerate(fields):
+                concept[field] = parts[2 + offset].strip()
+            yield concept
+
+
+def read_rf2_descriptions(path: str, semantic_tag: str = None, prefix: str = None):
+    """Reads a SNOMED CT RF2 description file (sct2_Description_*.txt).
+
+    Takes each active concept's fully specified name, optionally only those
+    with the given semantic tag (e.g. "disorder") and display prefix.
+    """
+    tag_suffix = f"({semantic_tag})" if semantic_tag else ""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        rows = csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE)
+        header = next(rows)
+        active, concept_id, type_id, term = (
+            header.index(column) for column in ("active", "conceptId", "typeId", "term")
+        )
+        for row in rows:
+            if row[active] != "1" or row[type_id] != RF2_FULLY_SPECIFIED_NAME:
+                continue
+            if not row[term].endswith(tag_suffix):
+                continue
+            display = SEMANTIC_TAG.sub("", row[term]).strip()
+            if prefix and not display.startswith(prefix):
+                continue
+            yield {"code": row[concept_id], "display": display}
+
+
+def read_loinc_csv(path: str):
+    """Reads the Loinc.csv table of a LOINC release, skipping retired terms."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            if row.get("STATUS", "ACTIVE") not in ("ACTIVE", "TRIAL"):
+                continue
+            yield {
+                "code": row["LOINC_NUM"],
+                "display": row.get("LONG_COMMON_NAME") or row["COMPONENT"],
+            }
+
+
+def read_source(path: str, **options):
+    """Picks the reader for path from its name: RF2, LOINC CSV or example file."""
+    name = os.path.basename(path)
+    if name.startswith("sct2_Description"):
+        return read_rf2_descriptions(path, **options)
+    if name.lower().endswith(".csv"):
+        return read_loinc_csv(path, **options)
+    return read_pipe_file(path, **options)
+
+
+def load_terminology(
+    path: str, system: str, missing_ok: bool = False, **options
+) -> Terminology:
+    """Loads path as an indexed Terminology, compiling it on first use.
+
+    The compiled index is pickled under CACHE_DIR, keyed on the source's path,
+    size and modification time and the reader options, so later runs skip
+    parsing entirely until the source changes. A missing source raises
+    FileNotFoundError, or with missing_ok (for the bundled example files)
+    gives an empty terminology.
+    """
+    if not os.path.exists(path):
+        if missing_ok:
+            return Terminology(system, [])
+        raise FileNotFoundError(f"Terminology source not found: {path}")
+
+    stat = os.stat(path)
+    key = fingerprint(
+        INDEX_VERSION,
+        os.path.abspath(path),
+        stat.st_size,
+        stat.st_mtime_ns,
+        system,
+        options,
+    )
+    index_path = os.path.join(CACHE_DIR, f"{key}.pickle")
+    if os.path.exists(index_path):
+        with open(index_path, "rb") as f:
+            return pickle.load(f)
+
+    terminology = Terminology(system, list(read_source(path, **options)))
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(f"{index_path}.tmp", "wb") as f:
+        pickle.dump(terminology, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f"{index_path}.tmp", index_path)
+    return terminology
@@ -0,0 +1,175 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from .writers import WRITERS, output_path
+
+# How much of the input is read at a time
+READ_SIZE = 1024 * 1024
+
+_decoder = json.JSONDecoder()
+
+
+def detect_format(path: str) -> str:
+    """The format path's extension implies: "ndjson", or "json" for an array."""
+    return "ndjson" if path.endswith(".ndjson") else "json"
+
+
+def iter_ndjson(path: str, raw: bool = False):
+    with open(path, "r") as f:
+        for line in f:
+            if line := line.strip():
+                yield line if raw else json.loads(line)
+
+
+def iter_json_array(path: str, raw: bool = False):
+    """Yields the elements of a JSON array file one at a time.
+
+    The file is read in READ_SIZE chunks and each element is decoded as soon
+    as it is complete, so memory holds one chunk and one record, not the array.
+    With raw, each element's JSON text is yielded instead of its value.
+    """
+    with open(path, "r") as f:
+        buffer = f.read(READ_SIZE)
+        position = 0
+        eof = not buffer
+        started = False
+        while True:
+            # Skip whitespace and the array's punctuation up to the next element
+            while position < len(buffer):
+                char = buffer[position]
+                if char == "[" and not started:
+                    started = True
+                elif char == "]" and started:
+                    return
+                elif char not in " \t\r\n" and not (char == "," and started):
+                    break
+                position += 1
+            if position < len(buffer):
+                if not started:
+                    raise ValueError(f"{path} is not a JSON array")
+                try:
+                    record, end = _decoder.raw_decode(buffer, position)
+                    # A record running to the end of the buffer may be cut short
+                    if end < len(buffer) or eof:
+                        yield buffer[position:end] if raw else record
+                        position = end
+                        continue
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+            elif eof:
+                if started:
+                    raise ValueError(f"{path} ends inside the array")
+                return
+            chunk = f.read(READ_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+
+def iter_records(path: str, input_format: str = None, raw: bool = False):
+    """Yields the records (or with raw, their JSON text) of an array or NDJSON
+    file incrementally."""
+    if (input_format or detect_format(path)) == "ndjson":
+        return iter_ndjson(path, raw)
+    return iter_json_array(path, raw)
+
+
+def collection_files(path: str) -> list:
+    """The files a collection written for path (by open_writer) is in, in order.
+
+    These are the shards listed in its manifest if it was sharded, otherwise
+    the newest of its array and NDJSON files; none if it hasn't been written.
+    """
+    manifest_path = output_path(path, "json", sharded=True)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        directory = os.path.dirname(manifest_path)
+        return [os.path.join(directory, shard["file"]) for shard in manifest["shards"]]
+    paths = [output_path(path, fmt) for fmt in WRITERS]
+    existing = [p for p in paths if os.path.exists(p)]
+    return [max(existing, key=os.path.getmtime)] if existing else []
+
+
+def iter_collection(path: str, raw: bool = False):
+    """Yields the records of the collection written for path, across its shards."""
+    for file_path in collection_files(path):
+        yield from iter_records(file_path, raw=raw)
+
+
+def _transform_batch(transform, encode, batch: list) -> list:
+    results = []
+    for record in batch:
+        record = transform(record)
+        if record is not None:
+            results.append(encode(record) if encode else record)
+    return results
+
+
+def transform_batches(
+    records, transform, workers: int = 1, batch_size: int = 256, encode=None
+):
+    """Applies transform to records, yielding the results in input order.
+
+    transform takes a record and returns the record to write, or None to
+    drop it. With encode, results are yielded encoded, which moves encoding
+    into the workers too. With more than one worker, batches go to a process
+    pool (transform must then be picklable, e.g. a module-level function or
+    a functools.partial of one), with at most two batches per worker in
+    flight.
+    """
+    records = iter(records)
+    if workers <= 1:
+        for batch in iter(lambda: list(islice(records, batch_size)), []):
+            yield from _transform_batch(transform, encode, batch)
+        return
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while batch := list(islice(records, batch_size)):
+            pending.append(executor.submit(_transform_batch, transform, encode, batch))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def transform_file(
+    path: str,
+    transform,
+    output_path: str = None,
+    workers: int = 1,
+    batch_size: int = 256,
+    input_format: str = None,
+    output_format: str = None,
+) -> int:
+    """Streams path through transform into output_path (default: path itself).
+
+    Records are read incrementally, transformed and encoded in batches and
+    written as they come back, so memory stays bounded by the batches in
+    flight. The output is written under a temporary name and moved into place
+    only once complete, so a failure leaves the original file untouched.
+    Formats default to the ones the paths' extensions imply; an array is
+    written as json.dump(records, f, indent=2) would. Returns the number of
+    records written.
+    """
+    input_format = input_format or detect_format(path)
+    output_path = output_path or path
+    output_format = output_format or detect_format(output_path)
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    writer_class = WRITERS[output_format]
+    with writer_class(output_path) as writer:
+        for text in transform_batches(
+            iter_records(path, input_format),
+            transform,
+            workers,
+            batch_size,
+            writer_class.encode,
+        ):
+            writer.write_encoded(text)
+    return writer.count
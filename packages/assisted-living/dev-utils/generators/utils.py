@@ -1,73 +1,78 @@
 import uuid
 import random
-import os
-import re
 from datetime import timedelta, time, datetime
 
 
-def convert_times(obj):
-    if isinstance(obj, dict):
-        return {k: convert_times(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_times(v) for v in obj]
-    elif isinstance(obj, datetime):
+def json_default(obj):
+    """Formats values json can't encode itself; used as json's default= hook.
+
+    json only calls this for datetimes and times, as it reaches them, so
+    records are serialized directly without first copying them into
+    string-only structures.
+    """
+    if isinstance(obj, datetime):
         return obj.isoformat().replace("+00:00", "Z")
-    elif isinstance(obj, time):
+    if isinstance(obj, time):
         return obj.isoformat()
-    else:
-        return obj
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def make_rng(seed, *keys) -> random.Random:
+    """Returns an independent random stream for seed and keys.
+
+    Streams are derived from the seed and keys alone (e.g. a resident id and a
+    collection name), so consuming more or less of one stream never shifts the
+    values drawn from another.
+    """
+    return random.Random(":".join(str(part) for part in (seed, *keys)))
+
+
+def generate_uuid(rng=random):
+    # Drawn from the (seeded) random stream rather than os.urandom so a seeded
+    # run reproduces its ids.
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
 
+def generate_uuids(count: int, rng=random) -> list:
+    """Generates count version-4 uuids from a single draw of the random stream.
 
-def generate_uuid():
-    return str(uuid.uuid4())
+    The ids are formatted straight from the hex digits, which is much cheaper
+    than building a uuid.UUID each when they are needed by the hundred thousand.
+    """
+    digits = rng.randbytes(16 * count).hex()
+    return [
+        f"{h[:8]}-{h[8:12]}-4{h[13:16]}-{_UUID_VARIANT[h[16]]}{h[17:20]}-{h[20:]}"
+        for h in (digits[i : i + 32] for i in range(0, 32 * count, 32))
+    ]
 
 
-def get_random_datetime(start_date, end_date):
+def iter_uuids(rng=random, batch_size: int = 64):
+    """Yields uuids endlessly, drawing them batch_size at a time."""
+    while True:
+        yield from generate_uuids(batch_size, rng)
+
+
+# RFC 4122 variant: the top two bits of the clock_seq nibble are always 10
+_UUID_VARIANT = {digit: "89ab"[int(digit, 16) & 3] for digit in "0123456789abcdef"}
+
+
+def get_random_datetime(start_date, end_date, rng=random):
     time_between_dates = end_date - start_date
     seconds_between_dates = int(time_between_dates.total_seconds())
-    
+
     if seconds_between_dates <= 0:
         return start_date
-        
-    random_number_of_seconds = random.randrange(seconds_between_dates)
+
+    random_number_of_seconds = rng.randrange(seconds_between_dates)
     return start_date + timedelta(seconds=random_number_of_seconds)
 
 
-def load_snomed_file(filepath):
-    data = []
-    if os.path.exists(filepath):
-        with open(filepath, "r") as f:
-            for line in f:
-                parts = line.strip().split("|")
-                if len(parts) >= 2:
-                    data.append(
-                        [
-                            {
-                                "system": "http://snomed.info/sct",
-                                "code": parts[0].strip(),
-                                "display": (re.sub(r"\([^)]*\)", "", parts[1])).strip(),
-                            }
-                        ]
-                    )
-    return data
-
-
-def load_allergy_reactions(filepath):
-    reactions = []
-    if os.path.exists(filepath):
-        with open(filepath, "r") as f:
-            for line in f:
-                parts = line.strip().split("|")
-                if len(parts) >= 3:
-                    reactions.append(
-                        {
-                            "code": parts[0].strip(),
-                            "display": (re.sub(r"\([^)]*\)", "", parts[1])).strip(),
-                            "severity": parts[2].strip(),
-                        }
-                    )
-    return reactions
-
-
-def get_loinc_codes(vital_ranges):
-    return [k for k, _ in vital_ranges.items()]
+def get_loinc_codes(vital_ranges, loinc=None):
+    """The vital sign codes to sample, less any missing from a loaded LOINC index."""
+    codes = [k for k, _ in vital_ranges.items()]
+    if loinc:
+        unknown = [code for code in codes if code not in loinc]
+        if unknown:
+            print(f"Warning: vital codes not in the LOINC source: {', '.join(unknown)}")
+        codes = [code for code in codes if code in loinc]
+    return codes
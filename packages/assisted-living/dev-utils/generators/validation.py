@@ -0,0 +1,211 @@
+import json
+import math
+from collections import Counter
+from datetime import date, datetime
+from functools import cache, partial
+from .transform import iter_collection, transform_batches
+
+# How many offending record ids are kept per violation
+EXAMPLES_PER_VIOLATION = 3
+
+
+# --- Column Types ---
+# Each takes a JSON value and says whether BigQuery accepts it for the type.
+def _is_string(value) -> bool:
+    return isinstance(value, str)
+
+
+def _is_integer(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value) -> bool:
+    if isinstance(value, float):
+        return math.isfinite(value)
+    return _is_integer(value)
+
+
+def _is_boolean(value) -> bool:
+    return isinstance(value, bool)
+
+
+def _parses_as(parse):
+    def check(value) -> bool:
+        if not isinstance(value, str):
+            return False
+        try:
+            parse(value)
+        except ValueError:
+            return False
+        return True
+
+    return check
+
+
+def _is_timestamp(value) -> bool:
+    # An ISO 8601 string, or seconds since the epoch
+    return _is_number(value) or _parses_as(datetime.fromisoformat)(value)
+
+
+TYPE_CHECKS = {
+    "STRING": _is_string,
+    "INTEGER": _is_integer,
+    "INT64": _is_integer,
+    "NUMERIC": _is_number,
+    "BIGNUMERIC": _is_number,
+    "FLOAT": _is_number,
+    "FLOAT64": _is_number,
+    "BOOLEAN": _is_boolean,
+    "BOOL": _is_boolean,
+    "TIMESTAMP": _is_timestamp,
+    "DATETIME": _parses_as(datetime.fromisoformat),
+    "DATE": _parses_as(date.fromisoformat),
+}
+RECORD_TYPES = {"RECORD", "STRUCT"}
+
+
+def _type_name(value) -> str:
+    return "null" if value is None else type(value).__name__
+
+
+# --- Compiling Schemas ---
+def _compile_field(field: dict, path: str):
+    """A check(value, errors) for one column, with its type and mode resolved."""
+    field_type = field["type"].upper()
+    mode = field.get("mode", "NULLABLE").upper()
+    if field_type in RECORD_TYPES:
+        check_value = _compile_record(field["fields"], path)
+    elif field_type in TYPE_CHECKS:
+        is_valid = TYPE_CHECKS[field_type]
+
+        def check_value(value, errors):
+            if not is_valid(value):
+                errors.append((path, f"expected {field_type}, got {_type_name(value)}"))
+
+    else:
+        raise ValueError(f"Unsupported BigQuery type {field_type} for {path}")
+
+    if mode == "REPEATED":
+
+        def check(value, errors):
+            if value is None:
+                return
+            if not isinstance(value, list):
+                errors.append((path, f"expected a list, got {_type_name(value)}"))
+                return
+            for item in value:
+                if item is None:
+                    errors.append((path, "null in a repeated field"))
+                else:
+                    check_value(item, errors)
+
+    elif mode == "REQUIRED":
+
+        def check(value, errors):
+            if value is None:
+                errors.append((path, "missing required value"))
+            else:
+                check_value(value, errors)
+
+    elif mode == "NULLABLE":
+
+        def check(value, errors):
+            if value is not None:
+                check_value(value, errors)
+
+    else:
+        raise ValueError(f"Unsupported BigQuery mode {mode} for {path}")
+    return check
+
+
+def _compile_record(fields: list, path: str = ""):
+    checks = tuple(
+        (field["name"], _compile_field(field, f"{path}.{field['name']}".lstrip(".")))
+        for field in fields
+    )
+    known = frozenset(name for name, _ in checks)
+
+    def check(row, errors):
+        if not isinstance(row, dict):
+            errors.append((path or "(row)", f"expected RECORD, got {_type_name(row)}"))
+            return
+        for name, check_field in checks:
+            check_field(row.get(name), errors)
+        for name in row.keys() - known:
+            errors.append((f"{path}.{name}".lstrip("."), "not in the schema"))
+
+    return check
+
+
+def compile_schema(schema: list):
+    """Compiles a BigQuery table schema into a function checking one row.
+
+    Types and modes are resolved once, into a nested check per column, so
+    checking a row only runs the checks its columns need. The function returns
+    a list of (field path, message) violations, empty for a valid row.
+    """
+    check = _compile_record(schema)
+
+    def check_row(row) -> list:
+        errors = []
+        check(row, errors)
+        return errors
+
+    return check_row
+
+
+@cache
+def load_schema(path: str):
+    """The compiled checker for the schema file at path, compiled once per process."""
+    with open(path, "r") as f:
+        return compile_schema(json.load(f))
+
+
+def bigquery_row(record: dict) -> dict:
+    """The row the BigQuery backfill inserts for a record: its id and its data."""
+    return {"id": record["id"], **record["data"]}
+
+
+def _check_record(schema_path: str, record: dict) -> list:
+    errors = load_schema(schema_path)(bigquery_row(record))
+    return [(record.get("id"), field, message) for field, message in errors]
+
+
+# --- Validating Collections ---
+def validate_collection(
+    path: str, schema_path: str, workers: int = 1, batch_size: int = 1024
+) -> dict:
+    """Checks every record of the collection written for path against a schema.
+
+    Records are streamed from the collection's file or shards and checked in
+    batches, on a process pool when workers > 1, so memory is bounded by the
+    batches in flight. Returns the number of records and of invalid ones, a
+    count of each (field, message) violation, and a few ids of records with
+    each.
+    """
+    records = 0
+    invalid = 0
+    violations = Counter()
+    examples = {}
+    for errors in transform_batches(
+        iter_collection(path),
+        partial(_check_record, schema_path),
+        workers,
+        batch_size,
+    ):
+        records += 1
+        if not errors:
+            continue
+        invalid += 1
+        for record_id, field, message in errors:
+            violation = (field, message)
+            violations[violation] += 1
+            ids = examples.setdefault(violation, [])
+            if len(ids) < EXAMPLES_PER_VIOLATION and record_id not in ids:
+                ids.append(record_id)
+    return {
+        "records": records,
+        "invalid": invalid,
+        "violations": violations,
+        "examples": examples,
+    }
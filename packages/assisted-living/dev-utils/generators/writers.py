@@ -0,0 +1,402 @@
+import json
+import os
+import re
+import shutil
+from .utils import json_default
+
+# Encoders are built once and shared; datetimes are formatted as they're reached
+ARRAY_ENCODER = json.JSONEncoder(indent=2, default=json_default)
+NDJSON_ENCODER = json.JSONEncoder(separators=(",", ":"), default=json_default)
+
+
+class JsonArrayWriter:
+    """Streams records into a JSON array file.
+
+    The output is byte-for-byte what json.dump(records, f, indent=2) produces,
+    but records are encoded as they arrive instead of being held in a list.
+    The file is written under a temporary name and moved into place on close.
+    With fragment=True only the records (and the separators between them) are
+    written, so the file can later be spliced into another writer; the size of
+    each encoded record is kept in record_sizes for splitting it up again.
+    With replace_others=True, closing also removes what an earlier run wrote
+    the collection to in another format or as shards.
+    The encoders escape non-ASCII text, so sizes in characters are sizes in
+    bytes.
+    """
+
+    extension = ".json"
+    opening = "[\n"
+    separator = ",\n"
+    closing = "\n]"
+
+    def __init__(self, path: str, fragment: bool = False, replace_others: bool = False):
+        self.path = path
+        self.fragment = fragment
+        self.replace_others = replace_others
+        self.count = 0
+        self.size = 0
+        self.record_sizes = []
+        self._tmp_path = f"{path}.tmp"
+        self._file = open(self._tmp_path, "w")
+
+    @staticmethod
+    def encode(record) -> str:
+        return "  " + ARRAY_ENCODER.encode(record).replace("\n", "\n  ")
+
+    def _emit(self, text: str):
+        self._file.write(text)
+        self.size += len(text)
+
+    def _begin(self):
+        if self.count:
+            self._emit(self.separator)
+        elif not self.fragment:
+            self._emit(self.opening)
+
+    def write_encoded(self, text: str, count: int = 1):
+        """Writes count records already encoded (and separated) by this format."""
+        self._begin()
+        self._emit(text)
+        self.count += count
+        if self.fragment:
+            self.record_sizes.append(len(text))
+
+    def write(self, record):
+        self.write_encoded(self.encode(record))
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def append_fragment(self, path: str, count: int, record_sizes: list = None):
+        """Splices a fragment file written by a writer of the same format."""
+        if not count:
+            return
+        self._begin()
+        with open(path, "r") as fragment:
+            shutil.copyfileobj(fragment, self._file)
+        self.size += os.path.getsize(path)
+        self.count += count
+
+    def _end(self):
+        if not self.fragment:
+            self._emit(self.closing if self.count else "[]")
+
+    def finish(self):
+        """Completes the temporary file without moving it into place."""
+        self._end()
+        self._file.close()
+        return self._tmp_path
+
+    def close(self):
+        os.replace(self.finish(), self.path)
+        if self.replace_others:
+            remove_other_layouts(self.path, keep={os.path.basename(self.path)})
+
+    def discard(self):
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class NdjsonWriter(JsonArrayWriter):
+    """Streams records as newline-delimited JSON, one compact record per line."""
+
+    extension = ".ndjson"
+    opening = ""
+    separator = ""
+    closing = ""
+
+    @staticmethod
+    def encode(record) -> str:
+        return NDJSON_ENCODER.encode(record) + "\n"
+
+    def _begin(self):
+        pass
+
+    def _end(self):
+        pass
+
+
+class ShardedWriter:
+    """Splits a collection across numbered shard files, listed in a manifest.
+
+    data-plain.json becomes data-plain-00000.json, data-plain-00001.json, ...
+    next to a manifest.json giving each shard's record count and size. Every
+    shard is a complete file of the format, holding at most max_records
+    records and at most max_bytes bytes (a single larger record still gets a
+    shard of its own), so downstream stages can process shards in parallel
+    and restart from the first unfinished one. Shards are moved into place
+    together on close, the manifest last, and whatever else an earlier run
+    left for the collection (more shards, shards or a whole file in the other
+    format) is removed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        writer_class,
+        max_records: int = None,
+        max_bytes: int = None,
+        append: bool = False,
+    ):
+        self.directory, name = os.path.split(path)
+        self.stem, self.extension = os.path.splitext(name)
+        self.path = os.path.join(self.directory, MANIFEST_NAME)
+        self.writer_class = writer_class
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.count = 0
+        self.shards = []
+        self._finished = []
+        self._shard = None
+        # Appending adds new shards after those already in the manifest
+        self._existing_records = 0
+        if append:
+            with open(self.path, "r") as f:
+                manifest = json.load(f)
+            self.shards = manifest["shards"]
+            self._existing_records = manifest["records"]
+
+    def _shard_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{self.stem}-{number:05d}{self.extension}")
+
+    def _fits(self, shard, count: int, size: int) -> bool:
+        """Whether count more records, size bytes encoded, can go into shard."""
+        if self.max_records and shard.count + count > self.max_records:
+            return False
+        size += shard.size + len(shard.separator) if shard.count else len(shard.opening)
+        return not self.max_bytes or size + len(shard.closing) <= self.max_bytes
+
+    def _next_shard(self):
+        if self._shard:
+            self._finish_shard()
+        self._shard = self.writer_class(self._shard_path(len(self.shards)))
+        return self._shard
+
+    def _finish_shard(self):
+        shard = self._shard
+        self._finished.append((shard.finish(), shard.path))
+        self.shards.append(
+            {
+                "file": os.path.basename(shard.path),
+                "records": shard.count,
+                "bytes": shard.size,
+            }
+        )
+        self._shard = None
+
+    def write(self, record):
+        text = self.writer_class.encode(record)
+        shard = self._shard
+        if shard is None or shard.count and not self._fits(shard, 1, len(text)):
+            shard = self._next_shard()
+        shard.write_encoded(text)
+        self.count += 1
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def append_fragment(self, path: str, count: int, record_sizes: list):
+        """Splices a fragment file, splitting it wherever a shard fills up.
+
+        record_sizes are the fragment writer's; runs of records that fit the
+        current shard are copied across in one piece.
+        """
+        separator = len(self.writer_class.separator)
+        with open(path, "r") as fragment:
+            start = 0
+            while start < count:
+                shard = self._shard
+                if shard is None or (
+                    shard.count and not self._fits(shard, 1, record_sizes[start])
+                ):
+                    shard = self._next_shard()
+                end = start + 1
+                size = record_sizes[start]
+                while end < count and self._fits(
+                    shard, end - start + 1, size + separator + record_sizes[end]
+                ):
+                    size += separator + record_sizes[end]
+                    end += 1
+                shard.write_encoded(fragment.read(size), end - start)
+                fragment.read(separator)
+                self.count += end - start
+                start = end
+
+    def close(self):
+        if self._shard:
+            self._finish_shard()
+        for tmp_path, shard_path in self._finished:
+            os.replace(tmp_path, shard_path)
+        current = {shard["file"] for shard in self.shards}
+        remove_other_layouts(
+            os.path.join(self.directory, self.stem + self.extension),
+            keep=current | {MANIFEST_NAME},
+        )
+        manifest = {
+            "format": self.extension.lstrip("."),
+            "records": self._existing_records + self.count,
+            "max_records": self.max_records,
+            "max_bytes": self.max_bytes,
+            "shards": self.shards,
+        }
+        with open(f"{self.path}.tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def discard(self):
+        if self._shard:
+            self._shard.discard()
+        for tmp_path, _ in self._finished:
+            os.remove(tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class CollectionAppender:
+    """Appends records to a finished collection file in place.
+
+    The closing bracket of a JSON array is cut off, the new records follow
+    the existing ones and the bracket goes back on close, so appending costs
+    only the new records however large the file is. If nothing is appended,
+    or on discard, the file gets its original ending back.
+    """
+
+    def __init__(self, path: str, writer_class):
+        self.path = path
+        self.writer_class = writer_class
+        self.count = 0
+        with open(path, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - 64))
+            tail = f.read()
+        ending = tail.rstrip()
+        if writer_class.closing:
+            # A JSON array: cut before the bracket and the newline ahead of it
+            if not ending.endswith(b"]"):
+                raise ValueError(f"{path} does not end a JSON array")
+            ending = ending[:-1].rstrip()
+            empty = ending.endswith(b"[")
+            self._lead = "\n" if empty else writer_class.separator
+        else:
+            # NDJSON: cut after the last line's text, so put its newline back
+            self._lead = "\n" if ending else ""
+        # Where the existing records end, and what came after them
+        self._cut = size - len(tail) + len(ending)
+        self._tail = tail[len(ending) :].decode("ascii")
+        self._file = open(path, "r+")
+        self._file.seek(self._cut)
+        self._file.truncate()
+
+    def write_encoded(self, text: str):
+        self._file.write(self.writer_class.separator if self.count else self._lead)
+        self._file.write(text)
+        self.count += 1
+
+    def write(self, record):
+        self.write_encoded(self.writer_class.encode(record))
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def close(self):
+        self._file.write(self.writer_class.closing if self.count else self._tail)
+        self._file.close()
+
+    def discard(self):
+        self._file.seek(self._cut)
+        self._file.truncate()
+        self._file.write(self._tail)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+WRITERS = {"json": JsonArrayWriter, "ndjson": NdjsonWriter}
+MANIFEST_NAME = "manifest.json"
+
+
+def output_path(path: str, output_format: str, sharded: bool = False) -> str:
+    """Swaps the .json extension of a data file for the format's own.
+
+    A sharded collection is found through its manifest, so that is its path.
+    """
+    if sharded:
+        return os.path.join(os.path.dirname(path), MANIFEST_NAME)
+    return os.path.splitext(path)[0] + WRITERS[output_format].extension
+
+
+def remove_other_layouts(path: str, keep: set):
+    """Removes the files of path's collection other than those named in keep.
+
+    These are its array and NDJSON files, its manifest and its shards in either
+    format, so a collection switched to another format or shard layout is
+    never read back from what an earlier run left behind.
+    """
+    directory, name = os.path.split(path)
+    stem = os.path.splitext(name)[0]
+    extensions = "|".join(re.escape(writer.extension) for writer in WRITERS.values())
+    pattern = re.compile(rf"{re.escape(stem)}(-\d{{5}})?({extensions})")
+    for entry in os.listdir(directory or "."):
+        if entry not in keep and (pattern.fullmatch(entry) or entry == MANIFEST_NAME):
+            os.remove(os.path.join(directory, entry))
+
+
+def open_writer(
+    path: str, output_format: str, max_records: int = None, max_bytes: int = None
+):
+    """A writer of output_format for path, sharded if either limit is set.
+
+    Whatever an earlier run wrote the collection to in another format or shard
+    layout is removed when it closes.
+    """
+    writer_class = WRITERS[output_format]
+    path = output_path(path, output_format)
+    if max_records or max_bytes:
+        return ShardedWriter(path, writer_class, max_records, max_bytes)
+    return writer_class(path, replace_others=True)
+
+
+def open_appender(path: str, output_format: str, sharded: bool = False):
+    """A writer appending to the collection already written for path.
+
+    A sharded collection gets new shards, under the limits it was written with.
+    """
+    writer_class = WRITERS[output_format]
+    path = output_path(path, output_format)
+    if sharded:
+        with open(output_path(path, output_format, sharded=True), "r") as f:
+            manifest = json.load(f)
+        return ShardedWriter(
+            path,
+            writer_class,
+            manifest["max_records"],
+            manifest["max_bytes"],
+            append=True,
+        )
+    return CollectionAppender(path, writer_class)
@@ -1,8 +1,18 @@
-
+import argparse
 import json
 import os
 import hashlib
 import secrets
+from concurrent.futures import ThreadPoolExecutor
+from generators.transform import transform_file
+
+# Paths
+DATA_FILE = os.path.join(os.path.dirname(__file__), '''../demo-data/residents/data.json''')
+AVATARS_DIR = os.path.join(os.path.dirname(__file__), '''../public/avatars''')
+# Original filename -> content-hashed filename, kept between --content runs
+MAPPING_FILE = os.path.join(os.path.dirname(__file__), 'avatar_hashes.json')
+CHUNK_SIZE = 1024 * 1024
+
 
 def hash_and_rename():
     # Generate a random secret
@@ -10,21 +20,13 @@ def hash_and_rename():
     with open("avatar-secret.txt", "w") as secret_file:
         secret_file.write(secret)
 
-    # Paths
-    data_file_path = os.path.join(os.path.dirname(__file__), '''../demo-data/residents/data.json''')
-    avatars_dir = os.path.join(os.path.dirname(__file__), '''../public/avatars''')
-
-    # Read the JSON data
-    with open(data_file_path, "r") as f:
-        residents = json.load(f)
-
     # Process each resident
-    for resident in residents:
+    def rename_avatar(resident):
         if "avatar_url" in resident["data"]:
             avatar_url = resident["data"]["avatar_url"]
             if avatar_url:
                 original_filename = os.path.basename(avatar_url)
-                
+
                 # Create a hash of the filename
                 hasher = hashlib.sha256()
                 hasher.update(secret.encode('utf-8'))
@@ -32,18 +34,132 @@ def hash_and_rename():
                 hashed_filename = hasher.hexdigest() + ".png"
 
                 # Rename the file
-                original_filepath = os.path.join(avatars_dir, original_filename)
-                hashed_filepath = os.path.join(avatars_dir, hashed_filename)
+                original_filepath = os.path.join(AVATARS_DIR, original_filename)
+                hashed_filepath = os.path.join(AVATARS_DIR, hashed_filename)
 
                 if os.path.exists(original_filepath):
                     os.rename(original_filepath, hashed_filepath)
 
                 # Update the avatar_url
                 resident["data"]["avatar_url"] = f"/avatars/{hashed_filename}"
+        return resident
+
+    # Stream the residents back to the file
+    transform_file(DATA_FILE, rename_avatar)
+
+
+def hash_file(path):
+    """The sha256 hex digest of a file's contents."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def load_mapping(path):
+    """The files (original -> hashed filename) and residents (id -> original
+    filename) sections of the mapping file; a bare files mapping is read as one."""
+    try:
+        with open(path, "r") as f:
+            mapping = json.load(f)
+    except FileNotFoundError:
+        mapping = {}
+    if "files" not in mapping:
+        mapping = {"files": mapping, "residents": {}}
+    return mapping
+
+
+def save_mapping(path, mapping):
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(mapping, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def hash_by_content(workers=8):
+    """
+    Renames avatars to the hash of their contents and points residents at them.
+
+    The original -> hashed mapping is kept in MAPPING_FILE, so a rerun only
+    hashes files still under their original names (new or replaced images)
+    and every other avatar keeps its URL. Identical images share one file, so
+    the mapping also records which original each resident's avatar came from:
+    replacing one image only moves the residents that used it. Files already
+    named after their hash are left alone even if the mapping is lost.
+    """
+    mapping = load_mapping(MAPPING_FILE)
+    files = mapping["files"]
+    hashed_filenames = set(files.values())
+
+    pending = sorted(
+        filename for filename in os.listdir(AVATARS_DIR)
+        if filename not in hashed_filenames and not filename.startswith('.')
+    )
+    print(f"Hashing {len(pending)} new or changed avatar(s) with {workers} worker(s); "
+          f"{len(files)} already mapped.")
+
+    # hashlib releases the GIL on large buffers, so threads hash in parallel
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        digests = executor.map(hash_file, (os.path.join(AVATARS_DIR, name) for name in pending))
+        for original_filename, digest in zip(pending, digests):
+            stem, extension = os.path.splitext(original_filename)
+            hashed_filename = digest + extension.lower()
+            if stem == digest:
+                # Hashed by an earlier run whose mapping was lost
+                hashed_filenames.add(original_filename)
+                continue
+            original_filepath = os.path.join(AVATARS_DIR, original_filename)
+            hashed_filepath = os.path.join(AVATARS_DIR, hashed_filename)
+            if os.path.exists(hashed_filepath):
+                os.remove(original_filepath)
+            else:
+                os.rename(original_filepath, hashed_filepath)
+            files[original_filename] = hashed_filename
+            hashed_filenames.add(hashed_filename)
+            # Saved as each file goes, so a crash never loses a rename
+            save_mapping(MAPPING_FILE, mapping)
+
+    updated = 0
+
+    def point_at_hash(resident):
+        nonlocal updated
+        avatar_url = resident["data"].get("avatar_url")
+        if not avatar_url:
+            return resident
+        filename = os.path.basename(avatar_url)
+        # A resident still on an original filename, or on the hash of the
+        # original it was pointed at before
+        original_filename = filename if filename in files else mapping["residents"].get(resident["id"])
+        if original_filename in files:
+            mapping["residents"][resident["id"]] = original_filename
+            hashed_url = f"/avatars/{files[original_filename]}"
+            if avatar_url != hashed_url:
+                resident["data"]["avatar_url"] = hashed_url
+                updated += 1
+        return resident
+
+    # Stream the residents back to the file
+    transform_file(DATA_FILE, point_at_hash)
+    save_mapping(MAPPING_FILE, mapping)
+    print(f"Updated {updated} avatar URL(s) in {DATA_FILE}.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Rename avatars to hashed filenames and update the residents' avatar URLs."
+    )
+    parser.add_argument("--content", action="store_true",
+                        help="Name avatars by a hash of their contents, keeping the mapping in "
+                        f"{os.path.basename(MAPPING_FILE)}, so reruns only touch new or changed images. "
+                        "Without it, every avatar is renamed with a fresh random secret.")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Threads hashing files in --content mode (default: 8).")
+    return parser.parse_args()
 
-    # Write the updated data back to the file
-    with open(data_file_path, "w") as f:
-        json.dump(residents, f, indent=2)
 
 if __name__ == "__main__":
-    hash_and_rename()
+    args = parse_args()
+    if args.content:
+        hash_by_content(args.workers)
+    else:
+        hash_and_rename()
@@ -1,49 +1,175 @@
+import argparse
 import cloudinary
 import cloudinary.api
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
-def list_assets_in_folder(cloudinary_folder_path):
-    """
-    Lists all assets in a specified Cloudinary folder.
-    """
+# --- Configuration ---
+TARGET_FOLDER = "lean-ehr/assisted-living/avatars"
+MANIFEST_FILE = "dev-utils/cloudinary_assets.json"
+# The most the Admin and Search APIs return per page
+PAGE_SIZE = 500
+ASSET_FIELDS = ("secure_url", "bytes", "format", "version", "created_at")
+# Hashed avatar names (see hash-avatars.py) start with a hex digit
+HEX_DIGITS = "0123456789abcdef"
+
+
+def configure(upload_prefix=None):
+    """Configures Cloudinary from the environment; False if credentials are missing."""
     # Load environment variables from .env file
     load_dotenv()
 
-    # Configure Cloudinary
+    # upload_prefix points the SDK at another API host, e.g. a local stand-in
     cloudinary.config(
         cloud_name=os.environ.get('CLOUDINARY_CLOUD_NAME'),
         api_key=os.environ.get('CLOUDINARY_API_KEY'),
-        api_secret=os.environ.get('CLOUDINARY_API_SECRET')
+        api_secret=os.environ.get('CLOUDINARY_API_SECRET'),
+        upload_prefix=upload_prefix or os.environ.get('CLOUDINARY_UPLOAD_PREFIX'),
     )
+    return bool(cloudinary.config().cloud_name and cloudinary.config().api_key
+                and cloudinary.config().api_secret)
 
-    if not cloudinary.config().cloud_name or not cloudinary.config().api_key or not cloudinary.config().api_secret:
-        print("Cloudinary API credentials are not set. Please check your .env file or environment variables.")
-        return
 
-    print(f"Fetching assets from Cloudinary folder: {cloudinary_folder_path}...")
+def asset_entry(asset):
+    return {field: asset.get(field) for field in ASSET_FIELDS}
 
-    try:
-        # Use the Admin API to list resources
+
+def list_prefix(prefix):
+    """Every asset whose public id starts with prefix, following next_cursor to the end."""
+    assets = []
+    cursor = None
+    while True:
+        options = {"next_cursor": cursor} if cursor else {}
         response = cloudinary.api.resources(
-            type='upload',
-            prefix=cloudinary_folder_path,
-            max_results=500 # Adjust as needed
+            type='upload', prefix=prefix, max_results=PAGE_SIZE, **options
         )
-        
-        assets = response.get('resources', [])
-        
-        if not assets:
-            print("No assets found in the specified folder.")
-            return
+        assets.extend(response.get('resources', []))
+        cursor = response.get('next_cursor')
+        if not cursor:
+            return assets
+
+
+def list_folder(cloudinary_folder_path, split=None, workers=8):
+    """Lists every asset in the folder (and its subfolders).
+
+    With split, the folder is listed as one prefix per character of split,
+    `workers` at a time. The characters must cover the first character of
+    every public id in the folder; anything else is not listed.
+    """
+    base = cloudinary_folder_path.rstrip('/') + '/'
+    prefixes = [base + char for char in split] if split else [base]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pages = executor.map(list_prefix, prefixes)
+        return [asset for assets in pages for asset in assets]
+
+
+def list_created_since(cloudinary_folder_path, since):
+    """Assets in the folder created (or overwritten) at or after since, via the Search API.
+
+    The Admin API can't filter a prefix listing by time, so only search can
+    fetch just the changes.
+    """
+    folder = cloudinary_folder_path.rstrip('/')
+    search = (
+        cloudinary.Search()
+        .expression(f'(folder="{folder}" OR folder:"{folder}/*") AND created_at>="{since}"')
+        .sort_by('created_at', 'asc')
+        .max_results(PAGE_SIZE)
+    )
+    assets = []
+    while True:
+        response = search.execute()
+        assets.extend(response.get('resources', []))
+        cursor = response.get('next_cursor')
+        if not cursor:
+            return assets
+        search.next_cursor(cursor)
+
+
+def load_manifest(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_manifest(path, manifest):
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def sync_assets(cloudinary_folder_path, manifest_file=MANIFEST_FILE, full=False, split=None, workers=8):
+    """
+    Brings the local manifest of a Cloudinary folder's assets up to date and returns it.
+
+    The first sync, or one with full=True, lists the whole folder. Later syncs
+    only fetch assets created since the newest one in the manifest and merge
+    them in; with no newest one to go from (say the folder was empty), the
+    folder is listed in full again. Deletions are only picked up by a full sync.
+    """
+    manifest = load_manifest(manifest_file)
+    if (full or not manifest or manifest.get('folder') != cloudinary_folder_path
+            or not manifest.get('latest_created_at')):
+        print(f"Listing all assets in Cloudinary folder: {cloudinary_folder_path}...")
+        assets = list_folder(cloudinary_folder_path, split, workers)
+        manifest = {'folder': cloudinary_folder_path, 'assets': {}}
+    else:
+        since = manifest['latest_created_at']
+        print(f"Fetching assets created since {since} in Cloudinary folder: {cloudinary_folder_path}...")
+        assets = list_created_since(cloudinary_folder_path, since)
+
+    for asset in assets:
+        manifest['assets'][asset['public_id']] = asset_entry(asset)
+    manifest['latest_created_at'] = max(
+        (entry['created_at'] for entry in manifest['assets'].values() if entry['created_at']),
+        default=None,
+    )
+    manifest['synced_at'] = datetime.now(timezone.utc).isoformat()
+    save_manifest(manifest_file, manifest)
+    print(f"Fetched {len(assets)} asset(s); {len(manifest['assets'])} in {manifest_file}.")
+    return manifest
+
 
-        print(f"Found {len(assets)} assets:")
-        for asset in assets:
-            print(f"- {asset['secure_url']}")
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Sync a local manifest of the assets in a Cloudinary folder."
+    )
+    parser.add_argument("--folder", default=TARGET_FOLDER,
+                        help=f"Cloudinary folder to list (default: {TARGET_FOLDER}).")
+    parser.add_argument("--manifest", default=MANIFEST_FILE,
+                        help=f"Local manifest to sync (default: {MANIFEST_FILE}).")
+    parser.add_argument("--full", action="store_true",
+                        help="Relist the whole folder instead of fetching only new assets; picks up deletions.")
+    parser.add_argument("--split", nargs="?", const=HEX_DIGITS, default=None, metavar="CHARS",
+                        help="List the folder in parallel, one prefix per leading character of the public ids "
+                        f"(default when given: {HEX_DIGITS}, for hashed avatar names).")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Prefixes listed at once with --split (default: 8).")
+    parser.add_argument("--urls", action="store_true",
+                        help="Print every asset's URL as a '- https://...' line.")
+    parser.add_argument("--api-url", default=None,
+                        help="Cloudinary API base URL, e.g. a local stand-in such as http://localhost:8000 "
+                        "(default: $CLOUDINARY_UPLOAD_PREFIX or Cloudinary's own).")
+    return parser.parse_args()
 
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not configure(args.api_url):
+        print("Cloudinary API credentials are not set. Please check your .env file or environment variables.")
+        exit(1)
+
+    try:
+        manifest = sync_assets(args.folder, args.manifest, args.full, args.split, args.workers)
     except Exception as e:
         print(f"An error occurred: {e}")
+        exit(1)
 
-if __name__ == "__main__":
-    target_folder = "lean-ehr/assisted-living/avatars"
-    list_assets_in_folder(target_folder)
+    if args.urls:
+        for public_id in sorted(manifest['assets']):
+            print(f"- {manifest['assets'][public_id]['secure_url']}")
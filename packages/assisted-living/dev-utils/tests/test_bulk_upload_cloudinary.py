@@ -0,0 +1,155 @@
+import json
+import re
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import bulk_upload_cloudinary
+
+FOLDER = "test/avatars"
+
+
+class CloudinaryStandIn(BaseHTTPRequestHandler):
+    """Answers upload requests like Cloudinary's upload API.
+
+    Each upload gets the next status scripted for its public id (200 once the
+    script runs out), and every request is logged by public id.
+    """
+
+    scripts = {}
+    requests = defaultdict(int)
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        public_id = (
+            re.search(rb'name="public_id"\r\n\r\n([^\r]*)\r\n', body).group(1).decode()
+        )
+        with self.lock:
+            self.requests[public_id] += 1
+            script = self.scripts.get(public_id, [])
+            status = script.pop(0) if script else 200
+        if status == 200:
+            result = {
+                "public_id": f"{FOLDER}/{public_id}",
+                "secure_url": f"https://res.example.com/{FOLDER}/{public_id}.png",
+                "bytes": len(body),
+            }
+        else:
+            result = {"error": {"message": f"stand-in returned {status}"}}
+        data = json.dumps(result).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    """The stand-in's URL; Cloudinary credentials are set to match."""
+    CloudinaryStandIn.scripts = {}
+    CloudinaryStandIn.requests = defaultdict(int)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CloudinaryStandIn)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    monkeypatch.setenv("CLOUDINARY_CLOUD_NAME", "stand-in")
+    monkeypatch.setenv("CLOUDINARY_API_KEY", "key")
+    monkeypatch.setenv("CLOUDINARY_API_SECRET", "secret")
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """The delays retries wait for; nothing actually sleeps."""
+    delays = []
+    monkeypatch.setattr(bulk_upload_cloudinary.time, "sleep", delays.append)
+    return delays
+
+
+@pytest.fixture
+def avatars(tmp_path):
+    source = tmp_path / "avatars"
+    source.mkdir()
+    for name in ("a", "b", "c"):
+        (source / f"{name}.png").write_bytes(name.encode() * 100)
+    return source
+
+
+def upload(stand_in, tmp_path, avatars, **options):
+    return bulk_upload_cloudinary.bulk_upload_to_cloudinary(
+        str(avatars),
+        FOLDER,
+        manifest_file=str(tmp_path / "uploaded.ndjson"),
+        listing_file=str(tmp_path / "listing.json"),
+        legacy_uploaded_file=str(tmp_path / "legacy.txt"),
+        workers=2,
+        backoff=1.0,
+        upload_prefix=stand_in,
+        **options,
+    )
+
+
+def read_manifest(tmp_path) -> dict:
+    manifest = bulk_upload_cloudinary.UploadManifest(str(tmp_path / "uploaded.ndjson"))
+    manifest.close()
+    return manifest.entries
+
+
+def test_uploads_every_file_and_records_it(stand_in, tmp_path, avatars, sleeps):
+    assert upload(stand_in, tmp_path, avatars) == 0
+    assert dict(CloudinaryStandIn.requests) == {"a": 1, "b": 1, "c": 1}
+    manifest = read_manifest(tmp_path)
+    assert sorted(manifest) == ["a.png", "b.png", "c.png"]
+    assert manifest["a.png"]["public_id"] == f"{FOLDER}/a"
+    assert sleeps == []
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_transient_errors_are_retried_with_backoff(
+    stand_in, tmp_path, avatars, sleeps, status
+):
+    CloudinaryStandIn.scripts = {"b": [status, status, status]}
+    assert upload(stand_in, tmp_path, avatars, retries=5) == 0
+    assert CloudinaryStandIn.requests["b"] == 4
+    assert sorted(read_manifest(tmp_path)) == ["a.png", "b.png", "c.png"]
+    # Retry n waits backoff * 2**n, less up to half of it in jitter
+    assert len(sleeps) == 3
+    for attempt, delay in enumerate(sleeps):
+        assert 2**attempt * 0.5 <= delay <= 2**attempt
+
+
+def test_gives_up_after_the_last_retry(stand_in, tmp_path, avatars, sleeps):
+    CloudinaryStandIn.scripts = {"b": [503] * 10}
+    assert upload(stand_in, tmp_path, avatars, retries=2) == 1
+    assert CloudinaryStandIn.requests["b"] == 3
+    assert "b.png" not in read_manifest(tmp_path)
+
+
+@pytest.mark.parametrize("status", [400, 401, 403, 404])
+def test_permanent_errors_are_not_retried(stand_in, tmp_path, avatars, sleeps, status):
+    CloudinaryStandIn.scripts = {"b": [status]}
+    assert upload(stand_in, tmp_path, avatars, retries=5) == 1
+    assert CloudinaryStandIn.requests["b"] == 1
+    assert sleeps == []
+    assert sorted(read_manifest(tmp_path)) == ["a.png", "c.png"]
+
+
+def test_resumes_from_the_manifest(stand_in, tmp_path, avatars, sleeps):
+    # A run that uploaded a.png, then crashed while recording b.png
+    with open(tmp_path / "uploaded.ndjson", "w") as f:
+        f.write(json.dumps({"file": "a.png", "public_id": f"{FOLDER}/a"}) + "\n")
+        f.write('{"file": "b.p')
+    assert upload(stand_in, tmp_path, avatars) == 0
+    assert dict(CloudinaryStandIn.requests) == {"b": 1, "c": 1}
+    assert sorted(read_manifest(tmp_path)) == ["a.png", "b.png", "c.png"]
+
+    # Everything is recorded now, so another run uploads nothing
+    CloudinaryStandIn.requests.clear()
+    assert upload(stand_in, tmp_path, avatars) == 0
+    assert dict(CloudinaryStandIn.requests) == {}
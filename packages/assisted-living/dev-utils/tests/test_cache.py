@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+import pytest
+from generators import config, pipeline
+from generators.cache import GenerationCache, file_fingerprint
+from generators.pipeline import GENERATORS, generator_fingerprints, resident_keys
+
+RESIDENT = {"id": "r1", "data": {"first_name": "Ann"}}
+SPAN = {"end_date": datetime(2025, 1, 1, tzinfo=timezone.utc)}
+
+
+def keys_for(seed=7) -> dict:
+    """Every generator's cache key for RESIDENT, fingerprinted afresh."""
+    context = {"seed": seed}
+    for step in GENERATORS:
+        context.update({key: f"{key}-value" for key in step["context"]})
+    context["generator_fingerprints"] = generator_fingerprints(context)
+    return resident_keys(RESIDENT, SPAN, context)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """A cache holding every generator's output for RESIDENT, keyed as now."""
+    cache = GenerationCache(str(tmp_path / "generators.sqlite"))
+    for name, key in keys_for().items():
+        cache.put(RESIDENT["id"], name, key, {name: [name]})
+    cache.commit()
+    yield cache
+    cache.close()
+
+
+def hits(cache, keys) -> set:
+    return {name for name, key in keys.items() if cache.get(RESIDENT["id"], name, key)}
+
+
+def test_an_unchanged_rerun_hits_every_entry(cache):
+    assert hits(cache, keys_for()) == {step["name"] for step in GENERATORS}
+
+
+def test_another_seed_misses_every_entry(cache):
+    assert hits(cache, keys_for(seed=8)) == set()
+
+
+def test_a_config_change_misses_only_the_generators_reading_it(cache, monkeypatch):
+    monkeypatch.setattr(config, "TASK_STATUSES", ["changed"])
+    assert {step["name"] for step in GENERATORS} - hits(cache, keys_for()) == {"tasks"}
+
+
+def test_config_a_generator_module_imports_is_covered(cache, monkeypatch):
+    step = next(step for step in GENERATORS if step["name"] == "prescriptions")
+    monkeypatch.setitem(step, "config", [])
+    monkeypatch.setattr(config, "PRESCRIPTION_STATUSES", ["changed"])
+    assert "prescriptions" not in hits(cache, keys_for())
+
+
+@pytest.mark.parametrize(
+    "source, missed",
+    [
+        ("tasks.py", {"tasks"}),
+        ("terminology.py", {"allergies", "diagnostic_history"}),
+        # Care plans depend on goals, so their keys change with them
+        ("goals.py", {"goals", "care_plans"}),
+        (
+            "utils.py",
+            {step["name"] for step in GENERATORS} - {"addresses", "identifiers"},
+        ),
+        ("pipeline.py", {step["name"] for step in GENERATORS}),
+    ],
+)
+def test_a_source_change_misses_the_generators_reaching_it(
+    cache, monkeypatch, source, missed
+):
+    def edited_file_fingerprint(*paths):
+        edited = [path for path in paths if path.endswith(f"generators/{source}")]
+        return file_fingerprint(*paths) + ("-edited" if edited else "")
+
+    monkeypatch.setattr(pipeline, "file_fingerprint", edited_file_fingerprint)
+    assert {step["name"] for step in GENERATORS} - hits(cache, keys_for()) == missed
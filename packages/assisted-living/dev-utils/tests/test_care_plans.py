@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+import pytest
+from generators import goals
+from generators.pipeline import GENERATORS
+from generators.utils import make_rng
+
+SEED = 7
+START_DATE = datetime(2023, 1, 1, tzinfo=timezone.utc)
+SPAN = {"end_date": datetime(2025, 1, 1, tzinfo=timezone.utc)}
+STAFF_IDS = ["staff-1", "staff-2"]
+
+
+def run(name, resident_id, context, upstream) -> dict:
+    step = next(step for step in GENERATORS if step["name"] == name)
+    rng = make_rng(SEED, resident_id, name)
+    return step["run"]({"id": resident_id}, SPAN, context, rng, upstream)
+
+
+def care_plans_for(resident_id, goal_mode="per-resident") -> tuple:
+    context = {"goal_mode": goal_mode, "staff_ids": STAFF_IDS, "start_date": START_DATE}
+    resident_goals = run("goals", resident_id, context, {})
+    care_plans = run("care_plans", resident_id, context, {"goals": resident_goals})
+    return resident_goals, care_plans
+
+
+def test_care_plans_reference_only_the_residents_own_goals():
+    for resident_id in ("r1", "r2", "r3"):
+        resident_goals, care_plans = care_plans_for(resident_id)
+        own_ids = {goal["id"] for goal in resident_goals["goals"]}
+        assert resident_goals["goal_ids"] == [
+            goal["id"] for goal in resident_goals["goals"]
+        ]
+        for care_plan in care_plans["care_plans"]:
+            assert care_plan["data"]["goal_ids"]
+            assert set(care_plan["data"]["goal_ids"]) <= own_ids
+
+
+def test_care_plans_do_not_depend_on_other_residents():
+    alone = care_plans_for("r1")
+    for index in range(50):
+        care_plans_for(f"other-{index}")
+    assert care_plans_for("r1") == alone
+
+
+@pytest.mark.parametrize("resident_id", ["r1", "r2"])
+def test_catalog_care_plans_reference_catalog_goals(resident_id):
+    resident_goals, care_plans = care_plans_for(resident_id, "catalog")
+    assert resident_goals["goals"] == []
+    catalog_ids = set(goals.generate_goal_catalog()["goal_ids"])
+    for care_plan in care_plans["care_plans"]:
+        assert set(care_plan["data"]["goal_ids"]) <= catalog_ids
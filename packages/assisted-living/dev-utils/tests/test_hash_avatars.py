@@ -0,0 +1,83 @@
+import hashlib
+import importlib.util
+import json
+import os
+import pytest
+
+DEV_UTILS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def hash_avatars(tmp_path, monkeypatch):
+    """hash-avatars.py, working on avatars and residents under tmp_path."""
+    spec = importlib.util.spec_from_file_location(
+        "hash_avatars", os.path.join(DEV_UTILS, "hash-avatars.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    (tmp_path / "avatars").mkdir()
+    monkeypatch.setattr(module, "AVATARS_DIR", str(tmp_path / "avatars"))
+    monkeypatch.setattr(module, "DATA_FILE", str(tmp_path / "residents.json"))
+    monkeypatch.setattr(module, "MAPPING_FILE", str(tmp_path / "avatar_hashes.json"))
+    return module
+
+
+def write_avatar(tmp_path, name, content):
+    (tmp_path / "avatars" / name).write_bytes(content)
+    return hashlib.sha256(content).hexdigest() + ".png"
+
+
+def write_residents(tmp_path, avatars):
+    residents = [
+        {"id": resident_id, "data": {"avatar_url": f"/avatars/{name}"}}
+        for resident_id, name in avatars.items()
+    ]
+    (tmp_path / "residents.json").write_text(json.dumps(residents, indent=2))
+
+
+def avatar_urls(tmp_path) -> dict:
+    residents = json.loads((tmp_path / "residents.json").read_text())
+    return {resident["id"]: resident["data"]["avatar_url"] for resident in residents}
+
+
+def test_reruns_only_touch_new_images(hash_avatars, tmp_path):
+    a = write_avatar(tmp_path, "a.png", b"a")
+    write_residents(tmp_path, {"r1": "a.png"})
+    hash_avatars.hash_by_content(workers=2)
+    assert avatar_urls(tmp_path) == {"r1": f"/avatars/{a}"}
+
+    b = write_avatar(tmp_path, "b.png", b"b")
+    write_residents(tmp_path, {"r1": a, "r2": "b.png"})
+    hash_avatars.hash_by_content(workers=2)
+    assert avatar_urls(tmp_path) == {"r1": f"/avatars/{a}", "r2": f"/avatars/{b}"}
+    assert sorted(os.listdir(tmp_path / "avatars")) == sorted([a, b])
+
+
+def test_hashed_avatars_survive_a_lost_mapping(hash_avatars, tmp_path):
+    a = write_avatar(tmp_path, "a.png", b"a")
+    write_residents(tmp_path, {"r1": "a.png"})
+    hash_avatars.hash_by_content(workers=2)
+    os.remove(hash_avatars.MAPPING_FILE)
+
+    hash_avatars.hash_by_content(workers=2)
+    assert os.listdir(tmp_path / "avatars") == [a]
+    assert avatar_urls(tmp_path) == {"r1": f"/avatars/{a}"}
+
+
+def test_replacing_a_duplicate_only_moves_its_own_residents(hash_avatars, tmp_path):
+    shared = write_avatar(tmp_path, "a.png", b"same")
+    write_avatar(tmp_path, "c.png", b"same")
+    write_residents(tmp_path, {"r1": "a.png", "r2": "c.png"})
+    hash_avatars.hash_by_content(workers=2)
+    assert avatar_urls(tmp_path) == {
+        "r1": f"/avatars/{shared}",
+        "r2": f"/avatars/{shared}",
+    }
+
+    new = write_avatar(tmp_path, "a.png", b"new")
+    hash_avatars.hash_by_content(workers=2)
+    assert avatar_urls(tmp_path) == {
+        "r1": f"/avatars/{new}",
+        "r2": f"/avatars/{shared}",
+    }
+    assert sorted(os.listdir(tmp_path / "avatars")) == sorted([shared, new])
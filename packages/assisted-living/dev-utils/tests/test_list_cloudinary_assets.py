@@ -0,0 +1,174 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+import list_cloudinary_assets
+
+FOLDER = "test/avatars"
+
+
+def asset(name, created_at):
+    return {
+        "public_id": f"{FOLDER}/{name}",
+        "secure_url": f"https://res.example.com/{FOLDER}/{name}.png",
+        "bytes": 100,
+        "format": "png",
+        "version": 1,
+        "created_at": created_at,
+    }
+
+
+class CloudinaryStandIn(BaseHTTPRequestHandler):
+    """Answers listing requests like Cloudinary's Admin and Search APIs.
+
+    Both page through the assets sorted the way the real APIs sort them, with
+    the offset of the next page as its cursor. Every request is logged as
+    ("resources", prefix) or ("search", since).
+    """
+
+    assets = []
+    requests = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        query = {
+            key: values[0]
+            for key, values in parse_qs(urlparse(self.path).query).items()
+        }
+        matches = sorted(
+            (a for a in self.assets if a["public_id"].startswith(query["prefix"])),
+            key=lambda a: a["public_id"],
+        )
+        self.log_request_as(("resources", query["prefix"]))
+        self.reply_page(matches, int(query["max_results"]), query.get("next_cursor"))
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        since = re.search(r'created_at>="([^"]*)"', body["expression"]).group(1)
+        matches = sorted(
+            (a for a in self.assets if a["created_at"] >= since),
+            key=lambda a: a["created_at"],
+        )
+        self.log_request_as(("search", since))
+        self.reply_page(matches, body["max_results"], body.get("next_cursor"))
+
+    def log_request_as(self, entry):
+        with self.lock:
+            self.requests.append(entry)
+
+    def reply_page(self, matches, max_results, cursor):
+        start = int(cursor or 0)
+        result = {"resources": matches[start : start + max_results]}
+        if start + max_results < len(matches):
+            result["next_cursor"] = str(start + max_results)
+        data = json.dumps(result).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    """Points the listing at a stand-in holding no assets, two per page."""
+    CloudinaryStandIn.assets = []
+    CloudinaryStandIn.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CloudinaryStandIn)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    monkeypatch.setenv("CLOUDINARY_CLOUD_NAME", "stand-in")
+    monkeypatch.setenv("CLOUDINARY_API_KEY", "key")
+    monkeypatch.setenv("CLOUDINARY_API_SECRET", "secret")
+    monkeypatch.setattr(list_cloudinary_assets, "PAGE_SIZE", 2)
+    assert list_cloudinary_assets.configure(
+        f"http://127.0.0.1:{server.server_address[1]}"
+    )
+    yield CloudinaryStandIn
+    server.shutdown()
+    server.server_close()
+
+
+def sync(tmp_path, **options):
+    return list_cloudinary_assets.sync_assets(
+        FOLDER, str(tmp_path / "cloudinary_assets.json"), **options
+    )
+
+
+def test_full_listing_follows_every_page(stand_in, tmp_path):
+    stand_in.assets = [
+        asset(name, f"2024-01-0{n}T00:00:00Z") for n, name in enumerate("abcde", 1)
+    ]
+    manifest = sync(tmp_path)
+    assert sorted(manifest["assets"]) == [f"{FOLDER}/{name}" for name in "abcde"]
+    assert manifest["assets"][f"{FOLDER}/a"]["secure_url"].endswith("/a.png")
+    assert manifest["latest_created_at"] == "2024-01-05T00:00:00Z"
+    assert stand_in.requests == [("resources", f"{FOLDER}/")] * 3
+
+
+def test_split_listing_lists_one_prefix_per_character(stand_in, tmp_path):
+    stand_in.assets = [
+        asset(name, "2024-01-01T00:00:00Z") for name in ("a1", "a2", "a3", "b1", "c1")
+    ]
+    manifest = sync(tmp_path, split="abc", workers=3)
+    assert len(manifest["assets"]) == 5
+    assert sorted(stand_in.requests) == [
+        ("resources", f"{FOLDER}/a"),
+        ("resources", f"{FOLDER}/a"),
+        ("resources", f"{FOLDER}/b"),
+        ("resources", f"{FOLDER}/c"),
+    ]
+
+
+def test_later_syncs_only_search_for_new_assets(stand_in, tmp_path):
+    stand_in.assets = [
+        asset("a", "2024-01-01T00:00:00Z"),
+        asset("b", "2024-01-02T00:00:00Z"),
+    ]
+    sync(tmp_path)
+    stand_in.assets += [asset(name, "2024-02-01T00:00:00Z") for name in "cde"]
+    stand_in.requests.clear()
+
+    manifest = sync(tmp_path)
+    assert sorted(manifest["assets"]) == [f"{FOLDER}/{name}" for name in "abcde"]
+    assert manifest["latest_created_at"] == "2024-02-01T00:00:00Z"
+    # b is searched for again (created_at>= the newest known), across two pages
+    assert stand_in.requests == [("search", "2024-01-02T00:00:00Z")] * 2
+
+
+def test_full_option_relists_and_drops_deleted_assets(stand_in, tmp_path):
+    stand_in.assets = [
+        asset("a", "2024-01-01T00:00:00Z"),
+        asset("b", "2024-01-02T00:00:00Z"),
+    ]
+    sync(tmp_path)
+    stand_in.assets = stand_in.assets[:1]
+    stand_in.requests.clear()
+
+    manifest = sync(tmp_path, full=True)
+    assert sorted(manifest["assets"]) == [f"{FOLDER}/a"]
+    assert stand_in.requests == [("resources", f"{FOLDER}/")]
+
+
+@pytest.mark.parametrize("latest_created_at", [None, "missing"])
+def test_a_manifest_without_a_newest_asset_is_relisted(
+    stand_in, tmp_path, latest_created_at
+):
+    # The first sync found the folder empty
+    sync(tmp_path)
+    if latest_created_at == "missing":
+        path = tmp_path / "cloudinary_assets.json"
+        manifest = json.loads(path.read_text())
+        del manifest["latest_created_at"]
+        path.write_text(json.dumps(manifest))
+    stand_in.assets = [asset("a", "2024-01-01T00:00:00Z")]
+    stand_in.requests.clear()
+
+    manifest = sync(tmp_path)
+    assert sorted(manifest["assets"]) == [f"{FOLDER}/a"]
+    assert stand_in.requests == [("resources", f"{FOLDER}/")]
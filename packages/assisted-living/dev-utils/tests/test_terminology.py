@@ -0,0 +1,30 @@
+import pytest
+from generators import terminology
+from generators.terminology import SNOMED_SYSTEM, load_terminology
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(terminology, "CACHE_DIR", str(tmp_path / "cache"))
+
+
+def test_loads_and_indexes_an_example_file(tmp_path):
+    path = tmp_path / "disorders.txt"
+    path.write_text("195967001 |Asthma (disorder)|\n44054006 |Diabetes (disorder)|\n")
+    disorders = load_terminology(str(path), SNOMED_SYSTEM)
+    assert len(disorders) == 2
+    assert disorders.lookup("195967001")["display"] == "Asthma"
+    # The second load comes from the compiled index
+    assert str(load_terminology(str(path), SNOMED_SYSTEM)) == str(disorders)
+
+
+def test_a_missing_source_is_an_error(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_terminology(str(tmp_path / "sct2_Description_missing.txt"), SNOMED_SYSTEM)
+
+
+def test_a_missing_example_file_may_give_an_empty_terminology(tmp_path):
+    missing = load_terminology(
+        str(tmp_path / "missing.txt"), SNOMED_SYSTEM, missing_ok=True
+    )
+    assert len(missing) == 0
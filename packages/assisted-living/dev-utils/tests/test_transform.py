@@ -0,0 +1,52 @@
+import json
+import pytest
+from generators import transform
+from generators.transform import iter_json_array
+
+RECORDS = [
+    {"id": "a", "data": {"text": "brackets ] and [ and , inside", "n": 12345}},
+    {"id": "b", "data": {"escaped": 'quote " and \\ backslash', "list": [1, 2, 3]}},
+    12345678,
+    "a string, with a comma",
+    [],
+    {},
+    None,
+    {"id": "c", "data": {"unicode": "café ☃", "nested": {"deep": [{"x": 1}]}}},
+]
+
+
+@pytest.fixture(params=[1, 2, 3, 7, 64, 1024 * 1024])
+def read_size(request, monkeypatch):
+    """Reads the file in chunks of this many characters."""
+    monkeypatch.setattr(transform, "READ_SIZE", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("indent", [2, None])
+def test_iter_json_array_across_chunk_boundaries(tmp_path, read_size, indent):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(RECORDS, indent=indent))
+    assert list(iter_json_array(str(path))) == RECORDS
+
+
+def test_iter_json_array_raw_yields_each_element_text(tmp_path, read_size):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(RECORDS, indent=2))
+    assert [
+        json.loads(text) for text in iter_json_array(str(path), raw=True)
+    ] == RECORDS
+
+
+@pytest.mark.parametrize("text", ["[]", "  [ \n ]\n", ""])
+def test_iter_json_array_empty(tmp_path, read_size, text):
+    path = tmp_path / "data.json"
+    path.write_text(text)
+    assert list(iter_json_array(str(path))) == []
+
+
+@pytest.mark.parametrize("text", ['{"id": "a"}', '[{"id": "a"}, {"id": "b"}'])
+def test_iter_json_array_rejects_malformed_files(tmp_path, read_size, text):
+    path = tmp_path / "data.json"
+    path.write_text(text)
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path)))
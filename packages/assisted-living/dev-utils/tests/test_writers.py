@@ -0,0 +1,157 @@
+import json
+import os
+from datetime import datetime, timezone
+import pytest
+from generators.transform import collection_files
+from generators.writers import JsonArrayWriter, NdjsonWriter, ShardedWriter, open_writer
+from generators.utils import json_default
+
+RECORDS = [
+    {"id": "a", "data": {"name": "Ann", "tags": ["x", "y"], "nested": {"n": 1}}},
+    {"id": "b", "data": {"name": "Béa", "empty": {}, "none": None}},
+    {"id": "c", "data": {"at": datetime(2024, 5, 1, 8, 30, tzinfo=timezone.utc)}},
+    {"id": "d", "data": {"text": "line\nbreak", "list": []}},
+]
+
+
+def expected_array(records) -> str:
+    return json.dumps(records, indent=2, default=json_default)
+
+
+def write_fragment(path, writer_class, records):
+    """A fragment file of records, as a pool worker writes it."""
+    writer = writer_class(path, fragment=True)
+    writer.write_all(records)
+    writer.close()
+    return writer.count, writer.record_sizes
+
+
+def read_shards(directory) -> tuple:
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = json.load(f)
+    shards = []
+    for shard in manifest["shards"]:
+        with open(os.path.join(directory, shard["file"])) as f:
+            shards.append(f.read())
+    return manifest, shards
+
+
+@pytest.mark.parametrize("count", [0, 1, len(RECORDS)])
+def test_json_array_writer_matches_json_dump(tmp_path, count):
+    path = tmp_path / "data-plain.json"
+    with JsonArrayWriter(str(path)) as writer:
+        writer.write_all(RECORDS[:count])
+    assert path.read_text() == expected_array(RECORDS[:count])
+
+
+def test_spliced_fragments_match_json_dump(tmp_path):
+    path = tmp_path / "data-plain.json"
+    with JsonArrayWriter(str(path)) as writer:
+        writer.write(RECORDS[0])
+        for index, batch in enumerate([RECORDS[1:3], [], RECORDS[3:]]):
+            fragment = str(tmp_path / f"fragment-{index}")
+            count, sizes = write_fragment(fragment, JsonArrayWriter, batch)
+            writer.append_fragment(fragment, count, sizes)
+    assert path.read_text() == expected_array(RECORDS)
+
+
+def test_ndjson_writer_writes_one_record_per_line(tmp_path):
+    path = tmp_path / "data-plain.ndjson"
+    with NdjsonWriter(str(path)) as writer:
+        writer.write_all(RECORDS)
+    lines = path.read_text().splitlines()
+    assert [json.loads(line) for line in lines] == json.loads(expected_array(RECORDS))
+
+
+@pytest.mark.parametrize("writer_class", [JsonArrayWriter, NdjsonWriter])
+@pytest.mark.parametrize(
+    "max_records, max_bytes", [(3, None), (None, 400), (2, 400), (1, None)]
+)
+def test_sharded_fragments_honour_limits(
+    tmp_path, writer_class, max_records, max_bytes
+):
+    records = [
+        {"id": str(index), "data": {"value": "v" * (index % 7 * 20)}}
+        for index in range(25)
+    ]
+    # Written directly, and spliced from fragments of uneven sizes
+    direct = tmp_path / "direct"
+    spliced = tmp_path / "spliced"
+    for directory in (direct, spliced):
+        directory.mkdir()
+    with ShardedWriter(
+        str(direct / f"data-plain{writer_class.extension}"),
+        writer_class,
+        max_records,
+        max_bytes,
+    ) as writer:
+        writer.write_all(records)
+    with ShardedWriter(
+        str(spliced / f"data-plain{writer_class.extension}"),
+        writer_class,
+        max_records,
+        max_bytes,
+    ) as writer:
+        for index, (start, end) in enumerate(
+            [(0, 4), (4, 5), (5, 5), (5, 17), (17, 25)]
+        ):
+            fragment = str(tmp_path / f"fragment-{index}")
+            count, sizes = write_fragment(fragment, writer_class, records[start:end])
+            writer.append_fragment(fragment, count, sizes)
+
+    manifest, shards = read_shards(spliced)
+    assert (manifest, shards) == read_shards(direct)
+    assert manifest["records"] == len(records)
+    read_back = []
+    for shard, text in zip(manifest["shards"], shards):
+        assert len(text) == shard["bytes"]
+        if max_records:
+            assert shard["records"] <= max_records
+        if max_bytes:
+            assert shard["bytes"] <= max_bytes
+        if writer_class is JsonArrayWriter:
+            shard_records = json.loads(text)
+        else:
+            shard_records = [json.loads(line) for line in text.splitlines()]
+        assert len(shard_records) == shard["records"]
+        read_back.extend(shard_records)
+    assert read_back == records
+
+
+def test_oversized_record_gets_a_shard_of_its_own(tmp_path):
+    records = [{"id": "small"}, {"id": "big", "data": "x" * 500}, {"id": "small2"}]
+    with ShardedWriter(
+        str(tmp_path / "data-plain.json"), JsonArrayWriter, max_bytes=100
+    ) as writer:
+        fragment = str(tmp_path / "fragment")
+        count, sizes = write_fragment(fragment, JsonArrayWriter, records)
+        writer.append_fragment(fragment, count, sizes)
+    manifest, shards = read_shards(tmp_path)
+    assert [shard["records"] for shard in manifest["shards"]] == [1, 1, 1]
+    assert [json.loads(text) for text in shards] == [[record] for record in records]
+
+
+@pytest.mark.parametrize(
+    "layouts",
+    [
+        [("json", 2), ("json", None)],
+        [("ndjson", 2), ("json", None)],
+        [("json", None), ("json", 2)],
+        [("json", None), ("ndjson", None)],
+        [("ndjson", 1), ("json", 2)],
+    ],
+)
+def test_rewriting_in_another_layout_leaves_only_the_new_output(tmp_path, layouts):
+    path = str(tmp_path / "data-plain.json")
+    for output_format, max_records in layouts:
+        with open_writer(path, output_format, max_records) as writer:
+            writer.write_all(RECORDS)
+    output_format, max_records = layouts[-1]
+    extension = ".ndjson" if output_format == "ndjson" else ".json"
+    if max_records:
+        expected = [f"data-plain-0000{n}{extension}" for n in (0, 1)]
+        assert sorted(os.listdir(tmp_path)) == sorted(expected + ["manifest.json"])
+    else:
+        expected = [f"data-plain{extension}"]
+        assert os.listdir(tmp_path) == expected
+    assert collection_files(path) == [str(tmp_path / name) for name in expected]
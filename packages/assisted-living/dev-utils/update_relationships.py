@@ -1,8 +1,11 @@
-
-import json
+import argparse
 import random
+from functools import partial
+from generators.transform import transform_file
+from generators.utils import make_rng
 
-file_path = "/home/darealestninja/dev-projects/lean-ehr/packages/assisted-living/demo-data/residents/data.json"
+# --- Configuration ---
+EMERGENCY_CONTACTS_FILE = "demo-data/emergency_contacts/data-plain.json"
 
 legal_relationships = [
     "HCP_AGENT_DURABLE",
@@ -24,19 +27,68 @@ other_relationships = [
     "OTHER_RELATIVE",
 ]
 
-with open(file_path, 'r') as f:
-    data = json.load(f)
 
-for resident in data:
-    if "emergency_contacts" in resident["data"]:
-        for contact in resident["data"]["emergency_contacts"]:
-            relationships = []
-            relationships.append(random.choice(other_relationships))
-            if random.random() < 0.5:
-                relationships.append(random.choice(legal_relationships))
-            contact["encrypted_relationship"] = relationships
+def random_relationships(rng: random.Random) -> list:
+    relationships = [rng.choice(other_relationships)]
+    if rng.random() < 0.5:
+        relationships.append(rng.choice(legal_relationships))
+    return relationships
+
+
+def update_relationships(seed: int, record: dict) -> dict:
+    """Gives an emergency contact, or each contact nested in a resident, new relationships.
+
+    Each record draws from its own stream keyed by the seed and its id, so
+    the result doesn't depend on how records are batched across workers.
+    """
+    rng = make_rng(seed, record["id"], "relationships")
+    if "emergency_contacts" in record["data"]:
+        for contact in record["data"]["emergency_contacts"]:
+            contact["encrypted_relationship"] = random_relationships(rng)
+    else:
+        record["data"]["relationship"] = random_relationships(rng)
+    return record
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Assign random relationships to emergency contacts."
+    )
+    parser.add_argument(
+        "path",
+        nargs="?",
+        default=EMERGENCY_CONTACTS_FILE,
+        help="Emergency contacts file, or a residents file with nested contacts; a JSON "
+        f"array or .ndjson (default: {EMERGENCY_CONTACTS_FILE}).",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed for the relationships; a random seed is picked and printed if omitted.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes to transform record batches on (default: 1).",
+    )
+    return parser.parse_args()
+
 
-with open(file_path, 'w') as f:
-    json.dump(data, f, indent=2)
+# --- Main Script ---
+if __name__ == "__main__":
+    args = parse_args()
+    seed = (
+        args.seed if args.seed is not None else random.SystemRandom().randrange(2**32)
+    )
+    print(f"Updating relationships with seed {seed}.")
+    try:
+        count = transform_file(
+            args.path, partial(update_relationships, seed), workers=args.workers
+        )
+    except FileNotFoundError:
+        print(f"Error: File not found at {args.path}.")
+        exit(1)
 
-print(f"Successfully updated {file_path}")
+    print(f"Successfully updated {count} record(s) in {args.path}")
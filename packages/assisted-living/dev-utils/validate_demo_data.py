@@ -0,0 +1,94 @@
+import argparse
+import os
+from generate_demo_subcollection_data import last_run_collection_files
+from generators.transform import collection_files
+from generators.validation import validate_collection
+
+# --- Configuration ---
+# BigQuery table schemas, by the collection whose rows they describe
+SCHEMA_FILES = {
+    "residents": "demo-data/residents/schema.json",
+    "charges": "charges_schema.json",
+    "claims": "claims_schema.json",
+    "payments": "payments_schema.json",
+    "adjustments": "adjustments_schema.json",
+}
+
+
+def has_schema(schema_path: str) -> bool:
+    """Whether schema_path holds a schema; some are still empty placeholders."""
+    return os.path.getsize(schema_path) > 0
+
+
+def print_report(name: str, report: dict, max_violations: int):
+    print(f"{name}: {report['records']} record(s), {report['invalid']} invalid.")
+    for (field, message), count in report["violations"].most_common(max_violations):
+        ids = ", ".join(
+            str(record_id) for record_id in report["examples"][field, message]
+        )
+        print(f"  {field}: {message} ({count}x, e.g. {ids})")
+    hidden = len(report["violations"]) - max_violations
+    if hidden > 0:
+        print(f"  ... and {hidden} more kind(s) of violation.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Validate the generated demo data against the BigQuery table schemas."
+    )
+    parser.add_argument(
+        "collections",
+        nargs="*",
+        help="Collections to validate, out of "
+        f"{', '.join(sorted(SCHEMA_FILES))} (default: all of them).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes to check record batches on (default: 1).",
+    )
+    parser.add_argument(
+        "--max-violations",
+        type=int,
+        default=20,
+        metavar="N",
+        help="Kinds of violation listed per collection, most frequent first (default: 20).",
+    )
+    args = parser.parse_args()
+    unknown = set(args.collections) - set(SCHEMA_FILES)
+    if unknown:
+        parser.error(f"no schema for: {', '.join(sorted(unknown))}")
+    return args
+
+
+# --- Main Script ---
+if __name__ == "__main__":
+    args = parse_args()
+    paths = last_run_collection_files()
+    names = args.collections or sorted(SCHEMA_FILES)
+    # An empty schema is a placeholder, but a missing one is misconfiguration
+    missing = [
+        SCHEMA_FILES[name] for name in names if not os.path.exists(SCHEMA_FILES[name])
+    ]
+    if missing:
+        print(f"Error: schema file(s) not found: {', '.join(missing)}.")
+        exit(1)
+
+    invalid = 0
+    for name in names:
+        schema_path = SCHEMA_FILES[name]
+        if not has_schema(schema_path):
+            print(f"{name}: skipped, {schema_path} has no schema yet.")
+            continue
+        if not collection_files(paths[name]):
+            print(f"{name}: skipped, not generated yet.")
+            continue
+        report = validate_collection(paths[name], schema_path, args.workers)
+        print_report(name, report, args.max_violations)
+        invalid += report["invalid"]
+
+    if invalid:
+        print(f"Validation failed: {invalid} invalid record(s).")
+        exit(1)
+    print("All validated collections match their schemas.")